@@ -1,29 +1,43 @@
 """
 FastAPI dependencies for authentication and authorization.
 """
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.database import get_db
 from app.core.security import decode_access_token
 from app.models.user import User
+from app.services.user_cache import user_cache
 
 security = HTTPBearer()
 
 
 async def get_current_user(
+    request: Request,
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: AsyncSession = Depends(get_db)
 ) -> User:
     """
     Dependency to get the current authenticated user.
     Validates JWT token and returns user object.
+    
+    Reuses the claims AuthMiddleware already verified for this request and
+    only decodes the token itself when the middleware is not installed.
+    The user is read through the user cache, so no database session is
+    opened unless both cache tiers miss.
     """
     token = credentials.credentials
     
     try:
-        payload = decode_access_token(token)
+        if "token_claims" in request.scope.get("state", {}):
+            payload = request.state.token_claims
+        else:
+            payload = decode_access_token(token)
+        
+        if not payload:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Could not validate credentials"
+            )
+        
         user_id = payload.get("sub")
         
         if not user_id:
@@ -32,16 +46,13 @@ async def get_current_user(
                 detail="Invalid authentication credentials"
             )
         
-        # TODO: Fetch user from database
-        # For now, return a mock user
-        user = User(
-            id=user_id,
-            email="user@example.com",
-            name="Test User",
-            avatar=None,
-            github_id=None,
-            google_id=None
-        )
+        user = await user_cache.get(user_id)
+        
+        if user is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="User not found"
+            )
         
         return user
     
@@ -5,11 +5,12 @@ Handles GitHub OAuth, Google OAuth, and JWT token management.
 from fastapi import APIRouter, Depends, HTTPException, status, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
-import httpx
 
 from app.core.database import get_db
 from app.core.config import settings
+from app.core.http import http_clients
 from app.core.security import create_access_token
+from app.api.dependencies import get_current_user
 from app.models.user import User
 
 router = APIRouter()
@@ -41,46 +42,53 @@ async def github_callback(
     """Handle GitHub OAuth callback."""
     try:
         # Exchange code for access token
-        async with httpx.AsyncClient() as client:
-            token_response = await client.post(
-                "https://github.com/login/oauth/access_token",
-                data={
-                    "client_id": settings.GITHUB_CLIENT_ID,
-                    "client_secret": settings.GITHUB_CLIENT_SECRET,
-                    "code": code,
-                },
-                headers={"Accept": "application/json"}
-            )
-            token_data = token_response.json()
-            github_token = token_data.get("access_token")
-            
-            if not github_token:
-                raise HTTPException(status_code=400, detail="Failed to get GitHub token")
-            
-            # Get user info from GitHub
-            user_response = await client.get(
-                "https://api.github.com/user",
-                headers={"Authorization": f"Bearer {github_token}"}
-            )
-            github_user = user_response.json()
-            
-            # TODO: Create or update user in database
-            # For now, create a mock user
-            user_data = {
-                "id": str(github_user["id"]),
-                "email": github_user.get("email", f"{github_user['login']}@github.com"),
-                "name": github_user.get("name", github_user["login"]),
-                "avatar": github_user.get("avatar_url"),
-                "github_id": str(github_user["id"]),
-            }
-            
-            # Create JWT token
-            access_token = create_access_token(data={"sub": user_data["id"]})
-            
-            return TokenResponse(
-                access_token=access_token,
-                user=user_data
-            )
+        token_response = await http_clients.get("https://github.com").post(
+            "https://github.com/login/oauth/access_token",
+            data={
+                "client_id": settings.GITHUB_CLIENT_ID,
+                "client_secret": settings.GITHUB_CLIENT_SECRET,
+                "code": code,
+            },
+            headers={"Accept": "application/json"}
+        )
+        token_data = token_response.json()
+        github_token = token_data.get("access_token")
+        
+        if not github_token:
+            raise HTTPException(status_code=400, detail="Failed to get GitHub token")
+        
+        # Get user info from GitHub
+        user_response = await http_clients.get("https://api.github.com").get(
+            "https://api.github.com/user",
+            headers={"Authorization": f"Bearer {github_token}"}
+        )
+        github_user = user_response.json()
+        
+        user_data = {
+            "id": str(github_user["id"]),
+            "email": github_user.get("email") or f"{github_user['login']}@github.com",
+            "name": github_user.get("name") or github_user["login"],
+            "avatar": github_user.get("avatar_url"),
+            "github_id": str(github_user["id"]),
+        }
+        
+        # Create or update user in database (commit evicts cached copies)
+        user = await db.get(User, user_data["id"])
+        if user is None:
+            user = User(**user_data)
+            db.add(user)
+        else:
+            for field, value in user_data.items():
+                setattr(user, field, value)
+        await db.commit()
+        
+        # Create JWT token
+        access_token = create_access_token(data={"sub": user_data["id"]})
+        
+        return TokenResponse(
+            access_token=access_token,
+            user=user_data
+        )
     
     except Exception as e:
         raise HTTPException(
@@ -2,18 +2,42 @@
 Chat API endpoints for conversational AI interactions.
 Supports both streaming and non-streaming responses.
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+import logging
+import math
+import uuid
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
 from fastapi.responses import StreamingResponse
+from redis.exceptions import RedisError
 from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
-from typing import List, Optional
-import json
+from typing import AsyncIterator, List, Optional, Tuple
 
-from app.core.database import get_db
+from app.core.database import get_db, get_read_db
+from app.core.config import settings
+from app.core.metrics import CHAT_STREAM_TOKENS_SAVED, CHAT_STREAMS_ABANDONED
+from app.core.resilience import CircuitOpenError
+from app.core.scheduler import Priority
+from app.core.sse import (
+    COMPLETE_EVENT,
+    coalesce_tokens,
+    encode_event,
+    encode_token,
+    relay_tokens,
+)
+from app.services.chat_history import (
+    ConversationAccessError,
+    conversation_owners,
+    fetch_history,
+)
+from app.services.context_window import context_window
+from app.services.generation_log import generation_log
 from app.services.openrouter import openrouter_client
+from app.services.write_behind import write_behind
 from app.api.dependencies import get_current_user
 from app.models.user import User
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
 
@@ -25,14 +49,85 @@ class ChatMessage(BaseModel):
 class ChatRequest(BaseModel):
     messages: List[ChatMessage]
     project_id: Optional[str] = None
+    conversation_id: Optional[str] = None
     stream: bool = True
     temperature: float = 0.7
     max_tokens: int = 4096
+    cache: bool = False  # Reuse a cached completion for identical requests
 
 
 class ChatResponse(BaseModel):
     message: str
     usage: Optional[dict] = None
+    conversation_id: Optional[str] = None
+
+
+def conversation_scope(user: User, request: ChatRequest) -> Optional[str]:
+    """Per-user key for state shared across the turns of a conversation."""
+    if request.conversation_id is None:
+        return None
+    return f"{user.id}:{request.conversation_id}"
+
+
+async def claim_conversation(db: AsyncSession, user: User, request: ChatRequest) -> None:
+    """
+    Resolve the request's conversation for the user, creating a new one
+    if none was given.
+
+    Raises:
+        HTTPException: 403 if the conversation belongs to another user
+    """
+    try:
+        request.conversation_id = await conversation_owners.claim(
+            db, user.id, request.conversation_id, request.project_id
+        )
+    except ConversationAccessError:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Conversation belongs to another user"
+        )
+
+
+def fit_context(messages: List[dict]) -> List[dict]:
+    """Trim messages to the smallest budget among the models the call may be routed to."""
+    models = openrouter_client.candidates(Priority.INTERACTIVE)
+    return context_window.fit(messages, min(models, key=context_window.budget_for))
+
+
+def new_turns(request: ChatRequest, reply: str) -> List[dict]:
+    """The turns this request adds to the conversation: last user message and reply."""
+    turns = []
+    if request.messages and request.messages[-1].role == "user":
+        turns.append({"role": "user", "content": request.messages[-1].content})
+    turns.append({"role": "assistant", "content": reply})
+    return turns
+
+
+async def persist_reply(
+    stream: AsyncIterator[str],
+    request: ChatRequest,
+    user: User
+) -> AsyncIterator[str]:
+    """Pass a token stream through, saving the turn once it completes."""
+    parts = []
+    async for token in stream:
+        parts.append(token)
+        yield token
+    
+    # Upstream does not report usage on streams; count the request only
+    await write_behind.save_turns(
+        user.id,
+        request.conversation_id,
+        request.project_id,
+        new_turns(request, "".join(parts))
+    )
+    await write_behind.record_usage(user.id)
+
+
+def record_abandoned_stream(max_tokens: int, delivered: int) -> None:
+    """Account for a stream cancelled because its client went away."""
+    CHAT_STREAMS_ABANDONED.inc()
+    CHAT_STREAM_TOKENS_SAVED.inc(max(0, max_tokens - delivered))
 
 
 @router.post("/", response_model=ChatResponse)
@@ -45,27 +140,53 @@ async def chat(
     Send a chat message and get a response from Grok-4.
     Non-streaming endpoint.
     """
+    await claim_conversation(db, current_user, request)
+    
     try:
         # Convert Pydantic models to dicts
         messages = [{"role": msg.role, "content": msg.content} for msg in request.messages]
+        messages = fit_context(messages)
         
         # Call OpenRouter
         response = await openrouter_client.chat_completion(
             messages=messages,
             stream=False,
             temperature=request.temperature,
-            max_tokens=request.max_tokens
+            max_tokens=request.max_tokens,
+            cache=request.cache,
+            conversation_id=conversation_scope(current_user, request),
+            user_id=current_user.id
         )
         
         # Extract response
         message_content = response["choices"][0]["message"]["content"]
         usage = response.get("usage", {})
         
-        # TODO: Save chat message to database
-        # TODO: Update user usage metrics
+        # Written by the write-behind flusher, off the response path
+        await write_behind.save_turns(
+            current_user.id,
+            request.conversation_id,
+            request.project_id,
+            new_turns(request, message_content)
+        )
+        await write_behind.record_usage(
+            current_user.id,
+            prompt_tokens=usage.get("prompt_tokens", 0),
+            completion_tokens=usage.get("completion_tokens", 0)
+        )
         
-        return ChatResponse(message=message_content, usage=usage)
+        return ChatResponse(
+            message=message_content,
+            usage=usage,
+            conversation_id=request.conversation_id
+        )
     
+    except CircuitOpenError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": str(math.ceil(e.retry_in))}
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -73,54 +194,196 @@ async def chat(
         )
 
 
+async def open_token_stream(request: ChatRequest, user: User) -> AsyncIterator[str]:
+    """Start the upstream completion and shape its tokens for SSE output."""
+    messages = [{"role": msg.role, "content": msg.content} for msg in request.messages]
+    messages = fit_context(messages)
+    
+    stream = await openrouter_client.chat_completion(
+        messages=messages,
+        stream=True,
+        temperature=request.temperature,
+        max_tokens=request.max_tokens,
+        cache=request.cache,
+        conversation_id=conversation_scope(user, request),
+        user_id=user.id
+    )
+    
+    # The relay cancels the upstream stream as soon as its consumer goes
+    # away, instead of draining it
+    stream = relay_tokens(
+        stream,
+        max_buffered=settings.SSE_RELAY_QUEUE_SIZE,
+        on_abandon=lambda delivered: record_abandoned_stream(
+            request.max_tokens, delivered
+        )
+    )
+    stream = coalesce_tokens(
+        stream,
+        window=settings.SSE_COALESCE_WINDOW_MS / 1000,
+        max_bytes=settings.SSE_COALESCE_MAX_BYTES
+    )
+    return persist_reply(stream, request, user)
+
+
+def parse_last_event_id(value: Optional[str]) -> Optional[Tuple[str, str]]:
+    """Split a `{generation_id}:{entry_id}` event ID."""
+    if not value:
+        return None
+    generation_id, sep, entry_id = value.partition(":")
+    if not sep or not generation_id or not entry_id:
+        return None
+    return generation_id, entry_id
+
+
+async def generation_events(generation_id: str, after: str) -> AsyncIterator[bytes]:
+    """Serve a logged generation as SSE, resuming after entry `after`."""
+    try:
+        async for entry_id, fields in generation_log.tail(generation_id, after):
+            event_id = f"{generation_id}:{entry_id}" if entry_id else None
+            kind = fields.get("type")
+            
+            if kind == "token":
+                yield encode_token(fields["content"], event_id)
+            elif kind == "start":
+                yield encode_event({
+                    "type": "start",
+                    "generation_id": generation_id,
+                    "conversation_id": fields.get("conversation_id"),
+                }, event_id)
+            elif kind == "complete":
+                yield encode_event({"type": "complete"}, event_id)
+            else:
+                yield encode_event({"type": "error", "message": fields.get("message", "")}, event_id)
+    
+    except Exception as e:
+        yield encode_event({"type": "error", "message": str(e)})
+
+
+def sse_response(events: AsyncIterator[bytes]) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+        }
+    )
+
+
+async def resume_generation(
+    generation_id: str,
+    after: str,
+    user: User
+) -> StreamingResponse:
+    owner = await generation_log.owner(generation_id)
+    if owner is None or owner != str(user.id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Generation not found"
+        )
+    return sse_response(generation_events(generation_id, after))
+
+
 @router.post("/stream")
 async def chat_stream(
     request: ChatRequest,
     current_user: User = Depends(get_current_user),
+    last_event_id: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Send a chat message and stream the response from Grok-4.
     Uses Server-Sent Events (SSE) for streaming.
+    
+    With resumable streams enabled, the generation runs in the background
+    and is logged to Redis; event IDs are `{generation_id}:{entry_id}`, and
+    a request carrying one in Last-Event-ID resumes that generation instead
+    of starting a new one.
     """
-    async def event_generator():
+    if settings.CHAT_RESUMABLE_STREAMS:
+        resume_from = parse_last_event_id(last_event_id)
+        if resume_from:
+            return await resume_generation(*resume_from, current_user)
+    
+    await claim_conversation(db, current_user, request)
+    
+    if settings.CHAT_RESUMABLE_STREAMS:
+        generation_id = uuid.uuid4().hex
         try:
-            messages = [{"role": msg.role, "content": msg.content} for msg in request.messages]
-            
-            stream = await openrouter_client.chat_completion(
-                messages=messages,
-                stream=True,
-                temperature=request.temperature,
-                max_tokens=request.max_tokens
+            await generation_log.start(
+                generation_id,
+                str(current_user.id),
+                lambda: open_token_stream(request, current_user),
+                metadata={"conversation_id": request.conversation_id}
             )
+            return sse_response(generation_events(generation_id, "0-0"))
+        except RedisError as e:
+            logger.warning(f"Generation log unavailable, streaming directly: {e}")
+    
+    async def event_generator():
+        # The conversation may be new, so tell the client its ID up front
+        yield encode_event({"type": "start", "conversation_id": request.conversation_id})
+        try:
+            stream = await open_token_stream(request, current_user)
             
             async for token in stream:
-                # Send token as SSE event
-                yield f"data: {json.dumps({'type': 'token', 'content': token})}\n\n"
+                # Send token (or a burst of tokens) as SSE event
+                yield encode_token(token)
             
             # Send completion event
-            yield f"data: {json.dumps({'type': 'complete'})}\n\n"
+            yield COMPLETE_EVENT
         
         except Exception as e:
             # Send error event
-            yield f"data: {json.dumps({'type': 'error', 'message': str(e)})}\n\n"
+            yield encode_event({"type": "error", "message": str(e)})
     
-    return StreamingResponse(
-        event_generator(),
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-        }
-    )
+    return sse_response(event_generator())
+
+
+@router.get("/stream/{generation_id}")
+async def resume_chat_stream(
+    generation_id: str,
+    current_user: User = Depends(get_current_user),
+    last_event_id: Optional[str] = Header(None),
+):
+    """
+    Resume (or replay) a logged generation.
+    Continues after Last-Event-ID when it belongs to this generation.
+    """
+    after = "0-0"
+    resume_from = parse_last_event_id(last_event_id)
+    if resume_from and resume_from[0] == generation_id:
+        after = resume_from[1]
+    return await resume_generation(generation_id, after, current_user)
 
 
 @router.get("/history")
 async def get_chat_history(
     project_id: Optional[str] = None,
-    limit: int = 50,
+    conversation_id: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
     current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
-    """Get chat history for a user or project."""
-    # TODO: Implement database query for chat history
-    return {"messages": [], "total": 0}
+    """
+    Get chat history for a user, project or conversation, newest first.
+    Pass the returned next_cursor to fetch the following page.
+    """
+    try:
+        messages, next_cursor = await fetch_history(
+            db,
+            current_user.id,
+            project_id=project_id,
+            conversation_id=conversation_id,
+            limit=limit,
+            cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    return {"messages": messages, "next_cursor": next_cursor}
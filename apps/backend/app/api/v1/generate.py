@@ -4,14 +4,12 @@ Handles task planning and code generation using Grok-4.
 """
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.responses import StreamingResponse
-from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
-from typing import Optional, Dict, Any
-import json
+from typing import Any, AsyncGenerator, Dict, Optional
 
-from app.core.database import get_db
+from app.core.sse import encode_event
+from app.services.generation_engine import PlanValidationError, generation_engine, topological_order
 from app.services.task_planner import task_planner
-from app.services.openrouter import openrouter_client
 from app.api.dependencies import get_current_user
 from app.models.user import User
 
@@ -32,15 +30,110 @@ class ExecuteGenerationRequest(BaseModel):
     plan: Dict[str, Any]
 
 
-CODE_GENERATION_SYSTEM_PROMPT = """You are an expert software engineer.
-Generate clean, production-ready code based on the task description.
+class RunGenerationRequest(BaseModel):
+    project_id: str
+    prompt: str
+    context: Optional[Dict[str, Any]] = None
+
+
+def stream_events(events: AsyncGenerator[Dict[str, Any], None], project_id: str) -> StreamingResponse:
+    """Serve engine events as Server-Sent Events tagged with the project."""
+    async def event_generator():
+        try:
+            async for event in events:
+                yield encode_event({**event, "project_id": project_id})
+        except Exception as e:
+            yield encode_event({"type": "error", "message": str(e)})
+        finally:
+            # Cancels in-flight tasks if the client went away
+            await events.aclose()
+
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+        }
+    )
+
+
+@router.post("/plan", response_model=GeneratePlanResponse)
+async def generate_plan(
+    request: GeneratePlanRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """Break a project description down into a task plan."""
+    try:
+        plan = await task_planner.create_plan(
+            request.prompt, request.context, user_id=current_user.id
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=str(e)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Planning error: {str(e)}"
+        )
+
+    return GeneratePlanResponse(plan=plan)
+
+
+@router.post("/execute")
+async def execute_generation(
+    request: ExecuteGenerationRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Execute a task plan, generating independent tasks in parallel.
+    Streams per-task progress as Server-Sent Events.
+    """
+    tasks = request.plan.get("tasks")
+    if not isinstance(tasks, list):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Plan missing 'tasks' field"
+        )
+
+    try:
+        # Reject unrunnable plans before the stream starts
+        for i, task in enumerate(tasks):
+            if not isinstance(task, dict):
+                raise PlanValidationError(f"Task {i+1} is not an object")
+            task.setdefault("id", f"task-{i+1}")
+            task.setdefault("dependencies", [])
+            if "title" not in task:
+                raise PlanValidationError(f"Task {task['id']} missing 'title'")
+        topological_order(tasks)
+    except PlanValidationError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=str(e)
+        )
+
+    return stream_events(
+        generation_engine.run(request.plan, user_id=current_user.id),
+        request.project_id
+    )
 
-Rules:
-1. Output ONLY code in triple backticks with file path
-2. Follow framework best practices and conventions
-3. Include proper TypeScript types and error handling
-4. Add brief comments for complex logic
-5. Use modern syntax and patterns
-6. Never include API keys or secrets
 
-Format:
+@router.post("/run")
+async def run_generation(
+    request: RunGenerationRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Plan and execute a project in one stream.
+    Each task starts generating as soon as the planner has emitted it and
+    its dependencies are done, instead of after the whole plan is written.
+    """
+    parts = task_planner.stream_plan(
+        request.prompt, request.context, user_id=current_user.id
+    )
+    return stream_events(
+        generation_engine.run_stream(parts, user_id=current_user.id),
+        request.project_id
+    )
@@ -6,7 +6,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 from typing import List, Optional
 
-from app.core.database import get_db
+from app.core.database import get_db, get_read_db
 from app.api.dependencies import get_current_user
 from app.models.user import User
 
@@ -36,7 +36,7 @@ class ProjectResponse(BaseModel):
 @router.get("/", response_model=List[ProjectResponse])
 async def list_projects(
     current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """List all projects for the current user."""
     # TODO: Implement database query
@@ -58,7 +58,7 @@ async def create_project(
 async def get_project(
     project_id: str,
     current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get a specific project by ID."""
     # TODO: Implement project retrieval
@@ -69,7 +69,7 @@ async def get_project(
 async def get_project_files(
     project_id: str,
     current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get all files for a project."""
     # TODO: Implement file retrieval
@@ -0,0 +1,89 @@
+"""
+In-process caching primitives.
+Bounded LRU mapping with optional per-entry TTL, safe for use on the event loop.
+"""
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Generic, Hashable, Optional, TypeVar
+
+V = TypeVar("V")
+
+_MISSING = object()
+
+
+class LRUCache(Generic[V]):
+    """
+    Bounded least-recently-used cache.
+
+    Entries expire after `ttl` seconds when one is set, either globally or
+    per entry. When `max_bytes` is given, entries are also evicted until the
+    total `sizeof` of all values fits the budget. The cache is not
+    thread-safe; it is meant to be owned by a single event loop.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+        sizeof: Callable[[Any], int] = len,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.total_bytes = 0
+        self._data: "OrderedDict[Hashable, tuple[Any, Optional[float]]]" = OrderedDict()
+
+    def _size(self, value: Any) -> int:
+        return self.sizeof(value) if self.max_bytes is not None else 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value, refreshing its recency, or `default`."""
+        entry = self._data.get(key, _MISSING)
+        if entry is _MISSING:
+            return default
+
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            self.pop(key)
+            return default
+
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: V, ttl: Optional[float] = None) -> None:
+        """Insert or replace a value, evicting the oldest entries if full."""
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+
+        self.pop(key)
+        self._data[key] = (value, expires_at)
+        self.total_bytes += self._size(value)
+
+        while len(self._data) > self.maxsize or (
+            self.max_bytes is not None
+            and self.total_bytes > self.max_bytes
+            and len(self._data) > 1
+        ):
+            _, (evicted, _) = self._data.popitem(last=False)
+            self.total_bytes -= self._size(evicted)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Remove a key and return its value (expired or not)."""
+        entry = self._data.pop(key, _MISSING)
+        if entry is _MISSING:
+            return default
+        self.total_bytes -= self._size(entry[0])
+        return entry[0]
+
+    def clear(self) -> None:
+        """Drop all entries."""
+        self._data.clear()
+        self.total_bytes = 0
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self) -> int:
+        return len(self._data)
@@ -2,9 +2,27 @@
 Application configuration using Pydantic settings.
 Loads environment variables and provides typed configuration.
 """
-from typing import List
+from typing import Dict, List
 from pydantic_settings import BaseSettings
-from pydantic import Field
+from pydantic import BaseModel, Field
+
+
+class ModelRoutingPolicy(BaseModel):
+    """
+    Upstream models per call class (interactive, planning, bulk), in order
+    of preference; later models are fallbacks. A call class without a
+    route uses OPENROUTER_MODEL followed by `fallbacks`; both are empty by
+    default, so other models or providers are only used when configured.
+    A later healthy model is promoted when its measured throughput beats
+    the preferred one's by `prefer_faster_ratio` (after `min_samples`
+    calls each).
+    """
+    
+    routes: Dict[str, List[str]] = {}
+    fallbacks: List[str] = []
+    prefer_faster_ratio: float = 1.5
+    min_samples: int = 10
+    ewma_alpha: float = 0.2
 
 
 class Settings(BaseSettings):
@@ -27,6 +45,15 @@ class Settings(BaseSettings):
     
     # Database
     DATABASE_URL: str = Field(..., env="DATABASE_URL")
+    DATABASE_POOL_SIZE: int = Field(default=10, env="DATABASE_POOL_SIZE")
+    DATABASE_MAX_OVERFLOW: int = Field(default=20, env="DATABASE_MAX_OVERFLOW")
+    # Read replicas used by get_read_db (reads use the primary when empty)
+    DATABASE_REPLICA_URLS: List[str] = Field(default=[], env="DATABASE_REPLICA_URLS")
+    DATABASE_REPLICA_MAX_LAG_SECONDS: float = Field(default=5.0, env="DATABASE_REPLICA_MAX_LAG_SECONDS")
+    DATABASE_REPLICA_CHECK_INTERVAL_SECONDS: float = Field(
+        default=10.0,
+        env="DATABASE_REPLICA_CHECK_INTERVAL_SECONDS"
+    )
     
     # Redis
     REDIS_URL: str = Field(..., env="REDIS_URL")
@@ -35,13 +62,115 @@ class Settings(BaseSettings):
     JWT_SECRET: str = Field(..., env="JWT_SECRET")
     JWT_ALGORITHM: str = "HS256"
     JWT_EXPIRATION_MINUTES: int = 60 * 24 * 7  # 7 days
+    JWT_CACHE_SIZE: int = Field(default=4096, env="JWT_CACHE_SIZE")
     SESSION_SECRET: str = Field(..., env="SESSION_SECRET")
     
+    # Outbound HTTP clients (shared per upstream host)
+    HTTP_TIMEOUT_SECONDS: float = Field(default=30.0, env="HTTP_TIMEOUT_SECONDS")
+    HTTP_MAX_CONNECTIONS: int = Field(default=100, env="HTTP_MAX_CONNECTIONS")
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = Field(default=20, env="HTTP_MAX_KEEPALIVE_CONNECTIONS")
+    HTTP_KEEPALIVE_EXPIRY_SECONDS: float = Field(default=30.0, env="HTTP_KEEPALIVE_EXPIRY_SECONDS")
+    HTTP2_ENABLED: bool = Field(default=True, env="HTTP2_ENABLED")
+    
     # OpenRouter (Grok-4)
     OPENROUTER_API_KEY: str = Field(..., env="OPENROUTER_API_KEY")
     OPENROUTER_BASE_URL: str = "https://openrouter.ai/api/v1"
     OPENROUTER_MODEL: str = "xai/grok-beta"
     
+    # Completion cache (opt-in per call)
+    COMPLETION_CACHE_ENABLED: bool = Field(default=True, env="COMPLETION_CACHE_ENABLED")
+    COMPLETION_CACHE_TTL_SECONDS: int = Field(default=3600, env="COMPLETION_CACHE_TTL_SECONDS")
+    COMPLETION_CACHE_LOCAL_MAX_ENTRIES: int = Field(default=1000, env="COMPLETION_CACHE_LOCAL_MAX_ENTRIES")
+    COMPLETION_CACHE_LOCAL_MAX_BYTES: int = Field(default=32 * 1024 * 1024, env="COMPLETION_CACHE_LOCAL_MAX_BYTES")
+    COMPLETION_CACHE_MAX_ENTRY_BYTES: int = Field(default=256 * 1024, env="COMPLETION_CACHE_MAX_ENTRY_BYTES")
+    COMPLETION_CACHE_REPLAY_CHUNK_CHARS: int = Field(default=32, env="COMPLETION_CACHE_REPLAY_CHUNK_CHARS")
+    
+    # Secret redaction rule sets applied to user prompts (see app.core.redaction)
+    REDACTION_RULE_SETS: List[str] = Field(default=["credentials", "providers"], env="REDACTION_RULE_SETS")
+    
+    # Memo of sanitized user messages; the Redis tier is per conversation (0 disables it)
+    SANITIZE_MEMO_MAX_ENTRIES: int = Field(default=10000, env="SANITIZE_MEMO_MAX_ENTRIES")
+    SANITIZE_MEMO_MAX_BYTES: int = Field(default=16 * 1024 * 1024, env="SANITIZE_MEMO_MAX_BYTES")
+    SANITIZE_MEMO_REDIS_TTL_SECONDS: int = Field(default=86400, env="SANITIZE_MEMO_REDIS_TTL_SECONDS")
+    
+    # Chat SSE output: tokens arriving within the window share one event (0 disables)
+    SSE_COALESCE_WINDOW_MS: int = Field(default=20, env="SSE_COALESCE_WINDOW_MS")
+    SSE_COALESCE_MAX_BYTES: int = Field(default=1024, env="SSE_COALESCE_MAX_BYTES")
+    # Tokens buffered per stream between the upstream reader and a slow client
+    SSE_RELAY_QUEUE_SIZE: int = Field(default=64, env="SSE_RELAY_QUEUE_SIZE")
+    
+    # Resumable chat streams: generations are logged to Redis Streams and
+    # tailed by clients on a Redis pool of their own; once the last reader
+    # leaves, the upstream is cancelled unless a client reconnects within
+    # the grace period
+    CHAT_RESUMABLE_STREAMS: bool = Field(default=True, env="CHAT_RESUMABLE_STREAMS")
+    GENERATION_LOG_TTL_SECONDS: int = Field(default=3600, env="GENERATION_LOG_TTL_SECONDS")
+    GENERATION_LOG_COMPLETED_TTL_SECONDS: int = Field(default=300, env="GENERATION_LOG_COMPLETED_TTL_SECONDS")
+    GENERATION_LOG_MAX_ENTRIES: int = Field(default=20000, env="GENERATION_LOG_MAX_ENTRIES")
+    GENERATION_LOG_READER_GRACE_SECONDS: float = Field(default=5.0, env="GENERATION_LOG_READER_GRACE_SECONDS")
+    GENERATION_LOG_BLOCK_MS: int = Field(default=5000, env="GENERATION_LOG_BLOCK_MS")
+    REDIS_STREAM_MAX_CONNECTIONS: int = Field(default=200, env="REDIS_STREAM_MAX_CONNECTIONS")
+    REDIS_STREAM_POOL_TIMEOUT_SECONDS: float = Field(default=10.0, env="REDIS_STREAM_POOL_TIMEOUT_SECONDS")
+    
+    # Model routing and fallback per call class (JSON in the environment)
+    LLM_ROUTING: ModelRoutingPolicy = Field(default_factory=ModelRoutingPolicy, env="LLM_ROUTING")
+    
+    # Upstream admission control: concurrent calls (match the provider quota) and
+    # fair-queuing weight per priority class
+    LLM_MAX_CONCURRENCY: int = Field(default=16, env="LLM_MAX_CONCURRENCY")
+    LLM_PRIORITY_WEIGHTS: Dict[str, float] = Field(
+        default={"interactive": 8.0, "planning": 4.0, "bulk": 1.0},
+        env="LLM_PRIORITY_WEIGHTS"
+    )
+    
+    # Upstream resilience: jittered retries (honouring Retry-After up to a cap) paid
+    # from a token-bucket budget, a circuit breaker, and p95-latency hedging
+    LLM_RETRY_MAX_ATTEMPTS: int = Field(default=4, env="LLM_RETRY_MAX_ATTEMPTS")
+    LLM_RETRY_BASE_DELAY_MS: int = Field(default=250, env="LLM_RETRY_BASE_DELAY_MS")
+    LLM_RETRY_MAX_DELAY_MS: int = Field(default=10000, env="LLM_RETRY_MAX_DELAY_MS")
+    LLM_RETRY_AFTER_MAX_SECONDS: float = Field(default=30.0, env="LLM_RETRY_AFTER_MAX_SECONDS")
+    LLM_RETRY_BUDGET_RATIO: float = Field(default=0.2, env="LLM_RETRY_BUDGET_RATIO")
+    LLM_RETRY_BUDGET_MIN_PER_SECOND: float = Field(default=1.0, env="LLM_RETRY_BUDGET_MIN_PER_SECOND")
+    LLM_RETRY_BUDGET_CAPACITY: float = Field(default=20.0, env="LLM_RETRY_BUDGET_CAPACITY")
+    LLM_BREAKER_FAILURE_THRESHOLD: int = Field(default=5, env="LLM_BREAKER_FAILURE_THRESHOLD")
+    LLM_BREAKER_RESET_SECONDS: float = Field(default=30.0, env="LLM_BREAKER_RESET_SECONDS")
+    LLM_HEDGE_ENABLED: bool = Field(default=True, env="LLM_HEDGE_ENABLED")
+    LLM_HEDGE_MIN_SAMPLES: int = Field(default=20, env="LLM_HEDGE_MIN_SAMPLES")
+    
+    # Prompt token budget per upstream model; older turns beyond it are summarized
+    CONTEXT_TOKEN_BUDGETS: Dict[str, int] = Field(
+        default={"xai/grok-beta": 96000},
+        env="CONTEXT_TOKEN_BUDGETS"
+    )
+    CONTEXT_DEFAULT_TOKEN_BUDGET: int = Field(default=24000, env="CONTEXT_DEFAULT_TOKEN_BUDGET")
+    CONTEXT_SUMMARY_MAX_TOKENS: int = Field(default=512, env="CONTEXT_SUMMARY_MAX_TOKENS")
+    CONTEXT_TOKEN_CACHE_SIZE: int = Field(default=50000, env="CONTEXT_TOKEN_CACHE_SIZE")
+    
+    # Plan execution: independent tasks generated concurrently, up to this many at once
+    GENERATION_MAX_CONCURRENCY: int = Field(default=4, env="GENERATION_MAX_CONCURRENCY")
+    GENERATION_TASK_MAX_TOKENS: int = Field(default=4096, env="GENERATION_TASK_MAX_TOKENS")
+    
+    # Chat persistence and usage counters are batched off the response path
+    WRITE_BEHIND_FLUSH_INTERVAL_MS: int = Field(default=500, env="WRITE_BEHIND_FLUSH_INTERVAL_MS")
+    WRITE_BEHIND_MAX_BATCH: int = Field(default=500, env="WRITE_BEHIND_MAX_BATCH")
+    # Conversation owners cached for the synchronous ownership check
+    CONVERSATION_OWNER_CACHE_SIZE: int = Field(default=100000, env="CONVERSATION_OWNER_CACHE_SIZE")
+    # Attempts before a failing batch is split and its bad records dead-lettered
+    WRITE_BEHIND_MAX_ATTEMPTS: int = Field(default=5, env="WRITE_BEHIND_MAX_ATTEMPTS")
+    # Buffer cap; when full, writers wait this long for space before records are shed
+    WRITE_BEHIND_MAX_BUFFERED: int = Field(default=50000, env="WRITE_BEHIND_MAX_BUFFERED")
+    WRITE_BEHIND_ENQUEUE_TIMEOUT_MS: int = Field(default=2000, env="WRITE_BEHIND_ENQUEUE_TIMEOUT_MS")
+    # Applied record IDs are kept this long so replayed records are written once
+    WRITE_BEHIND_RECEIPT_TTL_HOURS: int = Field(default=24, env="WRITE_BEHIND_RECEIPT_TTL_HOURS")
+    
+    # Response compression (zstd/brotli when installed, else gzip); SSE is skipped unless enabled
+    COMPRESSION_MINIMUM_SIZE: int = Field(default=1000, env="COMPRESSION_MINIMUM_SIZE")
+    COMPRESSION_STREAMS: bool = Field(default=False, env="COMPRESSION_STREAMS")
+    
+    # Share one upstream call between identical in-flight completions
+    # (cacheable or temperature-0 calls only)
+    LLM_SINGLE_FLIGHT_ENABLED: bool = Field(default=True, env="LLM_SINGLE_FLIGHT_ENABLED")
+    
     # GitHub OAuth
     GITHUB_CLIENT_ID: str = Field(..., env="GITHUB_CLIENT_ID")
     GITHUB_CLIENT_SECRET: str = Field(..., env="GITHUB_CLIENT_SECRET")
@@ -62,9 +191,28 @@ class Settings(BaseSettings):
     # Sentry
     SENTRY_DSN: str = Field(default="", env="SENTRY_DSN")
     
+    # User cache (process-local LRU -> Redis hash -> users table)
+    USER_CACHE_LOCAL_TTL_SECONDS: float = Field(default=30, env="USER_CACHE_LOCAL_TTL_SECONDS")
+    USER_CACHE_REDIS_TTL_SECONDS: int = Field(default=600, env="USER_CACHE_REDIS_TTL_SECONDS")
+    USER_CACHE_MAX_ENTRIES: int = Field(default=10000, env="USER_CACHE_MAX_ENTRIES")
+    
     # Rate Limiting
     RATE_LIMIT_MAX_REQUESTS: int = Field(default=100, env="RATE_LIMIT_MAX_REQUESTS")
     RATE_LIMIT_WINDOW_MS: int = Field(default=900000, env="RATE_LIMIT_WINDOW_MS")
+    # Token cost per route prefix (longest match wins, default cost is 1)
+    RATE_LIMIT_ROUTE_COSTS: Dict[str, int] = Field(
+        default={
+            "/api/chat/stream": 5,
+            "/api/chat": 3,
+            "/api/generate": 5,
+        },
+        env="RATE_LIMIT_ROUTE_COSTS"
+    )
+    # Local lease tier: spend batches of tokens in-process between Redis calls
+    RATE_LIMIT_LEASE_ENABLED: bool = Field(default=False, env="RATE_LIMIT_LEASE_ENABLED")
+    RATE_LIMIT_LEASE_SIZE: int = Field(default=10, env="RATE_LIMIT_LEASE_SIZE")
+    RATE_LIMIT_LEASE_TTL_MS: int = Field(default=5000, env="RATE_LIMIT_LEASE_TTL_MS")
+    RATE_LIMIT_LEASE_MAX_USERS: int = Field(default=10000, env="RATE_LIMIT_LEASE_MAX_USERS")
     
     # Sandbox
     SANDBOX_TIMEOUT_MS: int = Field(default=30000, env="SANDBOX_TIMEOUT_MS")
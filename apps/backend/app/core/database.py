@@ -2,17 +2,59 @@
 Database configuration and session management.
 Uses SQLAlchemy 2.0 async engine with PostgreSQL.
 """
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-from sqlalchemy.orm import declarative_base
+import time
+from typing import Callable, Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Session, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
 from app.core.config import settings
+from app.core.db_router import DatabaseRouter
+from app.core.metrics import DB_POOL_CHECKOUT_WAIT, register_pool
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long each checkout waits for a connection."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_CHECKOUT_WAIT.labels(pool=self.logging_name).observe(
+                time.perf_counter() - start
+            )
+
+
+def create_engine(url: str, name: str) -> AsyncEngine:
+    """Create an instrumented async engine; `name` labels its pool metrics."""
+    engine = create_async_engine(
+        url.replace("postgresql://", "postgresql+asyncpg://"),
+        echo=settings.DEBUG,
+        pool_pre_ping=True,
+        pool_size=settings.DATABASE_POOL_SIZE,
+        max_overflow=settings.DATABASE_MAX_OVERFLOW,
+        poolclass=InstrumentedPool,
+        pool_logging_name=name,
+    )
+    register_pool(name, engine.pool)
+    return engine
+
 
 # Create async engine
-engine = create_async_engine(
-    settings.DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://"),
-    echo=settings.DEBUG,
-    pool_pre_ping=True,
-    pool_size=10,
-    max_overflow=20,
+engine = create_engine(settings.DATABASE_URL, "primary")
+
+# Route read-only sessions across replicas, falling back to the primary
+database_router = DatabaseRouter(
+    engine,
+    [
+        (f"replica-{i}", create_engine(url, f"replica-{i}"))
+        for i, url in enumerate(settings.DATABASE_REPLICA_URLS)
+    ],
+    max_lag=settings.DATABASE_REPLICA_MAX_LAG_SECONDS,
+    check_interval=settings.DATABASE_REPLICA_CHECK_INTERVAL_SECONDS,
 )
 
 # Create async session factory
@@ -24,18 +66,105 @@ AsyncSessionLocal = async_sessionmaker(
     autoflush=False,
 )
 
+# Bound per session to the engine chosen by database_router
+ReadSessionLocal = async_sessionmaker(
+    class_=AsyncSession,
+    expire_on_commit=False,
+    autocommit=False,
+    autoflush=False,
+)
+
 # Base class for models
 Base = declarative_base()
 
 
+class LazySession:
+    """
+    Stand-in for an AsyncSession that is only created on first use.
+
+    Endpoints that declare a database dependency but never touch it pay
+    nothing; the session itself only checks out a pooled connection when a
+    statement is executed.
+    """
+
+    def __init__(self, factory: Callable[[], AsyncSession]):
+        self._factory = factory
+        self._session: Optional[AsyncSession] = None
+
+    @property
+    def session(self) -> AsyncSession:
+        if self._session is None:
+            self._session = self._factory()
+        return self._session
+
+    @property
+    def started(self) -> bool:
+        return self._session is not None
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+
+def has_pending_writes(session: AsyncSession) -> bool:
+    """Whether committing this session would persist anything."""
+    return bool(
+        session.info.get("has_writes")
+        or session.new
+        or session.dirty
+        or session.deleted
+    )
+
+
+@event.listens_for(Session, "after_flush")
+def _mark_flushed(session: Session, flush_context) -> None:
+    session.info["has_writes"] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _mark_write_statements(orm_execute_state) -> None:
+    # Bulk DML and textual statements bypass the flush, so treat anything
+    # that is not a SELECT as a write
+    if not orm_execute_state.is_select:
+        orm_execute_state.session.info["has_writes"] = True
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def _clear_writes(session: Session) -> None:
+    session.info.pop("has_writes", None)
+
+
 async def get_db():
-    """Dependency to get database session."""
-    async with AsyncSessionLocal() as session:
-        try:
-            yield session
-            await session.commit()
-        except Exception:
-            await session.rollback()
-            raise
-        finally:
-            await session.close()
+    """
+    Dependency to get database session.
+
+    The session is created lazily and only committed if something was
+    written; read-only or unused sessions are simply closed.
+    """
+    db = LazySession(AsyncSessionLocal)
+    try:
+        yield db
+        if db.started and has_pending_writes(db.session):
+            await db.session.commit()
+    except Exception:
+        if db.started:
+            await db.session.rollback()
+        raise
+    finally:
+        if db.started:
+            await db.session.close()
+
+
+async def get_read_db():
+    """
+    Dependency to get a read-only database session.
+
+    Bound to a healthy read replica when DATABASE_REPLICA_URLS is set, and
+    to the primary otherwise. Never commits.
+    """
+    db = LazySession(lambda: ReadSessionLocal(bind=database_router.read_engine()))
+    try:
+        yield db
+    finally:
+        if db.started:
+            await db.session.close()
@@ -0,0 +1,145 @@
+"""
+Read/write routing across a primary database and its read replicas.
+"""
+import asyncio
+import itertools
+import logging
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.metrics import DB_READ_ROUTES, DB_REPLICA_HEALTHY, DB_REPLICA_LAG
+
+logger = logging.getLogger(__name__)
+
+# Seconds since the last replayed transaction; 0 on a primary. An idle
+# primary makes this grow even without real lag, which errs on the side of
+# routing reads to the primary.
+POSTGRES_LAG_QUERY = text(
+    "SELECT CASE WHEN pg_is_in_recovery() "
+    "THEN COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) "
+    "ELSE 0 END"
+)
+NO_LAG_QUERY = text("SELECT 0")
+
+
+@dataclass
+class Replica:
+    """A read replica and its last observed health."""
+
+    name: str
+    engine: AsyncEngine
+    healthy: bool = True
+    lag: float = 0.0
+
+
+class DatabaseRouter:
+    """
+    Routes writes to the primary and reads to healthy, caught-up replicas.
+
+    Replicas are picked round-robin among those that passed their last
+    health check and whose replication lag is within `max_lag`. Connection
+    errors mark a replica unhealthy immediately; the periodic check brings
+    it back. With no usable replica, reads fall back to the primary.
+    """
+
+    def __init__(
+        self,
+        primary: AsyncEngine,
+        replicas: List[Tuple[str, AsyncEngine]],
+        max_lag: float,
+        check_interval: float,
+        check_timeout: float = 2.0,
+    ):
+        self.primary = primary
+        self.replicas = [Replica(name, engine) for name, engine in replicas]
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.check_timeout = check_timeout
+        self._cycle = itertools.count()
+        self._task: Optional[asyncio.Task] = None
+
+        for replica in self.replicas:
+            self._watch_disconnects(replica)
+            DB_REPLICA_HEALTHY.labels(replica=replica.name).set(1)
+
+    @property
+    def engines(self) -> List[AsyncEngine]:
+        """All distinct engines managed by the router."""
+        return [self.primary] + [replica.engine for replica in self.replicas]
+
+    def read_engine(self) -> AsyncEngine:
+        """Pick the engine for a read-only session."""
+        usable = [
+            replica for replica in self.replicas
+            if replica.healthy and replica.lag <= self.max_lag
+        ]
+        if not usable:
+            DB_READ_ROUTES.labels(target="primary").inc()
+            return self.primary
+
+        replica = usable[next(self._cycle) % len(usable)]
+        DB_READ_ROUTES.labels(target=replica.name).inc()
+        return replica.engine
+
+    def mark_unhealthy(self, replica: Replica) -> None:
+        if replica.healthy:
+            logger.warning(f"Read replica {replica.name} marked unhealthy")
+        replica.healthy = False
+        DB_REPLICA_HEALTHY.labels(replica=replica.name).set(0)
+
+    async def check_replica(self, replica: Replica) -> None:
+        """Probe a replica's availability and replication lag."""
+        query = (
+            POSTGRES_LAG_QUERY
+            if replica.engine.dialect.name == "postgresql"
+            else NO_LAG_QUERY
+        )
+        try:
+            async with replica.engine.connect() as conn:
+                lag = await asyncio.wait_for(
+                    conn.scalar(query), timeout=self.check_timeout
+                )
+        except Exception as e:
+            logger.warning(f"Read replica {replica.name} health check failed: {e}")
+            self.mark_unhealthy(replica)
+            return
+
+        replica.lag = float(lag or 0)
+        replica.healthy = True
+        DB_REPLICA_HEALTHY.labels(replica=replica.name).set(1)
+        DB_REPLICA_LAG.labels(replica=replica.name).set(replica.lag)
+
+    async def check_replicas(self) -> None:
+        await asyncio.gather(*(self.check_replica(r) for r in self.replicas))
+
+    async def _run_checks(self) -> None:
+        while True:
+            await self.check_replicas()
+            await asyncio.sleep(self.check_interval)
+
+    def start(self) -> None:
+        """Start periodic replica health checks (no-op without replicas)."""
+        if self.replicas and self._task is None:
+            self._task = asyncio.create_task(self._run_checks())
+
+    async def stop(self) -> None:
+        """Stop health checks and dispose every engine."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        for engine in self.engines:
+            await engine.dispose()
+
+    def _watch_disconnects(self, replica: Replica) -> None:
+        @event.listens_for(replica.engine.sync_engine, "handle_error")
+        def on_error(context):
+            if context.is_disconnect:
+                self.mark_unhealthy(replica)
@@ -0,0 +1,99 @@
+"""
+Shared outbound HTTP clients.
+One pooled, keep-alive (and HTTP/2 when available) client per upstream origin.
+"""
+import importlib.util
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+
+from app.core.config import settings
+from app.core.metrics import register_http_transport
+
+# HTTP/2 needs the optional h2 package (httpx[http2])
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+class HTTPClientRegistry:
+    """
+    Owns one connection pool per origin (scheme, host, port).
+
+    Pools are created on first use and reused for the life of the process,
+    so TLS sessions, DNS results and idle connections are shared between
+    requests and users. Each default timeout gets its own httpx.AsyncClient
+    over the origin's pool, so one caller's timeout never applies to
+    another's requests. Clients carry no credentials: callers pass auth
+    headers per request. The application lifespan closes them on shutdown;
+    a later get() opens them again.
+    """
+
+    def __init__(self, limits: httpx.Limits, http2: bool):
+        self.limits = limits
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self._transports: Dict[str, httpx.AsyncHTTPTransport] = {}
+        self._clients: Dict[Tuple[str, float], httpx.AsyncClient] = {}
+
+    @staticmethod
+    def _origin(url: str) -> str:
+        parsed = httpx.URL(url)
+        port = f":{parsed.port}" if parsed.port else ""
+        return f"{parsed.scheme}://{parsed.host}{port}"
+
+    def get(self, url: str, timeout: Optional[float] = None) -> httpx.AsyncClient:
+        """
+        Get the shared client for the origin of `url`.
+
+        Args:
+            url: Any URL on the upstream (only its origin is used)
+            timeout: Default timeout for the client's requests
+        """
+        origin = self._origin(url)
+        timeout = timeout or settings.HTTP_TIMEOUT_SECONDS
+        client = self._clients.get((origin, timeout))
+
+        if client is None or client.is_closed:
+            transport = self._transports.get(origin)
+            if transport is None:
+                transport = httpx.AsyncHTTPTransport(limits=self.limits, http2=self.http2)
+                self._transports[origin] = transport
+                register_http_transport(httpx.URL(origin).host, transport)
+            client = httpx.AsyncClient(transport=transport, timeout=timeout)
+            self._clients[(origin, timeout)] = client
+
+        return client
+
+    async def aclose(self) -> None:
+        """Close every client (called from the application lifespan)."""
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients.clear()
+        self._transports.clear()
+
+
+class SharedClient:
+    """
+    Service attribute resolving to the registry's client for `base_url`.
+
+    Looked up on every access rather than stored, so a service created at
+    import time follows the registry across shutdown and reopen. Assigning
+    the attribute on an instance (e.g. a mock client in tests) overrides it.
+    """
+
+    def __init__(self, timeout: Optional[float] = None):
+        self.timeout = timeout
+
+    def __get__(self, instance: Any, owner: type) -> Any:
+        if instance is None:
+            return self
+        return http_clients.get(instance.base_url, timeout=self.timeout)
+
+
+# Global client registry
+http_clients = HTTPClientRegistry(
+    limits=httpx.Limits(
+        max_connections=settings.HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY_SECONDS,
+    ),
+    http2=settings.HTTP2_ENABLED,
+)
@@ -0,0 +1,278 @@
+"""
+Incremental JSON scanning for streamed model output.
+Emits nested objects as soon as they close, repairing common model mistakes.
+"""
+import json
+import re
+from typing import Any, List, Optional, Sequence, Tuple
+
+Path = Tuple[Any, ...]
+
+# Matches any key or array index in a watched path
+WILDCARD = "*"
+
+_IDENT_START = re.compile(r"[A-Za-z_$]")
+_IDENT = re.compile(r"[\w$-]")
+_LITERALS = {"True": "true", "False": "false", "None": "null", "undefined": "null"}
+_CONTROL_ESCAPES = {"\n": "\\n", "\r": "\\r", "\t": "\\t"}
+
+
+def _drop_trailing_comma(out: List[str]) -> None:
+    k = len(out) - 1
+    while k >= 0 and out[k].isspace():
+        k -= 1
+    if k >= 0 and out[k] == ",":
+        del out[k]
+
+
+def repair_json(text: str) -> str:
+    """
+    Rewrite near-JSON into JSON.
+
+    Fixes what models commonly get wrong: comments, trailing commas,
+    single-quoted strings, unquoted keys, Python literals, raw control
+    characters in strings and unterminated strings.
+    """
+    out: List[str] = []
+    stack: List[str] = []
+    expect_key = False
+    i, n = 0, len(text)
+
+    while i < n:
+        c = text[i]
+
+        if c in "\"'":
+            j = i + 1
+            chars: List[str] = []
+            while j < n and text[j] != c:
+                if text[j] == "\\" and j + 1 < n:
+                    escaped = text[j + 1]
+                    chars.append("'" if c == "'" and escaped == "'" else text[j:j + 2])
+                    j += 2
+                    continue
+                ch = text[j]
+                if c == "'" and ch == '"':
+                    ch = '\\"'
+                chars.append(_CONTROL_ESCAPES.get(ch, ch))
+                j += 1
+            out.append('"' + "".join(chars) + '"')
+            i = j + 1
+        elif text.startswith("//", i):
+            end = text.find("\n", i)
+            i = n if end == -1 else end
+        elif text.startswith("/*", i):
+            end = text.find("*/", i + 2)
+            i = n if end == -1 else end + 2
+        elif c in "{[":
+            stack.append(c)
+            expect_key = c == "{"
+            out.append(c)
+            i += 1
+        elif c in "}]":
+            _drop_trailing_comma(out)
+            if stack:
+                stack.pop()
+            expect_key = False
+            out.append(c)
+            i += 1
+        elif c == ",":
+            expect_key = bool(stack) and stack[-1] == "{"
+            out.append(c)
+            i += 1
+        elif c == ":":
+            expect_key = False
+            out.append(c)
+            i += 1
+        elif _IDENT_START.match(c):
+            j = i
+            while j < n and _IDENT.match(text[j]):
+                j += 1
+            word = text[i:j]
+            out.append(json.dumps(word) if expect_key else _LITERALS.get(word, word))
+            i = j
+        else:
+            out.append(c)
+            i += 1
+
+    return "".join(out)
+
+
+def loads_lenient(text: str) -> Optional[Any]:
+    """Parse JSON, repairing it if needed; None if it is beyond repair."""
+    try:
+        return json.loads(text, strict=False)
+    except ValueError:
+        pass
+    try:
+        return json.loads(repair_json(text), strict=False)
+    except ValueError:
+        return None
+
+
+class _Frame:
+    __slots__ = ("kind", "path", "start", "key", "expect_key", "count")
+
+    def __init__(self, kind: str, path: Path, start: int):
+        self.kind = kind
+        self.path = path
+        self.start = start
+        self.key: Any = None
+        self.expect_key = kind == "object"
+        self.count = 0
+
+
+class JSONStreamParser:
+    """
+    Scans a JSON document as it arrives and emits watched objects early.
+
+    Text before the first `{` (prose, a markdown fence) is skipped, and
+    everything after the top-level object closes is ignored. Each object
+    whose path matches one of `watch` is parsed (leniently) the moment its
+    closing brace arrives and returned from feed() as (path, value); a
+    watched object that cannot be repaired is dropped rather than failing
+    the document. Paths are tuples of keys and array indices from the
+    root, e.g. `("tasks", 3)`; WILDCARD matches any step.
+    """
+
+    def __init__(self, watch: Sequence[Path]):
+        self.watch = [tuple(path) for path in watch]
+        self.document: Optional[Any] = None
+        self.done = False
+        self._buffer = ""
+        self._pos = 0
+        self._stack: List[_Frame] = []
+        self._quote: Optional[str] = None
+        self._string_start = 0
+        self._escape = False
+
+    def feed(self, chunk: str) -> List[Tuple[Path, Any]]:
+        """Scan another chunk; returns the watched objects it completed."""
+        if self.done:
+            return []
+        self._buffer += chunk
+        return self._scan(final=False)
+
+    def close(self) -> List[Tuple[Path, Any]]:
+        """Finish scanning at end of stream."""
+        if self.done:
+            return []
+        return self._scan(final=True)
+
+    def _watched(self, path: Path) -> bool:
+        return any(
+            len(pattern) == len(path)
+            and all(p == WILDCARD or p == step for p, step in zip(pattern, path))
+            for pattern in self.watch
+        )
+
+    def _push(self, kind: str, start: int) -> None:
+        if not self._stack:
+            path: Path = ()
+        else:
+            parent = self._stack[-1]
+            if parent.kind == "object":
+                path = parent.path + (parent.key,)
+            else:
+                path = parent.path + (parent.count,)
+                parent.count += 1
+        self._stack.append(_Frame(kind, path, start))
+
+    def _pop(self, closer: str, end: int) -> List[Tuple[Path, Any]]:
+        kind = "object" if closer == "}" else "array"
+        # A missing closer: implicitly close the containers opened inside
+        while len(self._stack) > 1 and self._stack[-1].kind != kind:
+            self._stack.pop()
+        if self._stack[-1].kind != kind:
+            return []
+
+        frame = self._stack.pop()
+        events = []
+        if frame.kind == "object" and self._watched(frame.path):
+            value = loads_lenient(self._buffer[frame.start:end + 1])
+            if value is not None:
+                events.append((frame.path, value))
+
+        if not self._stack:
+            self.done = True
+            self.document = loads_lenient(self._buffer[frame.start:end + 1])
+        return events
+
+    def _end_string(self, raw: str) -> None:
+        top = self._stack[-1]
+        if top.kind == "object" and top.expect_key:
+            try:
+                top.key = json.loads(f'"{raw}"')
+            except ValueError:
+                top.key = raw
+
+    def _scan(self, final: bool) -> List[Tuple[Path, Any]]:
+        events: List[Tuple[Path, Any]] = []
+        buf = self._buffer
+        i = self._pos
+
+        while i < len(buf) and not self.done:
+            c = buf[i]
+
+            if not self._stack:
+                if c == "{":
+                    self._push("object", i)
+                i += 1
+                continue
+
+            if self._quote is not None:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == self._quote:
+                    self._quote = None
+                    self._end_string(buf[self._string_start + 1:i])
+                i += 1
+                continue
+
+            if c in "\"'":
+                self._quote = c
+                self._string_start = i
+                i += 1
+                continue
+
+            if c == "/":
+                if i + 1 == len(buf) and not final:
+                    break  # Need the next character to tell if it is a comment
+                following = buf[i + 1:i + 2]
+                if following in ("/", "*"):
+                    end = buf.find("\n" if following == "/" else "*/", i + 2)
+                    if end == -1:
+                        if not final:
+                            break
+                        i = len(buf)
+                    else:
+                        i = end + (0 if following == "/" else 2)
+                    continue
+
+            top = self._stack[-1]
+            if top.kind == "object" and top.expect_key and _IDENT_START.match(c):
+                # Unquoted key
+                j = i
+                while j < len(buf) and _IDENT.match(buf[j]):
+                    j += 1
+                if j == len(buf) and not final:
+                    break
+                top.key = buf[i:j]
+                i = j
+                continue
+
+            if c in "{[":
+                self._push("object" if c == "{" else "array", i)
+            elif c in "}]":
+                events.extend(self._pop(c, i))
+            elif c == ",":
+                if top.kind == "object":
+                    top.expect_key = True
+                    top.key = None
+            elif c == ":":
+                top.expect_key = False
+            i += 1
+
+        self._pos = i
+        return events
@@ -0,0 +1,263 @@
+"""
+Prometheus metrics shared across the application.
+Everything registered here is exported by the /metrics mount in app.main.
+"""
+from prometheus_client import Counter, Gauge, Histogram
+from prometheus_client.core import GaugeMetricFamily, REGISTRY
+
+
+# Rate limiting
+RATE_LIMIT_LEASE_REQUESTS = Counter(
+    "rate_limit_lease_requests_total",
+    "Rate limit checks served by the local lease tier, by outcome "
+    "(hit = no Redis call, miss = lease refilled from Redis)",
+    ["result"],
+)
+
+# User cache
+USER_CACHE_REQUESTS = Counter(
+    "user_cache_requests_total",
+    "User lookups by the tier that answered them (local, redis, database)",
+    ["tier"],
+)
+
+# Completion cache
+COMPLETION_CACHE_LOOKUPS = Counter(
+    "completion_cache_lookups_total",
+    "Completion cache lookups by result (local_hit, redis_hit, miss)",
+    ["result"],
+)
+
+COMPLETION_CACHE_BYTES_SAVED = Counter(
+    "completion_cache_bytes_saved_total",
+    "Bytes of completion responses served from cache instead of upstream",
+)
+
+# Prompt redaction
+REDACTION_RULE_HITS = Counter(
+    "redaction_rule_hits_total",
+    "Secrets redacted from prompts, by rule",
+    ["rule"],
+)
+
+PROMPT_SANITIZE_BYTES = Counter(
+    "prompt_sanitize_bytes_total",
+    "UTF-8 bytes of user messages sanitized, by whether they were scanned "
+    "or skipped because the result was memoized",
+    ["result"],
+)
+
+# Chat streaming
+CHAT_STREAMS_ABANDONED = Counter(
+    "chat_streams_abandoned_total",
+    "Chat streams whose client went away before the completion finished",
+)
+
+CHAT_STREAM_TOKENS_SAVED = Counter(
+    "chat_stream_tokens_saved_total",
+    "Upper bound on completion tokens not generated because abandoned "
+    "streams were cancelled (max_tokens minus tokens already delivered)",
+)
+
+# Chat context window
+CHAT_CONTEXT_TOKENS = Histogram(
+    "chat_context_tokens",
+    "Estimated prompt tokens sent upstream per chat request, after trimming",
+    ["model"],
+    buckets=(256, 1024, 2048, 4096, 8192, 16384, 32768, 65536, 131072),
+)
+
+CHAT_CONTEXT_MESSAGES_TRIMMED = Counter(
+    "chat_context_messages_trimmed_total",
+    "Older chat messages dropped (and summarized) to fit the token budget",
+)
+
+# Code generation
+GENERATION_TASKS = Counter(
+    "generation_tasks_total",
+    "Generation plan tasks by outcome (completed, failed, skipped)",
+    ["status"],
+)
+
+# Upstream LLM scheduling
+LLM_SCHEDULER_QUEUE_DEPTH = Gauge(
+    "llm_scheduler_queue_depth",
+    "Upstream LLM calls waiting for a slot, by priority class",
+    ["priority"],
+)
+
+LLM_SCHEDULER_WAIT = Histogram(
+    "llm_scheduler_wait_seconds",
+    "Time upstream LLM calls waited for a slot, by priority class",
+    ["priority"],
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+
+LLM_SCHEDULER_ACTIVE = Gauge(
+    "llm_scheduler_active",
+    "Upstream LLM calls currently holding a slot",
+)
+
+# Upstream LLM resilience
+LLM_UPSTREAM_RETRIES = Counter(
+    "llm_upstream_retries_total",
+    "Upstream LLM calls retried, by reason (HTTP status or error type)",
+    ["reason"],
+)
+
+LLM_RETRY_BUDGET_EXHAUSTED = Counter(
+    "llm_retry_budget_exhausted_total",
+    "Retries or hedges not sent because the retry budget was empty",
+)
+
+LLM_HEDGED_REQUESTS = Counter(
+    "llm_hedged_requests_total",
+    "Hedged upstream requests by outcome (sent, won = answered first)",
+    ["outcome"],
+)
+
+LLM_CIRCUIT_OPEN = Gauge(
+    "llm_circuit_open",
+    "Whether the upstream LLM circuit breaker is open, by model",
+    ["model"],
+)
+
+LLM_CIRCUIT_REJECTED = Counter(
+    "llm_circuit_rejected_total",
+    "Upstream LLM calls failed fast because the circuit was open",
+)
+
+# Model routing
+LLM_MODEL_REQUESTS = Counter(
+    "llm_model_requests_total",
+    "Upstream LLM calls by model and outcome (success, failure = fell back)",
+    ["model", "outcome"],
+)
+
+LLM_MODEL_LATENCY = Histogram(
+    "llm_model_latency_seconds",
+    "Duration of successful upstream LLM calls (whole stream for streams), by model",
+    ["model"],
+    buckets=(0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120),
+)
+
+LLM_MODEL_THROUGHPUT = Gauge(
+    "llm_model_throughput_tokens_per_second",
+    "Moving average of completion tokens per second, by model",
+    ["model"],
+)
+
+# Write-behind persistence
+WRITE_BEHIND_SHED = Counter(
+    "write_behind_shed_total",
+    "Records dropped because the write-behind buffer stayed full, by kind",
+    ["kind"],
+)
+
+WRITE_BEHIND_DEAD_LETTERED = Counter(
+    "write_behind_dead_lettered_total",
+    "Records moved to the dead-letter list after repeatedly failing to write",
+)
+
+# Request coalescing
+SINGLE_FLIGHT_REQUESTS = Counter(
+    "single_flight_requests_total",
+    "Coalesced requests by kind (call, stream) and role "
+    "(leader = made the upstream request, follower = shared it)",
+    ["kind", "role"],
+)
+
+# Database connection pools
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting for a pooled database connection",
+    ["pool"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5, 30),
+)
+
+DB_READ_ROUTES = Counter(
+    "db_read_routes_total",
+    "Read-only sessions by the engine they were routed to",
+    ["target"],
+)
+
+DB_REPLICA_HEALTHY = Gauge(
+    "db_replica_healthy",
+    "Whether a read replica passed its last health check",
+    ["replica"],
+)
+
+DB_REPLICA_LAG = Gauge(
+    "db_replica_lag_seconds",
+    "Replication lag observed at the last health check",
+    ["replica"],
+)
+
+
+class PoolCollector:
+    """Reports live SQLAlchemy pool utilisation at scrape time."""
+
+    def __init__(self):
+        self.pools = {}
+
+    def collect(self):
+        size = GaugeMetricFamily("db_pool_size", "Configured pool size", labels=["pool"])
+        checked_out = GaugeMetricFamily(
+            "db_pool_checked_out", "Connections currently checked out", labels=["pool"]
+        )
+        overflow = GaugeMetricFamily(
+            "db_pool_overflow", "Connections open beyond the pool size", labels=["pool"]
+        )
+        for name, pool in self.pools.items():
+            size.add_metric([name], pool.size())
+            checked_out.add_metric([name], pool.checkedout())
+            overflow.add_metric([name], max(0, pool.overflow()))
+        yield size
+        yield checked_out
+        yield overflow
+
+
+_pool_collector = PoolCollector()
+REGISTRY.register(_pool_collector)
+
+
+def register_pool(name: str, pool) -> None:
+    """Expose a connection pool's utilisation under the given label."""
+    _pool_collector.pools[name] = pool
+
+
+class HTTPTransportCollector:
+    """Reports outbound HTTP connection pool usage per upstream host."""
+
+    def __init__(self):
+        self.transports = {}
+
+    def collect(self):
+        connections = GaugeMetricFamily(
+            "http_client_connections",
+            "Open outbound HTTP connections by upstream host and state",
+            labels=["host", "state"],
+        )
+        for host, transport in self.transports.items():
+            # httpx keeps its httpcore pool private; skip if that changes
+            pool = getattr(transport, "_pool", None)
+            if pool is None:
+                continue
+            active = idle = 0
+            for connection in pool.connections:
+                if connection.is_idle():
+                    idle += 1
+                else:
+                    active += 1
+            connections.add_metric([host, "active"], active)
+            connections.add_metric([host, "idle"], idle)
+        yield connections
+
+
+_http_collector = HTTPTransportCollector()
+REGISTRY.register(_http_collector)
+
+
+def register_http_transport(host: str, transport) -> None:
+    """Expose an outbound HTTP transport's pool under the given host label."""
+    _http_collector.transports[host] = transport
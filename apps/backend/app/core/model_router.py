@@ -0,0 +1,127 @@
+"""
+Model routing for upstream LLM calls.
+Picks models per call class, with health- and speed-aware fallback order.
+"""
+from typing import Callable, Dict, List, Optional
+
+from app.core.config import ModelRoutingPolicy, settings
+from app.core.metrics import LLM_MODEL_LATENCY, LLM_MODEL_REQUESTS, LLM_MODEL_THROUGHPUT
+from app.core.resilience import CircuitOpenError, Resilience, classify, llm_resilience
+
+
+def is_model_failure(error: Exception) -> bool:
+    """Whether another model should be tried after `error`."""
+    return isinstance(error, CircuitOpenError) or classify(error)[0]
+
+
+class ModelStats:
+    """Moving averages of one model's latency and throughput."""
+
+    __slots__ = ("latency", "throughput", "samples")
+
+    def __init__(self):
+        self.latency: Optional[float] = None
+        self.throughput: Optional[float] = None
+        self.samples = 0
+
+
+class ModelRouter:
+    """
+    Orders candidate models for each call according to a routing policy.
+
+    The policy's configured order is the default; call classes without a
+    route use `default_model` and the policy's opt-in fallbacks. Models
+    whose circuit is open move to the back (still tried last, so a
+    half-open probe can close them), and a later healthy model moves to
+    the front when its measured throughput is `prefer_faster_ratio` times
+    the preferred model's. Each model gets its own resilience policy, so
+    one failing model trips only its own breaker.
+    """
+
+    def __init__(
+        self,
+        policy: ModelRoutingPolicy,
+        default_model: str,
+        resilience_factory: Callable[[str], Resilience],
+    ):
+        self.policy = policy
+        self.default_model = default_model
+        self.resilience_factory = resilience_factory
+        self._resilience: Dict[str, Resilience] = {}
+        self._stats: Dict[str, ModelStats] = {}
+
+    def resilience(self, model: str) -> Resilience:
+        policy = self._resilience.get(model)
+        if policy is None:
+            policy = self._resilience[model] = self.resilience_factory(model)
+        return policy
+
+    def stats(self, model: str) -> ModelStats:
+        stats = self._stats.get(model)
+        if stats is None:
+            stats = self._stats[model] = ModelStats()
+        return stats
+
+    def _throughput(self, model: str) -> Optional[float]:
+        stats = self._stats.get(model)
+        if stats is None or stats.samples < self.policy.min_samples:
+            return None
+        return stats.throughput
+
+    def candidates(self, call_class: str) -> List[str]:
+        """Models to try for a call, in order."""
+        models = self.policy.routes.get(call_class) or [
+            self.default_model,
+            *(m for m in self.policy.fallbacks if m != self.default_model),
+        ]
+        healthy = [m for m in models if self.resilience(m).breaker.state != "open"]
+
+        if len(healthy) > 1:
+            preferred = self._throughput(healthy[0])
+            measured = [
+                (throughput, m)
+                for m in healthy[1:]
+                if (throughput := self._throughput(m)) is not None
+            ]
+            if preferred is not None and measured:
+                throughput, fastest = max(measured)
+                if throughput >= preferred * self.policy.prefer_faster_ratio:
+                    healthy.remove(fastest)
+                    healthy.insert(0, fastest)
+
+        return healthy + [m for m in models if m not in healthy]
+
+    def record_success(
+        self,
+        model: str,
+        seconds: float,
+        completion_tokens: Optional[int] = None,
+    ) -> None:
+        """Fold a successful call into the model's moving averages."""
+        LLM_MODEL_REQUESTS.labels(model=model, outcome="success").inc()
+        LLM_MODEL_LATENCY.labels(model=model).observe(seconds)
+
+        stats = self.stats(model)
+        alpha = self.policy.ewma_alpha
+        stats.samples += 1
+        stats.latency = seconds if stats.latency is None else (
+            alpha * seconds + (1 - alpha) * stats.latency
+        )
+
+        if completion_tokens and seconds > 0:
+            rate = completion_tokens / seconds
+            stats.throughput = rate if stats.throughput is None else (
+                alpha * rate + (1 - alpha) * stats.throughput
+            )
+            LLM_MODEL_THROUGHPUT.labels(model=model).set(stats.throughput)
+
+    def record_failure(self, model: str) -> None:
+        LLM_MODEL_REQUESTS.labels(model=model, outcome="failure").inc()
+
+
+# Global model router instance
+model_router = ModelRouter(
+    settings.LLM_ROUTING,
+    default_model=settings.OPENROUTER_MODEL,
+    resilience_factory=llm_resilience,
+)
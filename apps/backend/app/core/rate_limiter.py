@@ -0,0 +1,216 @@
+"""
+Token bucket rate limiter backed by a Redis Lua script.
+Each user costs one hash (tokens, last refill) and one round trip per check,
+with an optional in-process tier that leases tokens in batches.
+"""
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.core.metrics import RATE_LIMIT_LEASE_REQUESTS
+from app.core.redis import redis_client
+
+
+# KEYS[1]: bucket key
+# ARGV[1]: bucket capacity
+# ARGV[2]: refill rate in tokens per millisecond
+# ARGV[3]: cost of this request
+# ARGV[4]: tokens to take when available (>= cost, for leasing)
+# ARGV[5]: unspent tokens handed back from an expired lease
+# Returns {allowed, remaining tokens, retry after (ms), tokens granted}
+TOKEN_BUCKET_SCRIPT = """
+local key = KEYS[1]
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local want = math.max(cost, tonumber(ARGV[4]) or cost)
+local refund = tonumber(ARGV[5]) or 0
+
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+
+local state = redis.call('HMGET', key, 'tokens', 'ts')
+local tokens = tonumber(state[1])
+local ts = tonumber(state[2])
+if tokens == nil or ts == nil then
+    tokens = capacity
+    ts = now
+end
+
+tokens = math.min(capacity, tokens + refund + math.max(0, now - ts) * rate)
+
+local allowed = 0
+local granted = 0
+local retry_after = 0
+if tokens >= cost then
+    granted = math.max(cost, math.min(want, math.floor(tokens)))
+    tokens = tokens - granted
+    allowed = 1
+else
+    retry_after = math.ceil((cost - tokens) / rate)
+end
+
+redis.call('HSET', key, 'tokens', tostring(tokens), 'ts', now)
+redis.call('PEXPIRE', key, math.ceil(capacity / rate))
+
+return {allowed, math.floor(tokens), retry_after, granted}
+"""
+
+
+@dataclass
+class RateLimitResult:
+    """Outcome of a single rate limit check."""
+
+    allowed: bool
+    remaining: int
+    retry_after_ms: int = 0
+    granted: int = 0
+
+
+class TokenBucketLimiter:
+    """
+    Per-user token bucket evaluated atomically inside Redis.
+
+    The script is registered once and invoked with EVALSHA; redis-py reloads
+    it transparently if the server's script cache was flushed.
+    """
+
+    def __init__(
+        self,
+        redis,
+        capacity: int,
+        window_ms: int,
+        route_costs: Optional[Dict[str, int]] = None,
+        key_prefix: str = "rate_limit",
+    ):
+        self.redis = redis
+        self.capacity = capacity
+        self.refill_rate = capacity / window_ms  # tokens per millisecond
+        self.key_prefix = key_prefix
+        # Longest prefix wins, so sort once up front
+        self.route_costs = sorted(
+            (route_costs or {}).items(),
+            key=lambda item: len(item[0]),
+            reverse=True,
+        )
+        self._script = redis.register_script(TOKEN_BUCKET_SCRIPT)
+
+    def cost_for(self, path: str) -> int:
+        """Return the token cost of a request path (default 1)."""
+        for prefix, cost in self.route_costs:
+            if path.startswith(prefix):
+                return cost
+        return 1
+
+    async def acquire(
+        self,
+        user_id: str,
+        cost: int = 1,
+        lease: int = 0,
+        refund: float = 0,
+    ) -> RateLimitResult:
+        """
+        Take `cost` tokens from the user's bucket.
+
+        Args:
+            user_id: User identifier
+            cost: Number of tokens this request consumes
+            lease: Take up to this many tokens in total if available
+            refund: Unspent leased tokens to return before taking
+
+        Returns:
+            RateLimitResult with remaining tokens and retry hint
+        """
+        allowed, remaining, retry_after, granted = await self._script(
+            keys=[f"{self.key_prefix}:{user_id}"],
+            args=[self.capacity, self.refill_rate, cost, max(cost, lease), refund],
+        )
+        return RateLimitResult(
+            allowed=bool(allowed),
+            remaining=int(remaining),
+            retry_after_ms=int(retry_after),
+            granted=int(granted),
+        )
+
+
+@dataclass
+class _Lease:
+    tokens: int
+    expires_at: float
+
+
+class LeasedRateLimiter:
+    """
+    Two-tier limiter that spends locally leased tokens before asking Redis.
+
+    Each miss takes up to `lease_size` tokens from the shared bucket in the
+    same round trip as the check itself; subsequent requests are served from
+    memory until the lease is spent or expires. Unspent tokens from an expired
+    lease are refunded on the next refill. Leases evicted from the LRU are
+    simply dropped, which only ever makes limiting stricter.
+
+    With W workers, at most W * lease_size tokens can be outstanding beyond
+    what Redis reports, so keep the lease small relative to the capacity.
+    """
+
+    def __init__(
+        self,
+        bucket: TokenBucketLimiter,
+        lease_size: int,
+        lease_ttl_ms: int,
+        max_users: int,
+    ):
+        self.bucket = bucket
+        self.lease_size = lease_size
+        self.lease_ttl = lease_ttl_ms / 1000
+        self._leases: LRUCache[_Lease] = LRUCache(max_users)
+
+    def cost_for(self, path: str) -> int:
+        """Return the token cost of a request path (default 1)."""
+        return self.bucket.cost_for(path)
+
+    async def acquire(self, user_id: str, cost: int = 1) -> RateLimitResult:
+        """Take `cost` tokens, from the local lease when possible."""
+        lease = self._leases.get(user_id)
+        now = time.monotonic()
+        refund = 0
+
+        if lease is not None:
+            if lease.expires_at > now and lease.tokens >= cost:
+                lease.tokens -= cost
+                RATE_LIMIT_LEASE_REQUESTS.labels(result="hit").inc()
+                return RateLimitResult(allowed=True, remaining=lease.tokens)
+
+            # Expired or too small: fold what is left back into the bucket
+            refund = lease.tokens
+            self._leases.pop(user_id)
+
+        RATE_LIMIT_LEASE_REQUESTS.labels(result="miss").inc()
+        result = await self.bucket.acquire(
+            user_id, cost, lease=cost + self.lease_size, refund=refund
+        )
+
+        leftover = result.granted - cost
+        if result.allowed and leftover > 0:
+            self._leases.set(user_id, _Lease(leftover, now + self.lease_ttl))
+
+        return result
+
+
+# Global rate limiter instance
+rate_limiter: TokenBucketLimiter | LeasedRateLimiter = TokenBucketLimiter(
+    redis_client,
+    capacity=settings.RATE_LIMIT_MAX_REQUESTS,
+    window_ms=settings.RATE_LIMIT_WINDOW_MS,
+    route_costs=settings.RATE_LIMIT_ROUTE_COSTS,
+)
+
+if settings.RATE_LIMIT_LEASE_ENABLED:
+    rate_limiter = LeasedRateLimiter(
+        rate_limiter,
+        lease_size=settings.RATE_LIMIT_LEASE_SIZE,
+        lease_ttl_ms=settings.RATE_LIMIT_LEASE_TTL_MS,
+        max_users=settings.RATE_LIMIT_LEASE_MAX_USERS,
+    )
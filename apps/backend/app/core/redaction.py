@@ -0,0 +1,192 @@
+"""
+Secret redaction for text sent to upstream LLMs.
+All rules are compiled once into a single alternation and applied in one scan.
+"""
+import hashlib
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Tuple
+
+from app.core.metrics import REDACTION_RULE_HITS
+
+REDACTED = "[REDACTED]"
+
+
+@dataclass(frozen=True)
+class RedactionRule:
+    """
+    A named secret pattern.
+
+    `literals` are lowercase prefixes, one of which every match starts
+    with; when none of them occurs in a text the rule cannot fire. A rule
+    without literals is always tried.
+    """
+
+    name: str
+    pattern: str
+    literals: Tuple[str, ...] = ()
+    ignore_case: bool = True
+    replacement: str = REDACTED
+
+
+@dataclass
+class RedactionResult:
+    """Redacted text and how many times each rule fired."""
+
+    text: str
+    fired: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def redacted(self) -> bool:
+        return bool(self.fired)
+
+
+class Redactor:
+    """
+    Applies a set of redaction rules in a single pass.
+
+    Rules are combined into one regex of named alternatives, tried in rule
+    order at each position, so text is scanned once regardless of how many
+    rules there are. The rules' literal prefixes act as a prefilter: texts
+    containing none of them (the common case) are not scanned at all, and
+    the scan only tries the alternatives at positions whose character can
+    start a literal.
+    """
+
+    def __init__(self, rules: Iterable[RedactionRule]):
+        self.rules: List[RedactionRule] = list(rules)
+        self._by_group: Dict[str, RedactionRule] = {}
+
+        alternatives = []
+        for index, rule in enumerate(self.rules):
+            group = f"r{index}"
+            self._by_group[group] = rule
+            flags = "(?i:" if rule.ignore_case else "(?:"
+            alternatives.append(f"(?P<{group}>{flags}{rule.pattern}))")
+
+        self._literals = tuple(
+            {literal for rule in self.rules for literal in rule.literals}
+        )
+        self._always_scan = any(not rule.literals for rule in self.rules)
+
+        self._pattern = None
+        if alternatives:
+            pattern = "|".join(alternatives)
+            if not self._always_scan:
+                first = {literal[0] for literal in self._literals}
+                first |= {c.upper() for c in first}
+                anchors = "".join(re.escape(c) for c in sorted(first))
+                pattern = f"(?=[{anchors}])(?:{pattern})"
+            self._pattern = re.compile(pattern)
+
+        # Identifies the rule set, so memoized results never outlive a rule change
+        self.fingerprint = hashlib.sha256(
+            repr([
+                (rule.pattern, rule.ignore_case, rule.replacement)
+                for rule in self.rules
+            ]).encode()
+        ).hexdigest()[:16]
+
+    def _may_match(self, text: str) -> bool:
+        if self._always_scan:
+            return True
+        lowered = text.lower()
+        return any(literal in lowered for literal in self._literals)
+
+    def redact(self, text: str) -> RedactionResult:
+        """
+        Redact every secret in `text`.
+
+        Args:
+            text: Text to scan
+
+        Returns:
+            The redacted text and per-rule hit counts
+        """
+        if self._pattern is None or not self._may_match(text):
+            return RedactionResult(text)
+
+        fired: Counter = Counter()
+
+        def replace(match: re.Match) -> str:
+            rule = self._by_group[match.lastgroup]
+            fired[rule.name] += 1
+            return rule.replacement
+
+        redacted = self._pattern.sub(replace, text)
+        for name, count in fired.items():
+            REDACTION_RULE_HITS.labels(rule=name).inc(count)
+
+        return RedactionResult(redacted, dict(fired))
+
+
+# Keys and passwords assigned in code or config snippets
+CREDENTIAL_RULES = [
+    RedactionRule(
+        "api_key",
+        r'(?:api[_-]?key|apikey|api[_-]?secret)["\s:=]+[\w-]+',
+        literals=("api",),
+    ),
+    RedactionRule(
+        "password",
+        r'(?:password|passwd|pwd)["\s:=]+\S+',
+        literals=("password", "passwd", "pwd"),
+    ),
+    RedactionRule(
+        "token",
+        r'(?:token|auth)["\s:=]+[\w.-]+',
+        literals=("token", "auth"),
+    ),
+    RedactionRule(
+        "openai_key",
+        r'\bsk-[a-zA-Z0-9_-]{16,}',
+        literals=("sk-",),
+    ),
+    RedactionRule(
+        "github_token",
+        r'\b(?:gh[pousr]_[a-zA-Z0-9]{36}|github_pat_[a-zA-Z0-9_]{22,})',
+        literals=("ghp_", "gho_", "ghu_", "ghs_", "ghr_", "github_pat_"),
+    ),
+]
+
+# Provider credentials with a recognisable shape
+PROVIDER_RULES = [
+    RedactionRule(
+        "aws_access_key",
+        r'\b(?:AKIA|ASIA)[0-9A-Z]{16}\b',
+        literals=("akia", "asia"),
+        ignore_case=False,
+    ),
+    RedactionRule(
+        "slack_token",
+        r'\bxox[abposr]-[a-zA-Z0-9-]{10,}',
+        literals=("xox",),
+    ),
+    RedactionRule(
+        "private_key",
+        r'-----BEGIN [A-Z ]*PRIVATE KEY-----[\s\S]*?-----END [A-Z ]*PRIVATE KEY-----',
+        literals=("-----begin",),
+    ),
+]
+
+# Rule sets selectable through REDACTION_RULE_SETS
+RULE_SETS: Dict[str, List[RedactionRule]] = {
+    "credentials": CREDENTIAL_RULES,
+    "providers": PROVIDER_RULES,
+}
+
+
+def build_redactor(rule_sets: Iterable[str]) -> Redactor:
+    """
+    Build a redactor from named rule sets, in order.
+
+    Raises:
+        ValueError: If a rule set name is unknown
+    """
+    rules: List[RedactionRule] = []
+    for name in rule_sets:
+        if name not in RULE_SETS:
+            raise ValueError(f"Unknown redaction rule set: {name}")
+        rules.extend(RULE_SETS[name])
+    return Redactor(rules)
@@ -12,6 +12,19 @@ redis_client = redis.from_url(
     max_connections=50,
 )
 
+# Dedicated pool for blocking stream reads (XREAD BLOCK), so tailing clients
+# cannot take the connections the rate limiter and caches need; when it is
+# exhausted, readers wait for a connection instead of failing
+redis_stream_client = redis.Redis(
+    connection_pool=redis.BlockingConnectionPool.from_url(
+        settings.REDIS_URL,
+        encoding="utf-8",
+        decode_responses=True,
+        max_connections=settings.REDIS_STREAM_MAX_CONNECTIONS,
+        timeout=settings.REDIS_STREAM_POOL_TIMEOUT_SECONDS,
+    )
+)
+
 
 async def get_redis():
     """Dependency to get Redis client."""
@@ -0,0 +1,339 @@
+"""
+Resilience layer for upstream calls.
+Jittered retries within a budget, a circuit breaker and latency-based hedging.
+"""
+import asyncio
+import random
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Deque, Optional, Tuple
+
+import httpx
+
+from app.core.config import settings
+from app.core.metrics import (
+    LLM_CIRCUIT_OPEN,
+    LLM_CIRCUIT_REJECTED,
+    LLM_HEDGED_REQUESTS,
+    LLM_RETRY_BUDGET_EXHAUSTED,
+    LLM_UPSTREAM_RETRIES,
+)
+
+# Upstream statuses worth retrying; 429 is retried but does not trip the breaker
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """The upstream is failing and calls are being rejected without trying."""
+
+    def __init__(self, retry_in: float):
+        super().__init__(f"Upstream circuit open, retry in {retry_in:.0f}s")
+        self.retry_in = retry_in
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def classify(error: Exception) -> Tuple[bool, bool, Optional[float]]:
+    """
+    Decide how to treat a failed upstream call.
+
+    Returns:
+        (retryable, counts against upstream health, Retry-After seconds)
+    """
+    if isinstance(error, httpx.HTTPStatusError):
+        code = error.response.status_code
+        retry_after = parse_retry_after(error.response.headers.get("retry-after"))
+        return code in RETRYABLE_STATUSES, code >= 500, retry_after
+    if isinstance(error, (httpx.TimeoutException, httpx.NetworkError)):
+        return True, True, None
+    return False, False, None
+
+
+class RetryBudget:
+    """
+    Token bucket limiting retries to a fraction of traffic.
+
+    Every call deposits `ratio` tokens and every retry or hedge withdraws
+    one; a slow `min_per_second` refill lets quiet periods still retry.
+    When the upstream is down, retries stop at roughly `ratio` extra load
+    instead of multiplying it by the attempt count.
+    """
+
+    def __init__(
+        self,
+        ratio: float,
+        min_per_second: float,
+        capacity: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.capacity = capacity
+        self.clock = clock
+        self.tokens = capacity
+        self._updated = clock()
+
+    def _refill(self) -> None:
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.min_per_second)
+        self._updated = now
+
+    def deposit(self) -> None:
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        self._refill()
+        if self.tokens < 1:
+            LLM_RETRY_BUDGET_EXHAUSTED.inc()
+            return False
+        self.tokens -= 1
+        return True
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive upstream failures.
+
+    While open, calls fail immediately. After `reset_timeout` seconds one
+    probe call is let through (half-open): success closes the circuit,
+    failure re-opens it for another `reset_timeout`.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int,
+        reset_timeout: float,
+        name: str = "default",
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if self._probing or self.clock() - self._opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def retry_in(self) -> float:
+        if self._opened_at is None:
+            return 0.0
+        return max(0.0, self._opened_at + self.reset_timeout - self.clock())
+
+    def allow(self) -> bool:
+        """Whether a call may go upstream now (claims the probe when half-open)."""
+        if self._opened_at is None:
+            return True
+        if self._probing or self.clock() - self._opened_at < self.reset_timeout:
+            return False
+        self._probing = True
+        return True
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self._opened_at = None
+        self._probing = False
+        LLM_CIRCUIT_OPEN.labels(model=self.name).set(0)
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self._probing or self.failures >= self.failure_threshold:
+            self._opened_at = self.clock()
+            self._probing = False
+            LLM_CIRCUIT_OPEN.labels(model=self.name).set(1)
+
+    def abandon(self) -> None:
+        """Release the probe of a call that ended without an upstream verdict."""
+        self._probing = False
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies."""
+
+    def __init__(self, window: int = 200):
+        self._samples: Deque[float] = deque(maxlen=window)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[int(q * (len(ordered) - 1))]
+
+
+class Resilience:
+    """
+    Wraps upstream calls with retries, a circuit breaker and hedging.
+
+    Retries use full-jitter exponential backoff, or the upstream's
+    Retry-After (plus jitter) when it sends one; a Retry-After longer than
+    `max_retry_after` fails the call instead of holding it. Hedging, for
+    idempotent non-streaming calls, sends a second copy once the first has
+    been outstanding longer than the observed p95 latency and takes
+    whichever answers first; hedges are paid for from the retry budget.
+    """
+
+    def __init__(
+        self,
+        budget: RetryBudget,
+        breaker: CircuitBreaker,
+        max_attempts: int,
+        base_delay: float,
+        max_delay: float,
+        max_retry_after: float,
+        hedge_min_samples: int,
+        hedge_quantile: float = 0.95,
+    ):
+        self.budget = budget
+        self.breaker = breaker
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_quantile = hedge_quantile
+        self.latency = LatencyTracker()
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter delay before retry number `attempt` (1-based)."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def hedge_delay(self) -> Optional[float]:
+        if len(self.latency) < self.hedge_min_samples:
+            return None
+        return self.latency.quantile(self.hedge_quantile)
+
+    async def _hedged(self, fn: Callable[[], Awaitable[Any]]) -> Any:
+        delay = self.hedge_delay()
+        if delay is None:
+            return await fn()
+
+        attempts = [asyncio.ensure_future(fn())]
+        try:
+            done, _ = await asyncio.wait(attempts, timeout=delay)
+            if done or not self.budget.withdraw():
+                return await attempts[0]
+
+            LLM_HEDGED_REQUESTS.labels(outcome="sent").inc()
+            attempts.append(asyncio.ensure_future(fn()))
+            pending = set(attempts)
+            error: Optional[BaseException] = None
+
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for attempt in done:
+                    if attempt.exception() is None:
+                        if attempt is attempts[1]:
+                            LLM_HEDGED_REQUESTS.labels(outcome="won").inc()
+                        return attempt.result()
+                    error = error or attempt.exception()
+            raise error
+        finally:
+            for attempt in attempts:
+                attempt.cancel()
+
+    async def call(self, fn: Callable[[], Awaitable[Any]], hedge: bool = False) -> Any:
+        """
+        Run `fn` (one upstream attempt) under the resilience policy.
+
+        Raises:
+            CircuitOpenError: If the breaker is open
+            Exception: The last attempt's error once retrying stops
+        """
+        self.budget.deposit()
+        attempt = 0
+
+        while True:
+            if not self.breaker.allow():
+                LLM_CIRCUIT_REJECTED.inc()
+                raise CircuitOpenError(self.breaker.retry_in())
+
+            started = time.monotonic()
+            try:
+                result = await (self._hedged(fn) if hedge else fn())
+            except asyncio.CancelledError:
+                self.breaker.abandon()
+                raise
+            except Exception as e:
+                retryable, upstream_fault, retry_after = classify(e)
+                if upstream_fault:
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()
+
+                attempt += 1
+                if (
+                    not retryable
+                    or attempt >= self.max_attempts
+                    or (retry_after is not None and retry_after > self.max_retry_after)
+                    or not self.budget.withdraw()
+                ):
+                    raise
+
+                if retry_after is not None:
+                    delay = retry_after + random.uniform(0, self.base_delay)
+                else:
+                    delay = self.backoff(attempt)
+                reason = (
+                    str(e.response.status_code)
+                    if isinstance(e, httpx.HTTPStatusError)
+                    else type(e).__name__
+                )
+                LLM_UPSTREAM_RETRIES.labels(reason=reason).inc()
+                await asyncio.sleep(delay)
+                continue
+
+            self.breaker.record_success()
+            self.latency.record(time.monotonic() - started)
+            return result
+
+
+# Global LLM retry budget instance (shared by every model's policy)
+llm_retry_budget = RetryBudget(
+    ratio=settings.LLM_RETRY_BUDGET_RATIO,
+    min_per_second=settings.LLM_RETRY_BUDGET_MIN_PER_SECOND,
+    capacity=settings.LLM_RETRY_BUDGET_CAPACITY,
+)
+
+
+def llm_resilience(model: str) -> Resilience:
+    """A resilience policy (own breaker and latency window) for one upstream model."""
+    return Resilience(
+        llm_retry_budget,
+        CircuitBreaker(
+            failure_threshold=settings.LLM_BREAKER_FAILURE_THRESHOLD,
+            reset_timeout=settings.LLM_BREAKER_RESET_SECONDS,
+            name=model,
+        ),
+        max_attempts=settings.LLM_RETRY_MAX_ATTEMPTS,
+        base_delay=settings.LLM_RETRY_BASE_DELAY_MS / 1000,
+        max_delay=settings.LLM_RETRY_MAX_DELAY_MS / 1000,
+        max_retry_after=settings.LLM_RETRY_AFTER_MAX_SECONDS,
+        hedge_min_samples=settings.LLM_HEDGE_MIN_SAMPLES,
+    )
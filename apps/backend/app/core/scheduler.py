@@ -0,0 +1,144 @@
+"""
+Admission control for upstream LLM calls.
+Weighted fair queuing across users and priority classes under a global cap.
+"""
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager
+from enum import Enum
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.metrics import LLM_SCHEDULER_ACTIVE, LLM_SCHEDULER_QUEUE_DEPTH, LLM_SCHEDULER_WAIT
+
+# Forget idle flows once this many are tracked
+FLOW_PRUNE_THRESHOLD = 10000
+
+
+class Priority(str, Enum):
+    """Call classes, from most to least latency-sensitive."""
+
+    INTERACTIVE = "interactive"
+    PLANNING = "planning"
+    BULK = "bulk"
+
+
+class FairScheduler:
+    """
+    Caps concurrent upstream calls and orders the rest fairly.
+
+    Every (user, priority) pair is a flow whose weight comes from its
+    priority class. Waiting calls are tagged with a virtual finish time
+    (start-time fair queuing): start = max(virtual clock, the flow's last
+    finish), finish = start + cost / weight, and freed slots go to the
+    smallest finish tag. A user with a backlog of bulk generation calls
+    therefore advances only their own flow's clock, and a fresh
+    interactive call from anyone lands near the front of the queue, while
+    bulk work still progresses at its weighted share instead of starving.
+    """
+
+    def __init__(self, max_concurrency: int, weights: Dict[str, float]):
+        self.max_concurrency = max_concurrency
+        self.weights = weights
+        self.active = 0
+        self._virtual_time = 0.0
+        self._last_finish: Dict[Tuple[str, Priority], float] = {}
+        self._queue: List[Tuple[float, int, float, asyncio.Future, Priority]] = []
+        self._seq = itertools.count()
+
+    def _tag(self, flow: Tuple[str, Priority], cost: float) -> Tuple[float, float]:
+        start = max(self._virtual_time, self._last_finish.get(flow, 0.0))
+        finish = start + cost / self.weights.get(flow[1].value, 1.0)
+        self._last_finish[flow] = finish
+        return start, finish
+
+    async def acquire(
+        self,
+        user_id: Optional[str],
+        priority: Priority = Priority.INTERACTIVE,
+        cost: float = 1.0,
+    ) -> None:
+        """Wait for a slot; every acquire must be paired with release()."""
+        flow = (user_id or "anonymous", priority)
+        start, finish = self._tag(flow, cost)
+
+        if self.active < self.max_concurrency and not self._queue:
+            self._virtual_time = start
+            self.active += 1
+            LLM_SCHEDULER_ACTIVE.set(self.active)
+            LLM_SCHEDULER_WAIT.labels(priority=priority.value).observe(0)
+            return
+
+        granted = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (finish, next(self._seq), start, granted, priority))
+        LLM_SCHEDULER_QUEUE_DEPTH.labels(priority=priority.value).inc()
+        queued_at = time.monotonic()
+
+        try:
+            await granted
+        except asyncio.CancelledError:
+            if granted.done() and not granted.cancelled():
+                # Granted just as we were cancelled: hand the slot on
+                self.release()
+            else:
+                granted.cancel()
+                LLM_SCHEDULER_QUEUE_DEPTH.labels(priority=priority.value).dec()
+            raise
+
+        LLM_SCHEDULER_WAIT.labels(priority=priority.value).observe(time.monotonic() - queued_at)
+
+    def release(self) -> None:
+        """Free a slot and grant it to the next waiter in fair order."""
+        self.active -= 1
+
+        while self._queue:
+            _, _, start, granted, priority = heapq.heappop(self._queue)
+            if granted.cancelled():
+                continue
+            LLM_SCHEDULER_QUEUE_DEPTH.labels(priority=priority.value).dec()
+            self._virtual_time = start
+            self.active += 1
+            granted.set_result(None)
+            break
+        else:
+            if self.active == 0:
+                # Idle: no flow has a backlog left to account for
+                self._virtual_time = 0.0
+                self._last_finish.clear()
+
+        if len(self._last_finish) > FLOW_PRUNE_THRESHOLD:
+            # Flows the clock has passed would be tagged from it anyway
+            self._last_finish = {
+                flow: finish
+                for flow, finish in self._last_finish.items()
+                if finish > self._virtual_time
+            }
+
+        LLM_SCHEDULER_ACTIVE.set(self.active)
+
+    @asynccontextmanager
+    async def slot(
+        self,
+        user_id: Optional[str],
+        priority: Priority = Priority.INTERACTIVE,
+        cost: float = 1.0,
+    ) -> AsyncIterator[None]:
+        """Hold a slot for the duration of the block (including a whole stream)."""
+        await self.acquire(user_id, priority, cost)
+        try:
+            yield
+        finally:
+            self.release()
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for entry in self._queue if not entry[3].cancelled())
+
+
+# Global LLM scheduler instance
+llm_scheduler = FairScheduler(
+    max_concurrency=settings.LLM_MAX_CONCURRENCY,
+    weights=settings.LLM_PRIORITY_WEIGHTS,
+)
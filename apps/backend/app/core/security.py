@@ -1,17 +1,27 @@
 """
 Security utilities for JWT tokens, password hashing, and authentication.
 """
+import hashlib
+import time
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import HTTPException, status
 
+from app.core.cache import LRUCache
 from app.core.config import settings
+from app.core.redaction import build_redactor
 
 # Password hashing context
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# Verified token claims keyed by SHA-256 of the token, expiring with the token
+_token_cache: LRUCache[dict] = LRUCache(settings.JWT_CACHE_SIZE)
+
+# Secret redaction applied to every user prompt
+prompt_redactor = build_redactor(settings.REDACTION_RULE_SETS)
+
 
 def hash_password(password: str) -> str:
     """Hash a password using bcrypt."""
@@ -56,6 +66,9 @@ def decode_access_token(token: str) -> dict:
     """
     Decode and verify a JWT access token.
     
+    Verified payloads are cached until the token's `exp`, so repeated
+    requests with the same token skip signature checks and JSON parsing.
+    
     Args:
         token: JWT token string
     
@@ -65,19 +78,31 @@ def decode_access_token(token: str) -> dict:
     Raises:
         HTTPException: If token is invalid or expired
     """
+    cache_key = hashlib.sha256(token.encode()).digest()
+    payload = _token_cache.get(cache_key)
+    if payload is not None:
+        return payload
+    
     try:
         payload = jwt.decode(
             token,
             settings.JWT_SECRET,
             algorithms=[settings.JWT_ALGORITHM]
         )
-        return payload
     except JWTError as e:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
             headers={"WWW-Authenticate": "Bearer"},
         ) from e
+    
+    exp = payload.get("exp")
+    if exp is not None:
+        ttl = exp - time.time()
+        if ttl > 0:
+            _token_cache.set(cache_key, payload, ttl=ttl)
+    
+    return payload
 
 
 def sanitize_prompt(prompt: str) -> str:
@@ -90,19 +115,4 @@ def sanitize_prompt(prompt: str) -> str:
     Returns:
         Sanitized prompt
     """
-    # Remove common secret patterns
-    import re
-    
-    patterns = [
-        r'(api[_-]?key|apikey|api[_-]?secret)["\s:=]+[\w-]+',
-        r'(password|passwd|pwd)["\s:=]+\S+',
-        r'(token|auth)["\s:=]+[\w.-]+',
-        r'sk-[a-zA-Z0-9]{32,}',  # OpenAI-style keys
-        r'ghp_[a-zA-Z0-9]{36}',  # GitHub tokens
-    ]
-    
-    sanitized = prompt
-    for pattern in patterns:
-        sanitized = re.sub(pattern, '[REDACTED]', sanitized, flags=re.IGNORECASE)
-    
-    return sanitized
+    return prompt_redactor.redact(prompt).text
@@ -0,0 +1,244 @@
+"""
+Request coalescing for identical in-flight work.
+Concurrent callers with the same key share one upstream call or token stream.
+"""
+import asyncio
+import copy
+from typing import Any, AsyncGenerator, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set
+
+from app.core.metrics import SINGLE_FLIGHT_REQUESTS
+
+
+# Tokens a broadcast keeps for late subscribers and lets its slowest reader lag behind
+MAX_BROADCAST_BUFFER = 1024
+
+
+class StreamCancelledError(Exception):
+    """The shared upstream stream was cancelled before it finished."""
+
+
+class StreamBroadcast:
+    """
+    Fans one token stream out to any number of subscribers.
+
+    Tokens are kept in a replay buffer, so a subscriber that attaches late
+    first receives what was already emitted and then follows the live
+    stream. The buffer is bounded by `max_buffer`: once it fills, tokens
+    every subscriber has read are dropped and the broadcast stops taking
+    new subscribers (they could no longer replay it), and the upstream is
+    only read while the slowest subscriber is less than `max_buffer`
+    tokens behind. When the last subscriber goes away before the stream
+    finishes, the upstream stream is cancelled.
+    """
+
+    def __init__(
+        self,
+        source: AsyncIterator[str],
+        on_close: Callable[["StreamBroadcast"], None],
+        max_buffer: int = MAX_BROADCAST_BUFFER,
+    ):
+        self.tokens: List[str] = []
+        self.base = 0  # Stream offset of tokens[0]
+        self.max_buffer = max_buffer
+        self.done = False
+        self.closing = False
+        self.error: Optional[Exception] = None
+        self._subscriptions: Set["StreamSubscription"] = set()
+        self._on_close = on_close
+        self._changed = asyncio.Event()
+        self._drained = asyncio.Event()
+        self._task = asyncio.create_task(self._pump(source))
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscriptions)
+
+    @property
+    def end(self) -> int:
+        """Stream offset just past the newest token."""
+        return self.base + len(self.tokens)
+
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def _lag(self) -> int:
+        slowest = min((s.position for s in self._subscriptions), default=self.end)
+        return self.end - slowest
+
+    def _trim(self) -> None:
+        slowest = min((s.position for s in self._subscriptions), default=self.end)
+        if slowest > self.base:
+            del self.tokens[:slowest - self.base]
+            self.base = slowest
+            # Late subscribers could no longer replay from the start
+            self._close()
+
+    async def _pump(self, source: AsyncIterator[str]) -> None:
+        try:
+            async for token in source:
+                self.tokens.append(token)
+                self._notify()
+                if len(self.tokens) >= self.max_buffer:
+                    self._trim()
+                while self._subscriptions and self._lag() >= self.max_buffer:
+                    self._drained.clear()
+                    await self._drained.wait()
+        except asyncio.CancelledError:
+            self.error = StreamCancelledError("Upstream stream cancelled")
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            self._notify()
+            self._close()
+            await source.aclose()
+
+    def _close(self) -> None:
+        if not self.closing:
+            self.closing = True
+            self._on_close(self)
+
+    def _advanced(self) -> None:
+        if self._lag() < self.max_buffer:
+            self._drained.set()
+
+    def _unsubscribe(self, subscription: "StreamSubscription") -> None:
+        self._subscriptions.discard(subscription)
+        self._advanced()
+        if not self._subscriptions and not self.done:
+            # Nobody is listening any more; stop paying for the stream
+            self._close()
+            self._task.cancel()
+
+    def subscribe(self) -> "StreamSubscription":
+        """
+        Register a subscriber that yields every token from the start of
+        the stream, then live ones. Registration is immediate, so the
+        stream is kept alive until the subscription is closed.
+        """
+        subscription = StreamSubscription(self)
+        self._subscriptions.add(subscription)
+        return subscription
+
+
+class StreamSubscription(AsyncGenerator[str, None]):
+    """One subscriber's position in a StreamBroadcast."""
+
+    def __init__(self, broadcast: StreamBroadcast):
+        self._broadcast = broadcast
+        self.position = broadcast.base
+        self._closed = False
+
+    def _finish(self) -> None:
+        if not self._closed:
+            self._closed = True
+            self._broadcast._unsubscribe(self)
+
+    async def asend(self, value: None) -> str:
+        broadcast = self._broadcast
+        while not self._closed:
+            if self.position < broadcast.end:
+                token = broadcast.tokens[self.position - broadcast.base]
+                self.position += 1
+                broadcast._advanced()
+                return token
+            if broadcast.done:
+                self._finish()
+                if broadcast.error is not None:
+                    raise broadcast.error
+                break
+            await broadcast._changed.wait()
+        raise StopAsyncIteration
+
+    async def athrow(self, typ: Any, val: Any = None, tb: Any = None) -> str:
+        self._finish()
+        if val is None:
+            val = typ() if isinstance(typ, type) else typ
+        raise val
+
+    async def aclose(self) -> None:
+        self._finish()
+
+    def __del__(self) -> None:
+        # A subscription dropped without being closed still releases the stream
+        if not self._closed:
+            try:
+                self._finish()
+            except RuntimeError:
+                pass  # Event loop already closed
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key.
+
+    `call` runs the first caller's coroutine as a task and hands its result
+    to everyone who asks for the same key while it is in flight; followers
+    get a deep copy so callers never share mutable state. The task is
+    shielded, so a cancelled caller does not fail the others. `stream` does
+    the same for token streams through a StreamBroadcast. Keys are forgotten
+    as soon as the call or stream finishes, so nothing is cached.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Task] = {}
+        self._streams: Dict[str, StreamBroadcast] = {}
+
+    async def call(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Await `fn()`, or the identical call already in flight.
+
+        Args:
+            key: Canonical key of the request
+            fn: Starts the upstream call; only invoked by the leader
+        """
+        task = self._calls.get(key)
+        leader = task is None
+
+        if leader:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._forget(self._calls, key, t))
+
+        SINGLE_FLIGHT_REQUESTS.labels(
+            kind="call", role="leader" if leader else "follower"
+        ).inc()
+
+        result = await asyncio.shield(task)
+        return result if leader else copy.deepcopy(result)
+
+    def stream(
+        self,
+        key: str,
+        fn: Callable[[], AsyncIterator[str]],
+    ) -> AsyncGenerator[str, None]:
+        """
+        Subscribe to the token stream for `key`, starting it if needed.
+
+        Args:
+            key: Canonical key of the request
+            fn: Opens the upstream stream; only invoked by the leader
+        """
+        broadcast = self._streams.get(key)
+        leader = broadcast is None
+
+        if leader:
+            broadcast = StreamBroadcast(
+                fn(), lambda b: self._forget(self._streams, key, b)
+            )
+            self._streams[key] = broadcast
+
+        SINGLE_FLIGHT_REQUESTS.labels(
+            kind="stream", role="leader" if leader else "follower"
+        ).inc()
+
+        return broadcast.subscribe()
+
+    @staticmethod
+    def _forget(registry: Dict[str, Any], key: str, entry: Any) -> None:
+        if registry.get(key) is entry:
+            del registry[key]
+
+    def __len__(self) -> int:
+        return len(self._calls) + len(self._streams)
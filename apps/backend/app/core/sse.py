@@ -0,0 +1,244 @@
+"""
+Server-Sent Events encoding and parsing.
+Works on raw bytes end to end, with orjson when it is installed.
+"""
+import asyncio
+import contextlib
+import json
+from typing import Any, AsyncIterable, AsyncIterator, Callable, Optional
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - exercised when orjson is absent
+    orjson = None
+
+
+if orjson is not None:
+    def json_dumps(obj: Any) -> bytes:
+        """Encode to compact UTF-8 JSON."""
+        return orjson.dumps(obj)
+
+    json_loads = orjson.loads
+    JSONDecodeError = orjson.JSONDecodeError
+else:
+    def json_dumps(obj: Any) -> bytes:
+        """Encode to compact UTF-8 JSON."""
+        return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode()
+
+    json_loads = json.loads
+    JSONDecodeError = json.JSONDecodeError
+
+
+def encode_event(payload: Any, event_id: Optional[str] = None) -> bytes:
+    """Encode one SSE event carrying `payload` as JSON."""
+    head = f"id: {event_id}\n".encode() if event_id is not None else b""
+    return head + b"data: " + json_dumps(payload) + b"\n\n"
+
+
+# Token events differ only in their content, so the framing is pre-encoded
+_TOKEN_PREFIX = b'data: {"type":"token","content":'
+_TOKEN_SUFFIX = b"}\n\n"
+
+
+def encode_token(content: str, event_id: Optional[str] = None) -> bytes:
+    """Encode a `{"type": "token", "content": ...}` event."""
+    head = f"id: {event_id}\n".encode() if event_id is not None else b""
+    return head + _TOKEN_PREFIX + json_dumps(content) + _TOKEN_SUFFIX
+
+
+COMPLETE_EVENT = encode_event({"type": "complete"})
+
+
+async def iter_sse_data(chunks: AsyncIterable[bytes]) -> AsyncIterator[bytes]:
+    """
+    Parse an SSE byte stream into the data of each event.
+
+    Lines are split straight from the byte chunks; comments and fields other
+    than `data` are ignored, and multi-line data is joined with newlines.
+
+    Args:
+        chunks: Raw response body chunks (e.g. `response.aiter_bytes()`)
+
+    Yields:
+        The data of each event, as bytes
+    """
+    buffer = b""
+    data = []
+
+    async for chunk in chunks:
+        buffer += chunk
+        if b"\n" not in chunk:
+            continue
+
+        lines = buffer.split(b"\n")
+        buffer = lines.pop()
+
+        for line in lines:
+            if line.endswith(b"\r"):
+                line = line[:-1]
+
+            if not line:
+                if data:
+                    yield b"\n".join(data)
+                    data = []
+            elif line.startswith(b"data:"):
+                value = line[5:]
+                data.append(value[1:] if value.startswith(b" ") else value)
+
+    if buffer.startswith(b"data:"):
+        value = buffer[5:].rstrip(b"\r")
+        data.append(value[1:] if value.startswith(b" ") else value)
+    if data:
+        yield b"\n".join(data)
+
+
+async def coalesce_tokens(
+    tokens: AsyncIterator[str],
+    window: float,
+    max_bytes: int,
+) -> AsyncIterator[str]:
+    """
+    Batch tokens that arrive in quick succession.
+
+    A token that arrives after the stream has been idle for a full window
+    (including the very first token) is passed on immediately, so
+    time-to-first-token is unaffected. Tokens arriving within `window`
+    seconds of the previous flush are joined and flushed together when the
+    window closes or the batch reaches `max_bytes` (counted in characters,
+    which is close enough for the mostly-ASCII token stream). The source
+    iterator is closed when the coalescer is.
+
+    Args:
+        tokens: Upstream token stream
+        window: Coalescing window in seconds; 0 passes tokens straight through
+        max_bytes: Flush early once a batch reaches this size
+    """
+    if window <= 0:
+        async for token in tokens:
+            yield token
+        return
+
+    loop = asyncio.get_running_loop()
+    batch = []
+    size = 0
+    deadline = 0.0
+    last_flush = float("-inf")
+    pending = None
+
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(tokens.__anext__())
+
+            timeout = max(0.0, deadline - loop.time()) if batch else None
+            done, _ = await asyncio.wait({pending}, timeout=timeout)
+
+            if not done:
+                # Window closed with tokens waiting
+                yield "".join(batch)
+                batch, size = [], 0
+                last_flush = loop.time()
+                continue
+
+            try:
+                token = pending.result()
+            except StopAsyncIteration:
+                break
+            finally:
+                pending = None
+
+            now = loop.time()
+            if not batch and now - last_flush >= window:
+                yield token
+                last_flush = now
+                continue
+
+            if not batch:
+                deadline = last_flush + window
+            batch.append(token)
+            size += len(token)
+
+            if size >= max_bytes or now >= deadline:
+                yield "".join(batch)
+                batch, size = [], 0
+                last_flush = loop.time()
+
+        if batch:
+            yield "".join(batch)
+    finally:
+        if pending is not None and not pending.done():
+            pending.cancel()
+            with contextlib.suppress(BaseException):
+                await pending
+        aclose = getattr(tokens, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+
+_END = object()
+
+
+class _Failure:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+async def relay_tokens(
+    tokens: AsyncIterator[str],
+    max_buffered: int,
+    on_abandon: Optional[Callable[[int], None]] = None,
+) -> AsyncIterator[str]:
+    """
+    Decouple an upstream token stream from the client writer.
+
+    A reader task pulls from `tokens` into a queue of at most `max_buffered`
+    tokens, so a slow client holds back the upstream read instead of
+    accumulating memory. If the relay is closed or cancelled before the
+    upstream finished (the client disconnected), the reader is cancelled
+    at once, which closes the upstream HTTP stream, and `on_abandon` is
+    called with the number of tokens delivered so far.
+
+    Args:
+        tokens: Upstream token stream
+        max_buffered: Queue bound between reader and writer
+        on_abandon: Called with the delivered token count on abandonment
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max_buffered)
+    abandoned = False
+
+    async def read() -> None:
+        outcome: Any = _END
+        try:
+            async for token in tokens:
+                await queue.put(token)
+        except asyncio.CancelledError:
+            if abandoned:
+                raise
+            # Raised by the source itself; the writer must still be told
+            outcome = _Failure(RuntimeError("Upstream token stream was cancelled"))
+        except Exception as e:
+            outcome = _Failure(e)
+        await queue.put(outcome)
+
+    reader = asyncio.create_task(read())
+    delivered = 0
+    finished = False
+
+    try:
+        while True:
+            item = await queue.get()
+            if item is _END:
+                finished = True
+                return
+            if isinstance(item, _Failure):
+                finished = True
+                raise item.error
+            yield item
+            delivered += 1
+    finally:
+        if not finished:
+            # Synchronous on purpose: this also runs inside a cancelled scope
+            abandoned = True
+            reader.cancel()
+            if on_abandon is not None:
+                on_abandon(delivered)
@@ -5,14 +5,19 @@ Configures middleware, routes, and application lifecycle.
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.middleware.gzip import GZipMiddleware
 from prometheus_client import make_asgi_app
 import sentry_sdk
 from sentry_sdk.integrations.fastapi import FastApiIntegration
 
 from app.core.config import settings
-from app.core.database import engine, Base
+from app.core.database import engine, database_router, Base
+from app.core.http import http_clients
+from app.core.redis import redis_stream_client
 from app.api.v1 import auth, chat, projects, generate, git, deploy, sandbox
+from app.services.generation_log import generation_log
+from app.services.write_behind import write_behind
+from app.middleware.auth import AuthMiddleware
+from app.middleware.compression import CompressionMiddleware
 from app.middleware.rate_limit import RateLimitMiddleware
 from app.middleware.logging import LoggingMiddleware
 
@@ -33,14 +38,21 @@ async def lifespan(app: FastAPI):
     # Startup: Create database tables
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+    database_router.start()
+    await write_behind.start()
     
     print(f"🚀 Ai Bot  API started on {settings.BACKEND_URL}")
     print(f"📚 Docs available at {settings.BACKEND_URL}/docs")
     
     yield
     
-    # Shutdown: Cleanup
-    await engine.dispose()
+    # Shutdown: Cleanup (disposes the primary and replica engines)
+    await generation_log.aclose()
+    await redis_stream_client.aclose()
+    # Drain buffered chat turns and usage before the engines go away
+    await write_behind.stop()
+    await database_router.stop()
+    await http_clients.aclose()
     print("👋 Ai Bot  API shutting down")
 
 
@@ -62,8 +74,14 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-app.add_middleware(GZipMiddleware, minimum_size=1000)
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+    compress_streams=settings.COMPRESSION_STREAMS,
+)
 app.add_middleware(RateLimitMiddleware)
+# Runs before the rate limiter so the token is decoded only once per request
+app.add_middleware(AuthMiddleware)
 app.add_middleware(LoggingMiddleware)
 
 # Mount Prometheus metrics
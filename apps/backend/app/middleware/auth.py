@@ -0,0 +1,43 @@
+"""
+Authentication middleware that verifies bearer tokens once per request.
+"""
+from typing import Optional
+from fastapi import HTTPException
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.security import decode_access_token
+
+
+class AuthMiddleware:
+    """
+    Pure ASGI middleware that decodes the bearer token up front.
+
+    The verified claims (or None for a missing/invalid token) are stored in
+    the scope state as `token_claims`, where the rate limiter and the
+    `get_current_user` dependency read them instead of decoding again.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] in ("http", "websocket"):
+            state = scope.setdefault("state", {})
+            state["token_claims"] = self._get_claims(scope)
+
+        await self.app(scope, receive, send)
+
+    def _get_claims(self, scope: Scope) -> Optional[dict]:
+        """Verify the Authorization header's bearer token, if any."""
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                scheme, _, token = value.decode("latin-1").partition(" ")
+                if scheme.lower() != "bearer" or not token:
+                    return None
+
+                try:
+                    return decode_access_token(token)
+                except HTTPException:
+                    return None
+
+        return None
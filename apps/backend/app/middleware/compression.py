@@ -0,0 +1,247 @@
+"""
+Response compression middleware.
+Negotiates zstd, brotli or gzip and leaves event streams alone by default.
+"""
+import zlib
+from abc import ABC, abstractmethod
+from typing import Dict, Optional, Sequence, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+
+class Encoder(ABC):
+    """Incremental compressor for one response body."""
+
+    @abstractmethod
+    def compress(self, data: bytes) -> bytes:
+        ...
+
+    @abstractmethod
+    def flush(self) -> bytes:
+        """Emit everything compressed so far, keeping the stream open."""
+
+    @abstractmethod
+    def finish(self) -> bytes:
+        ...
+
+
+class GzipEncoder(Encoder):
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class BrotliEncoder(Encoder):
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class ZstdEncoder(Encoder):
+    def __init__(self, level: int):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+def available_encodings() -> Tuple[str, ...]:
+    """Supported content codings, most preferred first."""
+    encodings = []
+    if zstandard is not None:
+        encodings.append("zstd")
+    if brotli is not None:
+        encodings.append("br")
+    encodings.append("gzip")
+    return tuple(encodings)
+
+
+def negotiate_encoding(accept_encoding: str, supported: Sequence[str]) -> Optional[str]:
+    """
+    Pick a content coding from an Accept-Encoding header.
+
+    The client's q-values decide; ties go to the order of `supported`.
+    """
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[coding] = q
+
+    best, best_q = None, 0.0
+    for coding in supported:
+        q = weights.get(coding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+class CompressionMiddleware:
+    """
+    Compresses response bodies with the best coding the client accepts.
+
+    Bodies smaller than `minimum_size` and responses that already carry a
+    Content-Encoding are sent as is. Media types in `stream_media_types`
+    (Server-Sent Events by default) are never buffered: they pass through
+    untouched unless `compress_streams` is set, in which case every chunk is
+    flushed through the compressor so events still arrive immediately.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1000,
+        compress_streams: bool = False,
+        stream_media_types: Sequence[str] = ("text/event-stream",),
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+        zstd_level: int = 3,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.compress_streams = compress_streams
+        self.stream_media_types = tuple(stream_media_types)
+        self.encodings = available_encodings()
+        self._levels = {"gzip": gzip_level, "br": brotli_quality, "zstd": zstd_level}
+
+    def make_encoder(self, encoding: str) -> Encoder:
+        level = self._levels[encoding]
+        if encoding == "zstd":
+            return ZstdEncoder(level)
+        if encoding == "br":
+            return BrotliEncoder(level)
+        return GzipEncoder(level)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        encoding = negotiate_encoding(headers.get("accept-encoding", ""), self.encodings)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressionResponder(self, encoding, send)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressionResponder:
+    """Per-request state of CompressionMiddleware."""
+
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send: Send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self._send = send
+        self.start_message: Optional[Message] = None
+        self.encoder: Optional[Encoder] = None
+        self.passthrough = False
+        self.flush_chunks = False
+
+    def _start_compressing(self, flush_chunks: bool) -> None:
+        headers = MutableHeaders(scope=self.start_message)
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        del headers["Content-Length"]
+        self.encoder = self.middleware.make_encoder(self.encoding)
+        self.flush_chunks = flush_chunks
+
+    async def send(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self.start_message = message
+            headers = Headers(raw=message["headers"])
+            media_type = headers.get("content-type", "").split(";")[0].strip()
+
+            if "content-encoding" in headers:
+                self.passthrough = True
+            elif media_type in self.middleware.stream_media_types:
+                if self.middleware.compress_streams:
+                    self._start_compressing(flush_chunks=True)
+                    await self._send(self.start_message)
+                else:
+                    self.passthrough = True
+
+            if self.passthrough:
+                await self._send(message)
+            return
+
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.encoder is None:
+            if not more_body and len(body) < self.middleware.minimum_size:
+                # Small complete body: not worth compressing
+                self.passthrough = True
+                await self._send(self.start_message)
+                await self._send(message)
+                return
+
+            self._start_compressing(flush_chunks=False)
+            if not more_body:
+                body = self.encoder.compress(body) + self.encoder.finish()
+                headers = MutableHeaders(scope=self.start_message)
+                headers["Content-Length"] = str(len(body))
+                await self._send(self.start_message)
+                await self._send({"type": "http.response.body", "body": body})
+                return
+            await self._send(self.start_message)
+
+        chunk = self.encoder.compress(body)
+        if not more_body:
+            chunk += self.encoder.finish()
+        elif self.flush_chunks:
+            chunk += self.encoder.flush()
+
+        if chunk or not more_body:
+            await self._send({
+                "type": "http.response.body",
+                "body": chunk,
+                "more_body": more_body,
+            })
@@ -3,45 +3,61 @@ Logging middleware for request/response tracking.
 """
 import time
 import logging
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 logger = logging.getLogger(__name__)
 
 
-class LoggingMiddleware(BaseHTTPMiddleware):
-    """Middleware to log all requests and responses."""
-    
-    async def dispatch(self, request: Request, call_next):
-        start_time = time.time()
-        
+class LoggingMiddleware:
+    """
+    Middleware to log all requests and responses.
+
+    Implemented as raw ASGI so response bodies (notably SSE streams) pass
+    straight through without BaseHTTPMiddleware's task and stream plumbing.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        path = scope["path"]
+        client = scope.get("client")
+
         # Log request
         logger.info(
-            f"[v0] Request: {request.method} {request.url.path}",
-            extra={
-                "method": request.method,
-                "path": request.url.path,
-                "client": request.client.host if request.client else None,
-            }
-        )
-        
-        # Process request
-        response = await call_next(request)
-        
-        # Calculate duration
-        duration = time.time() - start_time
-        
-        # Log response
-        logger.info(
-            f"[v0] Response: {response.status_code} ({duration:.3f}s)",
+            f"[v0] Request: {scope['method']} {path}",
             extra={
-                "status_code": response.status_code,
-                "duration": duration,
-                "path": request.url.path,
+                "method": scope["method"],
+                "path": path,
+                "client": client[0] if client else None,
             }
         )
-        
-        # Add timing header
-        response.headers["X-Process-Time"] = str(duration)
-        
-        return response
+
+        async def send_with_timing(message: Message):
+            if message["type"] == "http.response.start":
+                # Calculate duration up to the response headers
+                duration = time.perf_counter() - start_time
+
+                # Log response
+                logger.info(
+                    f"[v0] Response: {message['status']} ({duration:.3f}s)",
+                    extra={
+                        "status_code": message["status"],
+                        "duration": duration,
+                        "path": path,
+                    }
+                )
+
+                # Add timing header
+                headers = MutableHeaders(scope=message)
+                headers["X-Process-Time"] = str(duration)
+
+            await send(message)
+
+        await self.app(scope, receive, send_with_timing)
@@ -0,0 +1,53 @@
+"""
+Chat conversation and message models for database.
+"""
+from sqlalchemy import BigInteger, Column, DateTime, ForeignKey, Index, Integer, String, Text
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+# BIGSERIAL on PostgreSQL; SQLite only auto-increments INTEGER primary keys
+MessageId = BigInteger().with_variant(Integer, "sqlite")
+
+
+class Conversation(Base):
+    """A chat thread owned by one user, optionally within a project."""
+
+    __tablename__ = "conversations"
+
+    id = Column(String, primary_key=True)
+    user_id = Column(String, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    project_id = Column(String, nullable=True)
+    title = Column(String, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        Index("ix_conversations_user_project_updated", "user_id", "project_id", "updated_at"),
+    )
+
+
+class ChatMessage(Base):
+    """
+    One chat turn.
+
+    user_id and project_id are copied from the conversation so history can
+    be paged straight off the (user_id, project_id, created_at, id) index;
+    id breaks ties between turns inserted in the same statement.
+    """
+
+    __tablename__ = "chat_messages"
+
+    id = Column(MessageId, primary_key=True, autoincrement=True)
+    conversation_id = Column(
+        String, ForeignKey("conversations.id", ondelete="CASCADE"), nullable=False
+    )
+    user_id = Column(String, nullable=False)
+    project_id = Column(String, nullable=True)
+    role = Column(String(16), nullable=False)
+    content = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        Index("ix_chat_messages_user_project_created", "user_id", "project_id", "created_at", "id"),
+        Index("ix_chat_messages_conversation_created", "conversation_id", "created_at", "id"),
+    )
@@ -0,0 +1,17 @@
+"""
+Per-user usage counters for database.
+"""
+from sqlalchemy import BigInteger, Column, Date, ForeignKey, Integer, String
+from app.core.database import Base
+
+
+class UserUsage(Base):
+    """Daily request and token totals for one user."""
+
+    __tablename__ = "user_usage"
+
+    user_id = Column(String, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    requests = Column(Integer, nullable=False, default=0)
+    prompt_tokens = Column(BigInteger, nullable=False, default=0)
+    completion_tokens = Column(BigInteger, nullable=False, default=0)
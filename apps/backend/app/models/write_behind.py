@@ -0,0 +1,19 @@
+"""
+Write-behind receipts for database.
+"""
+from sqlalchemy import Column, DateTime, Index, String
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+
+class WriteReceipt(Base):
+    """A write-behind record that has been applied, so replays skip it."""
+
+    __tablename__ = "write_behind_receipts"
+
+    id = Column(String(32), primary_key=True)
+    applied_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        Index("ix_write_behind_receipts_applied_at", "applied_at"),
+    )
@@ -0,0 +1,185 @@
+"""
+Chat history access.
+Checks conversation ownership and pages history with keyset cursors.
+"""
+import base64
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import select, tuple_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.models.chat import ChatMessage, Conversation
+
+
+class ConversationAccessError(Exception):
+    """The conversation exists but belongs to another user."""
+
+
+def encode_cursor(created_at: datetime, message_id: int) -> str:
+    """Opaque cursor pointing just past a message."""
+    raw = f"{created_at.isoformat()}|{message_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    Inverse of encode_cursor.
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, message_id = base64.urlsafe_b64decode(padded).decode().split("|")
+        return datetime.fromisoformat(created_at), int(message_id)
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+
+
+async def ensure_conversation(
+    db: AsyncSession,
+    user_id: str,
+    conversation_id: Optional[str],
+    project_id: Optional[str],
+) -> str:
+    """
+    Return the ID of the user's conversation, creating it if needed.
+
+    Raises:
+        ConversationAccessError: If the ID belongs to another user
+    """
+    if conversation_id is not None:
+        owner = await db.scalar(
+            select(Conversation.user_id).where(Conversation.id == conversation_id)
+        )
+        if owner is not None:
+            if owner != user_id:
+                raise ConversationAccessError(conversation_id)
+            return conversation_id
+
+    conversation_id = conversation_id or uuid.uuid4().hex
+    db.add(Conversation(id=conversation_id, user_id=user_id, project_id=project_id))
+    await db.flush()
+    return conversation_id
+
+
+class ConversationOwners:
+    """
+    Conversation ownership checks for the request path.
+
+    A conversation's owner never changes, so it is cached in-process after
+    the first lookup and repeat turns cost no query. An unknown ID is
+    created (and committed) for the caller on first use, so the
+    write-behind flush and other workers agree on its owner. New
+    conversations without an ID get a fresh one and no query at all.
+    """
+
+    def __init__(self, max_entries: int):
+        self._owners: LRUCache[str] = LRUCache(max_entries)
+
+    async def claim(
+        self,
+        db: AsyncSession,
+        user_id: str,
+        conversation_id: Optional[str],
+        project_id: Optional[str],
+    ) -> str:
+        """
+        Return the ID of the user's conversation, creating it if needed.
+
+        Raises:
+            ConversationAccessError: If the ID belongs to another user
+        """
+        if conversation_id is None:
+            conversation_id = uuid.uuid4().hex
+            self._owners.set(conversation_id, user_id)
+            return conversation_id
+
+        owner = self._owners.get(conversation_id)
+        if owner is not None:
+            if owner != user_id:
+                raise ConversationAccessError(conversation_id)
+            return conversation_id
+
+        try:
+            await ensure_conversation(db, user_id, conversation_id, project_id)
+            await db.commit()
+        except IntegrityError:
+            # Created concurrently; the row now says who owns it
+            await db.rollback()
+            await ensure_conversation(db, user_id, conversation_id, project_id)
+
+        self._owners.set(conversation_id, user_id)
+        return conversation_id
+
+
+async def fetch_history(
+    db: AsyncSession,
+    user_id: str,
+    project_id: Optional[str] = None,
+    conversation_id: Optional[str] = None,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Page through a user's messages, newest first.
+
+    Filters on a conversation, or else on a project (None meaning chats
+    outside any project), so every page is an index range scan that costs
+    the same however deep it is.
+
+    Returns:
+        (messages, cursor for the next page or None)
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    query = select(
+        ChatMessage.id,
+        ChatMessage.conversation_id,
+        ChatMessage.role,
+        ChatMessage.content,
+        ChatMessage.created_at,
+    ).where(ChatMessage.user_id == user_id)
+
+    if conversation_id is not None:
+        query = query.where(ChatMessage.conversation_id == conversation_id)
+    elif project_id is not None:
+        query = query.where(ChatMessage.project_id == project_id)
+    else:
+        query = query.where(ChatMessage.project_id.is_(None))
+
+    if cursor:
+        created_at, message_id = decode_cursor(cursor)
+        query = query.where(
+            tuple_(ChatMessage.created_at, ChatMessage.id) < tuple_(created_at, message_id)
+        )
+
+    query = query.order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc()).limit(limit + 1)
+    rows = (await db.execute(query)).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+
+    messages = [
+        {
+            "id": row.id,
+            "conversation_id": row.conversation_id,
+            "role": row.role,
+            "content": row.content,
+            "created_at": row.created_at.isoformat(),
+        }
+        for row in rows
+    ]
+    return messages, next_cursor
+
+
+# Global conversation ownership cache instance
+conversation_owners = ConversationOwners(settings.CONVERSATION_OWNER_CACHE_SIZE)
@@ -0,0 +1,134 @@
+"""
+Cache for deterministic LLM completions.
+Local LRU tier in front of a shared Redis tier, keyed on the canonical request.
+"""
+import hashlib
+import json
+import logging
+from typing import Any, Dict, Optional
+
+from redis.exceptions import RedisError
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.core.metrics import COMPLETION_CACHE_BYTES_SAVED, COMPLETION_CACHE_LOOKUPS
+from app.core.redis import redis_client
+
+logger = logging.getLogger(__name__)
+
+# Request fields that never change the completion itself
+NON_SEMANTIC_FIELDS = {"stream"}
+
+
+def request_fingerprint(payload: Dict[str, Any]) -> str:
+    """
+    Canonical hash of a chat completion payload.
+
+    Covers the model, the (already sanitized) messages, sampling parameters
+    and any extra request options; key order and the streaming flag do not
+    matter.
+    """
+    canonical = {
+        key: value
+        for key, value in payload.items()
+        if key not in NON_SEMANTIC_FIELDS
+    }
+    encoded = json.dumps(canonical, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+class CompletionCache:
+    """
+    Two-tier completion cache.
+
+    Responses are stored as their JSON encoding, so every hit hands out a
+    fresh object and entry sizes are known. The local tier is bounded by
+    entry count and total bytes; Redis entries expire by TTL. Responses
+    larger than `max_entry_bytes` are not cached.
+    """
+
+    def __init__(
+        self,
+        redis,
+        ttl: int,
+        local_max_entries: int,
+        local_max_bytes: int,
+        max_entry_bytes: int,
+        key_prefix: str = "completion",
+    ):
+        self.redis = redis
+        self.ttl = ttl
+        self.max_entry_bytes = max_entry_bytes
+        self.key_prefix = key_prefix
+        self._local: LRUCache[str] = LRUCache(
+            local_max_entries, ttl=ttl, max_bytes=local_max_bytes
+        )
+
+    def make_key(self, payload: Dict[str, Any]) -> str:
+        """Cache key for a chat completion payload."""
+        return f"{self.key_prefix}:{request_fingerprint(payload)}"
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return a cached response, or None on a miss."""
+        encoded = self._local.get(key)
+        if encoded is not None:
+            COMPLETION_CACHE_LOOKUPS.labels(result="local_hit").inc()
+        else:
+            try:
+                encoded = await self.redis.get(key)
+            except RedisError as e:
+                logger.warning(f"Completion cache unavailable: {e}")
+                encoded = None
+
+            if encoded is None:
+                COMPLETION_CACHE_LOOKUPS.labels(result="miss").inc()
+                return None
+
+            COMPLETION_CACHE_LOOKUPS.labels(result="redis_hit").inc()
+            self._local.set(key, encoded)
+
+        COMPLETION_CACHE_BYTES_SAVED.inc(len(encoded))
+        return json.loads(encoded)
+
+    async def set(
+        self,
+        key: str,
+        response: Dict[str, Any],
+        ttl: Optional[int] = None,
+    ) -> None:
+        """Store a response in both tiers."""
+        encoded = json.dumps(response, separators=(",", ":"))
+        if len(encoded) > self.max_entry_bytes:
+            return
+
+        ttl = ttl or self.ttl
+        self._local.set(key, encoded, ttl=ttl)
+        try:
+            await self.redis.set(key, encoded, ex=ttl)
+        except RedisError as e:
+            logger.warning(f"Completion cache unavailable: {e}")
+
+
+def completion_from_text(content: str, model: str) -> Dict[str, Any]:
+    """Build a chat completion response around text collected from a stream."""
+    return {
+        "object": "chat.completion",
+        "model": model,
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }
+        ],
+    }
+
+
+# Global completion cache instance
+completion_cache = CompletionCache(
+    redis_client,
+    ttl=settings.COMPLETION_CACHE_TTL_SECONDS,
+    local_max_entries=settings.COMPLETION_CACHE_LOCAL_MAX_ENTRIES,
+    local_max_bytes=settings.COMPLETION_CACHE_LOCAL_MAX_BYTES,
+    max_entry_bytes=settings.COMPLETION_CACHE_MAX_ENTRY_BYTES,
+)
@@ -0,0 +1,152 @@
+"""
+Token-aware context window management for chat requests.
+Fits long conversations into a per-model prompt budget before they go upstream.
+"""
+import hashlib
+import re
+from typing import Dict, List, Optional
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.core.metrics import CHAT_CONTEXT_MESSAGES_TRIMMED, CHAT_CONTEXT_TOKENS
+
+# Word pieces of up to six characters and single punctuation marks track
+# BPE token counts closely enough for budgeting, at a fraction of the cost
+_TOKEN_PIECE = re.compile(r"\w{1,6}|[^\w\s]")
+
+# Role markers and separators the chat template adds to every message
+MESSAGE_OVERHEAD = 4
+
+# Characters of each omitted message quoted in the summary
+SUMMARY_EXCERPT_CHARS = 200
+
+
+class TokenCounter:
+    """Approximate token counts, memoized per message content hash."""
+
+    def __init__(self, max_entries: int):
+        self._counts: LRUCache[int] = LRUCache(max_entries)
+
+    def count(self, text: str) -> int:
+        """Estimated tokens in `text`."""
+        key = hashlib.blake2b(text.encode(), digest_size=16).digest()
+        tokens = self._counts.get(key)
+        if tokens is None:
+            tokens = len(_TOKEN_PIECE.findall(text))
+            self._counts.set(key, tokens)
+        return tokens
+
+    def count_message(self, message: Dict[str, str]) -> int:
+        return self.count(message["content"]) + MESSAGE_OVERHEAD
+
+
+class ContextWindow:
+    """
+    Trims conversations to a prompt token budget.
+
+    System messages (where project context lives) and the latest message
+    are pinned. The remaining turns are kept newest first while they fit;
+    older ones are replaced by a short extractive summary system message,
+    so the model still knows what was discussed without paying for it.
+    """
+
+    def __init__(
+        self,
+        counter: TokenCounter,
+        budgets: Dict[str, int],
+        default_budget: int,
+        summary_tokens: int,
+    ):
+        self.counter = counter
+        self.budgets = budgets
+        self.default_budget = default_budget
+        self.summary_tokens = summary_tokens
+
+    def budget_for(self, model: str) -> int:
+        return self.budgets.get(model, self.default_budget)
+
+    def summarize(self, dropped: List[Dict[str, str]]) -> Optional[Dict[str, str]]:
+        """
+        Summary of omitted turns, within `summary_tokens`.
+
+        Quotes the start of each omitted message, most recent first, so the
+        turns closest to the kept context survive when space runs out.
+        """
+        header = f"Earlier in this conversation ({len(dropped)} messages omitted):"
+        lines: List[str] = []
+        used = self.counter.count(header) + MESSAGE_OVERHEAD
+
+        for message in reversed(dropped):
+            excerpt = " ".join(message["content"].split())
+            if len(excerpt) > SUMMARY_EXCERPT_CHARS:
+                excerpt = excerpt[:SUMMARY_EXCERPT_CHARS].rstrip() + "..."
+            line = f"- {message['role']}: {excerpt}"
+            tokens = self.counter.count(line)
+            if used + tokens > self.summary_tokens:
+                break
+            lines.append(line)
+            used += tokens
+
+        if not lines:
+            return None
+        return {"role": "system", "content": "\n".join([header, *reversed(lines)])}
+
+    def fit(self, messages: List[Dict[str, str]], model: str) -> List[Dict[str, str]]:
+        """
+        Return `messages` trimmed to the model's budget.
+
+        Args:
+            messages: Chat messages in conversation order
+            model: Upstream model the request is for
+
+        Returns:
+            The messages to send; the input list if it already fits
+        """
+        budget = self.budget_for(model)
+        counts = [self.counter.count_message(m) for m in messages]
+        total = sum(counts)
+
+        if total <= budget or len(messages) < 2:
+            CHAT_CONTEXT_TOKENS.labels(model=model).observe(total)
+            return messages
+
+        last = len(messages) - 1
+        pinned = {i for i, m in enumerate(messages) if m["role"] == "system"} | {last}
+        available = budget - sum(counts[i] for i in pinned) - self.summary_tokens
+
+        kept = set(pinned)
+        for i in range(last - 1, -1, -1):
+            if i in pinned:
+                continue
+            if counts[i] > available:
+                break
+            kept.add(i)
+            available -= counts[i]
+
+        dropped = [m for i, m in enumerate(messages) if i not in kept]
+        summary = self.summarize(dropped) if self.summary_tokens > 0 else None
+
+        fitted = []
+        for i, message in enumerate(messages):
+            if i not in kept:
+                continue
+            if summary is not None and message["role"] != "system":
+                # Just ahead of the first kept turn, after pinned context
+                fitted.append(summary)
+                summary = None
+            fitted.append(message)
+
+        CHAT_CONTEXT_MESSAGES_TRIMMED.inc(len(dropped))
+        CHAT_CONTEXT_TOKENS.labels(model=model).observe(
+            sum(self.counter.count_message(m) for m in fitted)
+        )
+        return fitted
+
+
+# Global context window instance
+context_window = ContextWindow(
+    TokenCounter(settings.CONTEXT_TOKEN_CACHE_SIZE),
+    budgets=settings.CONTEXT_TOKEN_BUDGETS,
+    default_budget=settings.CONTEXT_DEFAULT_TOKEN_BUDGET,
+    summary_tokens=settings.CONTEXT_SUMMARY_MAX_TOKENS,
+)
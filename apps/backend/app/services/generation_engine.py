@@ -0,0 +1,386 @@
+"""
+Generation engine that executes TaskPlanner plans.
+Runs independent tasks concurrently, in dependency order, against OpenRouter.
+"""
+import asyncio
+import logging
+import re
+import time
+from collections import defaultdict
+from typing import Any, AsyncGenerator, AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.core.metrics import GENERATION_TASKS
+from app.core.scheduler import Priority
+from app.services.openrouter import openrouter_client
+
+logger = logging.getLogger(__name__)
+
+
+CODE_GENERATION_SYSTEM_PROMPT = """You are an expert software engineer.
+Generate clean, production-ready code based on the task description.
+
+Rules:
+1. Output ONLY code in triple backticks with file path
+2. Follow framework best practices and conventions
+3. Include proper TypeScript types and error handling
+4. Add brief comments for complex logic
+5. Use modern syntax and patterns
+6. Never include API keys or secrets
+
+Format:
+```typescript:path/to/file.tsx
+// file contents
+```
+
+Output one block per file.
+"""
+
+# ```lang:path/to/file ... ```
+_FILE_BLOCK = re.compile(r"```[\w+#.-]*:([^\n`]+)\n(.*?)```", re.DOTALL)
+_ANY_BLOCK = re.compile(r"```[^\n]*\n(.*?)```", re.DOTALL)
+
+# Characters of each dependency file included in a dependent task's prompt
+DEPENDENCY_CONTEXT_CHARS = 4000
+
+# Events that end a task
+TASK_FINAL_EVENTS = {"task_completed", "task_failed", "task_skipped"}
+
+
+class PlanValidationError(ValueError):
+    """The plan's task graph cannot be executed."""
+
+
+def topological_order(tasks: List[Dict[str, Any]]) -> List[str]:
+    """
+    Order task IDs so every task comes after its dependencies.
+
+    Raises:
+        PlanValidationError: On duplicate IDs, unknown dependencies or cycles
+    """
+    ids = [task["id"] for task in tasks]
+    known = set(ids)
+    if len(known) != len(ids):
+        duplicates = sorted({i for i in ids if ids.count(i) > 1})
+        raise PlanValidationError(f"Duplicate task IDs: {', '.join(duplicates)}")
+
+    dependents: Dict[str, List[str]] = defaultdict(list)
+    indegree: Dict[str, int] = {}
+    for task in tasks:
+        dependencies = set(task.get("dependencies", []))
+        missing = dependencies - known
+        if missing:
+            raise PlanValidationError(
+                f"Task {task['id']} depends on unknown tasks: {', '.join(sorted(missing))}"
+            )
+        indegree[task["id"]] = len(dependencies)
+        for dependency in dependencies:
+            dependents[dependency].append(task["id"])
+
+    ready = [i for i in ids if indegree[i] == 0]
+    order: List[str] = []
+    while ready:
+        task_id = ready.pop(0)
+        order.append(task_id)
+        for dependent in dependents[task_id]:
+            indegree[dependent] -= 1
+            if indegree[dependent] == 0:
+                ready.append(dependent)
+
+    if len(order) != len(ids):
+        cyclic = [i for i in ids if indegree[i] > 0]
+        raise PlanValidationError(f"Dependency cycle among tasks: {', '.join(cyclic)}")
+    return order
+
+
+def parse_files(content: str, task: Dict[str, Any]) -> Dict[str, str]:
+    """
+    Extract `{path: code}` from a generation response.
+
+    A single unlabelled code block is accepted for single-file tasks.
+    """
+    files = {path.strip(): code for path, code in _FILE_BLOCK.findall(content)}
+    if not files and len(task.get("files", [])) == 1:
+        blocks = _ANY_BLOCK.findall(content)
+        if len(blocks) == 1:
+            files = {task["files"][0]: blocks[0]}
+    return files
+
+
+class GenerationEngine:
+    """
+    Executes a plan's tasks as a DAG.
+
+    Each task is started as soon as all of its dependencies have completed
+    (not level by level), with at most `max_concurrency` upstream calls in
+    flight, so a plan takes about as long as its critical path. The files
+    produced by a task's direct dependencies are included in its prompt.
+    A failed task causes its transitive dependents to be skipped. Tasks
+    can also be fed in while the plan is still streaming (run_stream()).
+    """
+
+    def __init__(self, client, max_concurrency: int, max_tokens: int):
+        self.client = client
+        self.max_concurrency = max_concurrency
+        self.max_tokens = max_tokens
+
+    def _build_prompt(
+        self,
+        project: Dict[str, Any],
+        task: Dict[str, Any],
+        inputs: Dict[str, Dict[str, str]],
+    ) -> str:
+        parts = [
+            f"Project: {project.get('name', '')} "
+            f"({project.get('framework', '')}, {project.get('language', '')})",
+            project.get("description", ""),
+            "",
+            f"Task {task['id']}: {task['title']}",
+            task.get("description", ""),
+        ]
+        if task.get("files"):
+            parts.append(f"Files to produce: {', '.join(task['files'])}")
+
+        if inputs:
+            parts.append("\nFiles already generated by the tasks this depends on:")
+            for files in inputs.values():
+                for path, code in files.items():
+                    parts.append(f"```{path}\n{code[:DEPENDENCY_CONTEXT_CHARS]}\n```")
+        return "\n".join(parts)
+
+    async def generate_task(
+        self,
+        project: Dict[str, Any],
+        task: Dict[str, Any],
+        inputs: Dict[str, Dict[str, str]],
+        user_id: Optional[str] = None,
+    ) -> Dict[str, str]:
+        """
+        Generate one task's files.
+
+        Raises:
+            ValueError: If the response contains no files
+        """
+        response = await self.client.chat_completion(
+            messages=[
+                {"role": "system", "content": CODE_GENERATION_SYSTEM_PROMPT},
+                {"role": "user", "content": self._build_prompt(project, task, inputs)},
+            ],
+            temperature=0.2,
+            max_tokens=self.max_tokens,
+            user_id=user_id,
+            priority=Priority.BULK,
+        )
+        content = response["choices"][0]["message"]["content"]
+
+        files = parse_files(content, task)
+        if not files:
+            raise ValueError("Response contained no files")
+        return files
+
+    async def run(
+        self,
+        plan: Dict[str, Any],
+        user_id: Optional[str] = None,
+    ) -> AsyncGenerator[Dict[str, Any], None]:
+        """
+        Execute a complete plan, yielding progress events.
+
+        See run_stream() for the events.
+
+        Raises:
+            PlanValidationError: If the plan cannot be executed
+        """
+        topological_order(plan["tasks"])
+
+        async def parts() -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+            yield "project", plan.get("project", {})
+            for task in plan["tasks"]:
+                yield "task", task
+
+        events = self.run_stream(parts(), user_id)
+        try:
+            async for event in events:
+                yield event
+        finally:
+            await events.aclose()
+
+    async def run_stream(
+        self,
+        parts: AsyncIterator[Tuple[str, Dict[str, Any]]],
+        user_id: Optional[str] = None,
+    ) -> AsyncGenerator[Dict[str, Any], None]:
+        """
+        Execute a plan while it is still being produced, yielding progress events.
+
+        `parts` yields ("project", project) and ("task", task) pairs, e.g.
+        from TaskPlanner.stream_plan(); anything else is ignored. A task is
+        started as soon as it has arrived and its dependencies have
+        completed, so generation overlaps planning. Dependencies may name
+        tasks that arrive later; once `parts` is exhausted, tasks waiting
+        on unknown tasks or on a cycle are skipped. If `parts` raises, the
+        error is reported as `plan_error` and the tasks received so far
+        still run.
+
+        Task calls are scheduled as bulk work for `user_id`, so a large
+        plan does not hold up interactive chat.
+
+        Yields `task_planned` as each task arrives, `task_started`, then
+        `task_completed` (with files), `task_failed` or `task_skipped` for
+        every task, and finally `plan_completed`. Closing the iterator
+        cancels running tasks.
+        """
+        project: Dict[str, Any] = {}
+        tasks: Dict[str, Dict[str, Any]] = {}
+        waiting: Dict[str, Set[str]] = {}
+        dependents: Dict[str, List[str]] = defaultdict(list)
+
+        results: Dict[str, Dict[str, str]] = {}
+        events: asyncio.Queue = asyncio.Queue()
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        running: Set[asyncio.Task] = set()
+        launched: Set[str] = set()
+        # Tasks that failed or are (about to be reported as) skipped
+        abandoned: Set[str] = set()
+        counts = {"completed": 0, "failed": 0, "skipped": 0}
+        started_at = time.monotonic()
+
+        async def receive() -> None:
+            try:
+                async for kind, value in parts:
+                    if kind in ("project", "task"):
+                        events.put_nowait({"type": f"_{kind}", "value": value})
+            except Exception as e:
+                logger.warning(f"Plan stream failed: {e}")
+                events.put_nowait({"type": "plan_error", "message": str(e)})
+            finally:
+                events.put_nowait({"type": "_plan_closed"})
+
+        async def execute(task_id: str) -> None:
+            task = tasks[task_id]
+            async with semaphore:
+                events.put_nowait({"type": "task_started", "task_id": task_id})
+                task_started = time.monotonic()
+                try:
+                    files = await self.generate_task(
+                        project, task, {d: results[d] for d in task["dependencies"]}, user_id
+                    )
+                except Exception as e:
+                    logger.warning(f"Generation task {task_id} failed: {e}")
+                    events.put_nowait({"type": "task_failed", "task_id": task_id, "error": str(e)})
+                    return
+
+            results[task_id] = files
+            events.put_nowait({
+                "type": "task_completed",
+                "task_id": task_id,
+                "files": files,
+                "duration": round(time.monotonic() - task_started, 3),
+            })
+
+        def launch(task_id: str) -> None:
+            launched.add(task_id)
+            worker = asyncio.create_task(execute(task_id))
+            running.add(worker)
+            worker.add_done_callback(running.discard)
+
+        def skip(task_id: str, reason: str) -> None:
+            if task_id in abandoned:
+                return
+            abandoned.add(task_id)
+            events.put_nowait({"type": "task_skipped", "task_id": task_id, "reason": reason})
+
+        def plan_task(task: Dict[str, Any]) -> None:
+            task_id = task["id"]
+            tasks[task_id] = task
+            dependencies = set(task.get("dependencies", []))
+            failed = sorted(dependencies & abandoned)
+            if failed:
+                skip(task_id, f"Dependency {failed[0]} did not complete")
+                return
+            waiting[task_id] = {d for d in dependencies if d not in results}
+            for dependency in waiting[task_id]:
+                dependents[dependency].append(task_id)
+            if not waiting[task_id]:
+                launch(task_id)
+
+        def close_plan() -> None:
+            # Whatever is still waiting now can only wait on unknown tasks or a cycle
+            blocked = [t for t in waiting if t not in launched and t not in abandoned]
+            for task_id in blocked:
+                unknown = sorted(waiting[task_id] - tasks.keys())
+                if unknown:
+                    skip(task_id, f"Depends on unknown tasks: {', '.join(unknown)}")
+
+            resolvable = launched | abandoned
+            changed = True
+            while changed:
+                changed = False
+                for task_id in blocked:
+                    if task_id not in resolvable and waiting[task_id] <= resolvable:
+                        resolvable.add(task_id)
+                        changed = True
+            for task_id in blocked:
+                if task_id not in resolvable:
+                    skip(task_id, "Dependency cycle")
+
+        receiver = asyncio.create_task(receive())
+        try:
+            plan_closed = False
+            finished = 0
+            while not (plan_closed and finished == len(tasks)):
+                event = await events.get()
+
+                if event["type"] == "_project":
+                    project.update(event["value"])
+                    continue
+                if event["type"] == "_task":
+                    task = event["value"]
+                    if task["id"] in tasks:
+                        logger.warning(f"Ignoring duplicate task {task['id']}")
+                        continue
+                    yield {"type": "task_planned", "task_id": task["id"], "task": task}
+                    plan_task(task)
+                    continue
+                if event["type"] == "_plan_closed":
+                    plan_closed = True
+                    close_plan()
+                    continue
+
+                yield event
+
+                if event["type"] not in TASK_FINAL_EVENTS:
+                    continue
+                finished += 1
+                status = event["type"][len("task_"):]
+                counts[status] += 1
+                GENERATION_TASKS.labels(status=status).inc()
+
+                task_id = event["task_id"]
+                if event["type"] == "task_failed":
+                    abandoned.add(task_id)
+                for dependent in dependents[task_id]:
+                    if event["type"] == "task_completed":
+                        waiting[dependent].discard(task_id)
+                        if not waiting[dependent] and dependent not in abandoned:
+                            launch(dependent)
+                    else:
+                        skip(dependent, f"Dependency {task_id} did not complete")
+
+            yield {
+                "type": "plan_completed",
+                **counts,
+                "duration": round(time.monotonic() - started_at, 3),
+            }
+        finally:
+            receiver.cancel()
+            for worker in list(running):
+                worker.cancel()
+
+
+# Global generation engine instance
+generation_engine = GenerationEngine(
+    openrouter_client,
+    max_concurrency=settings.GENERATION_MAX_CONCURRENCY,
+    max_tokens=settings.GENERATION_TASK_MAX_TOKENS,
+)
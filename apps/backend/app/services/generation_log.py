@@ -0,0 +1,279 @@
+"""
+Replay log for streamed generations.
+Tokens are teed into a Redis Stream so any worker can serve (and resume) them.
+"""
+import asyncio
+import logging
+import time
+from typing import AsyncGenerator, AsyncIterator, Awaitable, Callable, Dict, Optional, Set, Tuple
+
+from redis.exceptions import RedisError
+
+from app.core.config import settings
+from app.core.redis import redis_client, redis_stream_client
+
+logger = logging.getLogger(__name__)
+
+# Entry types that end a generation
+FINAL_TYPES = {"complete", "error"}
+
+
+class GenerationLog:
+    """
+    Redis Streams log of a generation's events.
+
+    A generation is produced by a background task on the worker that
+    received the request, which appends `start`, `token` and finally
+    `complete` or `error` entries to `generation:{id}`. Clients are served by
+    tailing the stream with XREAD from any worker, so a reconnecting client
+    resumes after its last entry ID without a new upstream call. Blocking
+    reads go through `stream_redis`, a separate pool, so tailing clients
+    never hold the connections everything else uses. Readers refresh a
+    heartbeat key while tailing and are counted. When the last one leaves,
+    a producer on the same worker is woken at once and cancels its upstream
+    stream unless a reader rejoins within `reader_grace` seconds (the
+    reconnect window). The producer also checks the heartbeat every
+    `reader_grace` seconds, which covers readers on other workers (their
+    heartbeat is cut to the window when they leave), crashed readers and
+    stalled upstreams.
+    Logs expire `ttl` seconds after creation, or `completed_ttl` seconds
+    after the generation finishes.
+    """
+
+    def __init__(
+        self,
+        redis,
+        ttl: int,
+        completed_ttl: int,
+        maxlen: int,
+        reader_grace: float,
+        block_ms: int,
+        key_prefix: str = "generation",
+        stream_redis=None,
+    ):
+        self.redis = redis
+        self.stream_redis = stream_redis or redis
+        self.ttl = ttl
+        self.completed_ttl = completed_ttl
+        self.maxlen = maxlen
+        self.reader_grace = reader_grace
+        self.block_ms = block_ms
+        self.key_prefix = key_prefix
+        self._producers: Set[asyncio.Task] = set()
+        # Set when the last reader of a generation produced here leaves
+        self._reader_left: Dict[str, asyncio.Event] = {}
+
+    def _key(self, generation_id: str) -> str:
+        return f"{self.key_prefix}:{generation_id}"
+
+    def _reader_key(self, generation_id: str) -> str:
+        return f"{self.key_prefix}:{generation_id}:reader"
+
+    def _readers_key(self, generation_id: str) -> str:
+        return f"{self.key_prefix}:{generation_id}:readers"
+
+    @property
+    def _heartbeat_ms(self) -> int:
+        # Outlasts a blocking read, so an active reader never lapses
+        return int(self.reader_grace * 1000) + self.block_ms
+
+    async def append(self, generation_id: str, fields: Dict[str, str]) -> str:
+        """Append an entry; returns its stream ID."""
+        return await self.redis.xadd(
+            self._key(generation_id), fields, maxlen=self.maxlen, approximate=True
+        )
+
+    async def touch_reader(self, generation_id: str) -> None:
+        """Record that a client is reading the generation."""
+        await self.redis.set(self._reader_key(generation_id), "1", px=self._heartbeat_ms)
+
+    async def _join(self, generation_id: str) -> None:
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.incr(self._readers_key(generation_id))
+            pipe.expire(self._readers_key(generation_id), self.ttl)
+            pipe.set(self._reader_key(generation_id), "1", px=self._heartbeat_ms)
+            await pipe.execute()
+
+    async def _leave(self, generation_id: str) -> None:
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.decr(self._readers_key(generation_id))
+            pipe.expire(self._readers_key(generation_id), self.ttl)
+            remaining, _ = await pipe.execute()
+        if remaining > 0:
+            return
+        # Leave only the reconnect window, and wake a local producer now
+        await self.redis.pexpire(
+            self._reader_key(generation_id), int(self.reader_grace * 1000)
+        )
+        left = self._reader_left.get(generation_id)
+        if left is not None:
+            left.set()
+
+    async def has_reader(self, generation_id: str) -> bool:
+        return bool(await self.redis.exists(self._reader_key(generation_id)))
+
+    async def reader_count(self, generation_id: str) -> int:
+        """Clients currently tailing the generation, on any worker."""
+        return int(await self.redis.get(self._readers_key(generation_id)) or 0)
+
+    async def owner(self, generation_id: str) -> Optional[str]:
+        """User ID that started the generation, or None if it is unknown."""
+        entries = await self.redis.xrange(self._key(generation_id), count=1)
+        if not entries:
+            return None
+        _, fields = entries[0]
+        return fields.get("user_id") if fields.get("type") == "start" else None
+
+    async def start(
+        self,
+        generation_id: str,
+        user_id: str,
+        tokens: Callable[[], Awaitable[AsyncGenerator[str, None]]],
+        metadata: Optional[Dict[str, str]] = None,
+    ) -> None:
+        """
+        Open the log and start producing it in the background.
+
+        Args:
+            generation_id: New, unique generation ID
+            user_id: Owner; only they may read or resume the generation
+            tokens: Opens the upstream token stream
+            metadata: Extra string fields stored on the start entry
+        """
+        key = self._key(generation_id)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.xadd(key, {**(metadata or {}), "type": "start", "user_id": user_id})
+            pipe.expire(key, self.ttl)
+            pipe.set(self._reader_key(generation_id), "1", px=self._heartbeat_ms)
+            await pipe.execute()
+
+        self._reader_left[generation_id] = asyncio.Event()
+        task = asyncio.create_task(self._produce(generation_id, tokens))
+        self._producers.add(task)
+        task.add_done_callback(self._producers.discard)
+
+    async def _produce(
+        self,
+        generation_id: str,
+        tokens: Callable[[], Awaitable[AsyncGenerator[str, None]]],
+    ) -> None:
+        final: Dict[str, str] = {"type": "complete"}
+        stream: Optional[AsyncGenerator[str, None]] = None
+        abandoned = False
+
+        async def consume() -> None:
+            nonlocal stream
+            stream = await tokens()
+            async for token in stream:
+                await self.append(generation_id, {"type": "token", "content": token})
+
+        async def watch(consumer: asyncio.Task) -> None:
+            # Runs on a timer too, so a stalled upstream is abandoned as well
+            nonlocal abandoned
+            left = self._reader_left[generation_id]
+            while True:
+                try:
+                    await asyncio.wait_for(left.wait(), self.reader_grace)
+                    woken = True
+                except asyncio.TimeoutError:
+                    woken = False
+                if woken:
+                    # Give the client the reconnect window, then see if it rejoined
+                    left.clear()
+                    await asyncio.sleep(self.reader_grace)
+                try:
+                    if woken and await self.reader_count(generation_id) > 0:
+                        continue
+                    if not woken and await self.has_reader(generation_id):
+                        continue
+                except RedisError:
+                    continue
+                abandoned = True
+                consumer.cancel()
+                return
+
+        consumer = asyncio.create_task(consume())
+        watchdog = asyncio.create_task(watch(consumer))
+        try:
+            await consumer
+        except asyncio.CancelledError:
+            if abandoned:
+                final = {"type": "error", "message": "Generation abandoned"}
+            else:
+                final = {"type": "error", "message": "Generation cancelled"}
+        except Exception as e:
+            final = {"type": "error", "message": str(e)}
+        finally:
+            watchdog.cancel()
+            consumer.cancel()
+            self._reader_left.pop(generation_id, None)
+            if stream is not None:
+                # Closing the token stream cancels the upstream request
+                await stream.aclose()
+
+        try:
+            key = self._key(generation_id)
+            async with self.redis.pipeline(transaction=True) as pipe:
+                pipe.xadd(key, final, maxlen=self.maxlen, approximate=True)
+                pipe.expire(key, self.completed_ttl)
+                await pipe.execute()
+        except RedisError as e:
+            logger.warning(f"Could not finish generation {generation_id}: {e}")
+
+    async def tail(
+        self,
+        generation_id: str,
+        after: str = "0-0",
+    ) -> AsyncIterator[Tuple[str, Dict[str, str]]]:
+        """
+        Yield (entry ID, fields) after `after`, following the live stream
+        until the generation finishes.
+        """
+        key = self._key(generation_id)
+        last_id = after
+        next_touch = time.monotonic() + self.reader_grace / 3
+
+        await self._join(generation_id)
+        try:
+            while True:
+                if time.monotonic() >= next_touch:
+                    await self.touch_reader(generation_id)
+                    next_touch = time.monotonic() + self.reader_grace / 3
+                response = await self.stream_redis.xread({key: last_id}, block=self.block_ms)
+
+                if not response:
+                    if not await self.redis.exists(key):
+                        # Expired or never existed
+                        yield "", {"type": "error", "message": "Generation not found"}
+                        return
+                    continue
+
+                for entry_id, fields in response[0][1]:
+                    last_id = entry_id
+                    yield entry_id, fields
+                    if fields.get("type") in FINAL_TYPES:
+                        return
+        finally:
+            try:
+                await self._leave(generation_id)
+            except RedisError as e:
+                logger.warning(f"Could not release reader of generation {generation_id}: {e}")
+
+    async def aclose(self) -> None:
+        """Cancel in-flight producers (called from the application lifespan)."""
+        for task in list(self._producers):
+            task.cancel()
+        if self._producers:
+            await asyncio.gather(*self._producers, return_exceptions=True)
+
+
+# Global generation log instance
+generation_log = GenerationLog(
+    redis_client,
+    ttl=settings.GENERATION_LOG_TTL_SECONDS,
+    completed_ttl=settings.GENERATION_LOG_COMPLETED_TTL_SECONDS,
+    maxlen=settings.GENERATION_LOG_MAX_ENTRIES,
+    reader_grace=settings.GENERATION_LOG_READER_GRACE_SECONDS,
+    block_ms=settings.GENERATION_LOG_BLOCK_MS,
+    stream_redis=redis_stream_client,
+)
@@ -2,29 +2,31 @@
 GitHub integration service using Octokit-style API calls.
 Handles repository operations, commits, branches, PRs, and merges.
 """
-import httpx
 from typing import Dict, Any, List, Optional
 from app.core.config import settings
+from app.core.http import SharedClient
 
 
 class GitHubService:
     """Service for GitHub API operations."""
     
+    client = SharedClient(timeout=30.0)
+    
     def __init__(self, access_token: str):
         self.access_token = access_token
         self.base_url = "https://api.github.com"
-        self.client = httpx.AsyncClient(
-            headers={
-                "Authorization": f"Bearer {access_token}",
-                "Accept": "application/vnd.github+json",
-                "X-GitHub-Api-Version": "2022-11-28",
-            },
-            timeout=30.0
-        )
+        self.headers = {
+            "Authorization": f"Bearer {access_token}",
+            "Accept": "application/vnd.github+json",
+            "X-GitHub-Api-Version": "2022-11-28",
+        }
     
     async def get_user(self) -> Dict[str, Any]:
         """Get authenticated user information."""
-        response = await self.client.get(f"{self.base_url}/user")
+        response = await self.client.get(
+            f"{self.base_url}/user",
+            headers=self.headers
+        )
         response.raise_for_status()
         return response.json()
     
@@ -56,14 +58,18 @@ class GitHubService:
         
         response = await self.client.post(
             f"{self.base_url}/user/repos",
-            json=payload
+            json=payload,
+            headers=self.headers
         )
         response.raise_for_status()
         return response.json()
     
     async def get_repository(self, owner: str, repo: str) -> Dict[str, Any]:
         """Get repository information."""
-        response = await self.client.get(f"{self.base_url}/repos/{owner}/{repo}")
+        response = await self.client.get(
+            f"{self.base_url}/repos/{owner}/{repo}",
+            headers=self.headers
+        )
         response.raise_for_status()
         return response.json()
     
@@ -107,7 +113,8 @@ class GitHubService:
         
         response = await self.client.put(
             f"{self.base_url}/repos/{owner}/{repo}/contents/{path}",
-            json=payload
+            json=payload,
+            headers=self.headers
         )
         response.raise_for_status()
         return response.json()
@@ -148,7 +155,8 @@ class GitHubService:
         
         response = await self.client.post(
             f"{self.base_url}/repos/{owner}/{repo}/git/trees",
-            json=payload
+            json=payload,
+            headers=self.headers
         )
         response.raise_for_status()
         return response.json()
@@ -170,7 +178,8 @@ class GitHubService:
         
         response = await self.client.post(
             f"{self.base_url}/repos/{owner}/{repo}/git/commits",
-            json=payload
+            json=payload,
+            headers=self.headers
         )
         response.raise_for_status()
         return response.json()
@@ -191,7 +200,8 @@ class GitHubService:
         
         response = await self.client.patch(
             f"{self.base_url}/repos/{owner}/{repo}/git/refs/{ref}",
-            json=payload
+            json=payload,
+            headers=self.headers
         )
         response.raise_for_status()
         return response.json()
@@ -206,7 +216,8 @@ class GitHubService:
         """Create a new branch."""
         # Get the SHA of the source branch
         ref_response = await self.client.get(
-            f"{self.base_url}/repos/{owner}/{repo}/git/ref/heads/{from_branch}"
+            f"{self.base_url}/repos/{owner}/{repo}/git/ref/heads/{from_branch}",
+            headers=self.headers
         )
         ref_response.raise_for_status()
         sha = ref_response.json()["object"]["sha"]
@@ -219,7 +230,8 @@ class GitHubService:
         
         response = await self.client.post(
             f"{self.base_url}/repos/{owner}/{repo}/git/refs",
-            json=payload
+            json=payload,
+            headers=self.headers
         )
         response.raise_for_status()
         return response.json()
@@ -243,7 +255,8 @@ class GitHubService:
         
         response = await self.client.post(
             f"{self.base_url}/repos/{owner}/{repo}/pulls",
-            json=payload
+            json=payload,
+            headers=self.headers
         )
         response.raise_for_status()
         return response.json()
@@ -275,7 +288,8 @@ class GitHubService:
         
         response = await self.client.put(
             f"{self.base_url}/repos/{owner}/{repo}/pulls/{pull_number}/merge",
-            json=payload
+            json=payload,
+            headers=self.headers
         )
         response.raise_for_status()
         return response.json()
@@ -294,7 +308,8 @@ class GitHubService:
         
         response = await self.client.get(
             f"{self.base_url}/repos/{owner}/{repo}/commits",
-            params=params
+            params=params,
+            headers=self.headers
         )
         response.raise_for_status()
         return response.json()
@@ -308,11 +323,7 @@ class GitHubService:
         """Get commit diff."""
         response = await self.client.get(
             f"{self.base_url}/repos/{owner}/{repo}/commits/{commit_sha}",
-            headers={"Accept": "application/vnd.github.diff"}
+            headers={**self.headers, "Accept": "application/vnd.github.diff"}
         )
         response.raise_for_status()
         return {"diff": response.text}
-    
-    async def close(self):
-        """Close the HTTP client."""
-        await self.client.aclose()
@@ -2,24 +2,23 @@
 Netlify deployment service.
 Handles site creation and deployment via Netlify API.
 """
-import httpx
 from typing import Dict, Any, Optional
 from app.core.config import settings
+from app.core.http import SharedClient
 
 
 class NetlifyService:
     """Service for Netlify API operations."""
     
+    client = SharedClient(timeout=60.0)
+    
     def __init__(self, token: Optional[str] = None):
         self.token = token or settings.NETLIFY_TOKEN
         self.base_url = "https://api.netlify.com/api/v1"
-        self.client = httpx.AsyncClient(
-            headers={
-                "Authorization": f"Bearer {self.token}",
-                "Content-Type": "application/json",
-            },
-            timeout=60.0
-        )
+        self.headers = {
+            "Authorization": f"Bearer {self.token}",
+            "Content-Type": "application/json",
+        }
     
     async def create_site(
         self,
@@ -42,14 +41,18 @@ class NetlifyService:
         
         response = await self.client.post(
             f"{self.base_url}/sites",
-            json=payload
+            json=payload,
+            headers=self.headers
         )
         response.raise_for_status()
         return response.json()
     
     async def get_site(self, site_id: str) -> Dict[str, Any]:
         """Get site details."""
-        response = await self.client.get(f"{self.base_url}/sites/{site_id}")
+        response = await self.client.get(
+            f"{self.base_url}/sites/{site_id}",
+            headers=self.headers
+        )
         response.raise_for_status()
         return response.json()
     
@@ -86,7 +89,8 @@ class NetlifyService:
         
         response = await self.client.post(
             f"{self.base_url}/sites/{site_id}/deploys",
-            json=payload
+            json=payload,
+            headers=self.headers
         )
         response.raise_for_status()
         deploy = response.json()
@@ -118,13 +122,16 @@ class NetlifyService:
         response = await self.client.put(
             f"{self.base_url}/deploys/{deploy_id}/files/{path}",
             content=content.encode(),
-            headers={"Content-Type": "application/octet-stream"}
+            headers={**self.headers, "Content-Type": "application/octet-stream"}
         )
         response.raise_for_status()
     
     async def get_deploy(self, deploy_id: str) -> Dict[str, Any]:
         """Get deployment status and details."""
-        response = await self.client.get(f"{self.base_url}/deploys/{deploy_id}")
+        response = await self.client.get(
+            f"{self.base_url}/deploys/{deploy_id}",
+            headers=self.headers
+        )
         response.raise_for_status()
         return response.json()
     
@@ -151,11 +158,8 @@ class NetlifyService:
         
         response = await self.client.patch(
             f"{self.base_url}/sites/{site_id}",
-            json=payload
+            json=payload,
+            headers=self.headers
         )
         response.raise_for_status()
         return response.json()
-    
-    async def close(self):
-        """Close the HTTP client."""
-        await self.client.aclose()
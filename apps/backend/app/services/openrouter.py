@@ -1,22 +1,40 @@
 """
 OpenRouter API client for Grok-4 integration.
-Handles chat completions with streaming support and retry logic.
+Handles chat completions with streaming support and upstream resilience.
 """
-import asyncio
+import time
 import httpx
-from typing import AsyncGenerator, Dict, Any, Optional
+from typing import AsyncGenerator, Dict, Any, List, Optional, Tuple
 from app.core.config import settings
-from app.core.security import sanitize_prompt
+from app.core.http import SharedClient
+from app.core.model_router import is_model_failure, model_router
+from app.core.scheduler import Priority, llm_scheduler
+from app.core.singleflight import SingleFlight
+from app.core.sse import JSONDecodeError, iter_sse_data, json_loads
+from app.services.completion_cache import (
+    completion_cache,
+    completion_from_text,
+    request_fingerprint,
+)
+from app.services.sanitization_memo import sanitization_memo
 
 
 class OpenRouterClient:
     """Client for OpenRouter API with Grok-4 model."""
     
+    client = SharedClient(timeout=60.0)
+    
     def __init__(self):
         self.base_url = settings.OPENROUTER_BASE_URL
         self.api_key = settings.OPENROUTER_API_KEY
         self.model = settings.OPENROUTER_MODEL
-        self.client = httpx.AsyncClient(timeout=60.0)
+        self.inflight = SingleFlight()
+        self.scheduler = llm_scheduler
+        self.router = model_router
+    
+    def candidates(self, priority: Priority = Priority.INTERACTIVE) -> List[str]:
+        """Models a call of this class may be served by, in routing order."""
+        return self.router.candidates(priority.value)
     
     async def chat_completion(
         self,
@@ -24,6 +42,12 @@ class OpenRouterClient:
         stream: bool = False,
         temperature: float = 0.7,
         max_tokens: int = 4096,
+        cache: bool = False,
+        cache_ttl: Optional[int] = None,
+        cache_refresh: bool = False,
+        conversation_id: Optional[str] = None,
+        user_id: Optional[str] = None,
+        priority: Priority = Priority.INTERACTIVE,
         **kwargs
     ) -> Dict[str, Any] | AsyncGenerator[str, None]:
         """
@@ -34,24 +58,36 @@ class OpenRouterClient:
             stream: Whether to stream the response
             temperature: Sampling temperature (0-2)
             max_tokens: Maximum tokens to generate
+            cache: Serve and store this completion via the completion cache
+            cache_ttl: Override the cache TTL (seconds) for this completion
+            cache_refresh: Skip the cache lookup but store the fresh result
+            conversation_id: Shares sanitized history across workers when set
+            user_id: Caller, for fair scheduling of upstream calls
+            priority: Scheduling class of the call, which also selects the
+                model route (pass `model` to pin a single model instead)
             **kwargs: Additional parameters
         
         Returns:
             Response dict or async generator for streaming
         """
-        # Sanitize all user messages
-        sanitized_messages = []
-        for msg in messages:
-            if msg["role"] == "user":
-                sanitized_messages.append({
-                    "role": msg["role"],
-                    "content": sanitize_prompt(msg["content"])
-                })
-            else:
-                sanitized_messages.append(msg)
+        # Sanitize all user messages (previously seen turns are memoized)
+        user_turns = [i for i, msg in enumerate(messages) if msg["role"] == "user"]
+        sanitized = await sanitization_memo.sanitize(
+            [messages[i]["content"] for i in user_turns],
+            conversation_id
+        )
+        
+        sanitized_messages = list(messages)
+        for i, content in zip(user_turns, sanitized):
+            sanitized_messages[i] = {"role": "user", "content": content}
+        
+        # The payload names the route; each attempt substitutes a model, so
+        # cache entries and coalescing do not depend on routing decisions
+        pinned = kwargs.pop("model", None)
+        models = [pinned] if pinned else self.candidates(priority)
         
         payload = {
-            "model": self.model,
+            "model": pinned or f"route:{priority.value}",
             "messages": sanitized_messages,
             "temperature": temperature,
             "max_tokens": max_tokens,
@@ -66,79 +102,203 @@ class OpenRouterClient:
             "X-Title": "Ai Bot ",
         }
         
+        cache_key = None
+        if cache and settings.COMPLETION_CACHE_ENABLED:
+            cache_key = completion_cache.make_key(payload)
+            
+            if not cache_refresh:
+                cached = await completion_cache.get(cache_key)
+                if cached is not None:
+                    if stream:
+                        return self._replay_stream(cached["choices"][0]["message"]["content"])
+                    return cached
+        
+        # Identical requests already in flight, from any user or tab, share
+        # one upstream call; only for calls whose answer may be shared anyway
+        # (cacheable or deterministic, as the completion cache already shares
+        # them across users), never for sampled chat
+        coalesce_key = (
+            request_fingerprint(payload)
+            if settings.LLM_SINGLE_FLIGHT_ENABLED and (cache or temperature == 0)
+            else None
+        )
+        
         if stream:
-            return self._stream_completion(payload, headers)
+            def open_stream() -> AsyncGenerator[str, None]:
+                served: Dict[str, str] = {}
+                tokens = self._stream_completion(
+                    payload, headers, models, user_id, priority, served
+                )
+                if cache_key:
+                    return self._cache_stream(tokens, cache_key, cache_ttl, served)
+                return tokens
+            
+            if coalesce_key:
+                return self.inflight.stream(coalesce_key, open_stream)
+            return open_stream()
         else:
-            return await self._complete(payload, headers)
+            async def fetch() -> Dict[str, Any]:
+                async with self.scheduler.slot(user_id, priority):
+                    response = await self._complete(payload, headers, models)
+                if cache_key:
+                    await completion_cache.set(cache_key, response, cache_ttl)
+                return response
+            
+            if coalesce_key:
+                return await self.inflight.call(coalesce_key, fetch)
+            return await fetch()
     
-    async def _complete(self, payload: Dict, headers: Dict) -> Dict[str, Any]:
-        """Non-streaming completion with retry logic."""
-        max_retries = 3
-        retry_delay = 1
+    async def _complete(
+        self,
+        payload: Dict,
+        headers: Dict,
+        models: List[str]
+    ) -> Dict[str, Any]:
+        """
+        Non-streaming completion with retries, circuit breaking and hedging,
+        falling back through `models` while the upstream errors persist.
+        """
+        error: Optional[Exception] = None
         
-        for attempt in range(max_retries):
-            try:
+        for model in models:
+            body = {**payload, "model": model}
+            
+            async def attempt(body: Dict = body) -> Dict[str, Any]:
                 response = await self.client.post(
                     f"{self.base_url}/chat/completions",
-                    json=payload,
+                    json=body,
                     headers=headers
                 )
                 response.raise_for_status()
                 return response.json()
             
-            except httpx.HTTPStatusError as e:
-                if e.response.status_code == 429:  # Rate limit
-                    if attempt < max_retries - 1:
-                        await asyncio.sleep(retry_delay * (2 ** attempt))
-                        continue
-                raise
+            started = time.monotonic()
+            try:
+                result = await self.router.resilience(model).call(
+                    attempt, hedge=settings.LLM_HEDGE_ENABLED
+                )
+            except Exception as e:
+                if not is_model_failure(e):
+                    raise
+                self.router.record_failure(model)
+                error = e
+                continue
+            
+            usage = result.get("usage") or {}
+            self.router.record_success(
+                model, time.monotonic() - started, usage.get("completion_tokens")
+            )
+            return result
+        
+        if error is None:
+            raise ValueError("No upstream models to send the request to")
+        raise error
+    
+    async def _connect(
+        self,
+        payload: Dict,
+        headers: Dict,
+        models: List[str]
+    ) -> Tuple[httpx.Response, str]:
+        """Open a completion stream on the first model that accepts it."""
+        error: Optional[Exception] = None
+        
+        for model in models:
+            async def connect(model: str = model) -> httpx.Response:
+                request = self.client.build_request(
+                    "POST",
+                    f"{self.base_url}/chat/completions",
+                    json={**payload, "model": model},
+                    headers=headers
+                )
+                response = await self.client.send(request, stream=True)
+                if response.is_error:
+                    await response.aclose()
+                    response.raise_for_status()
+                return response
             
-            except httpx.RequestError as e:
-                if attempt < max_retries - 1:
-                    await asyncio.sleep(retry_delay)
-                    continue
-                raise
+            try:
+                return await self.router.resilience(model).call(connect), model
+            except Exception as e:
+                if not is_model_failure(e):
+                    raise
+                self.router.record_failure(model)
+                error = e
         
-        raise Exception("Max retries exceeded")
+        if error is None:
+            raise ValueError("No upstream models to send the request to")
+        raise error
     
     async def _stream_completion(
         self,
         payload: Dict,
-        headers: Dict
+        headers: Dict,
+        models: List[str],
+        user_id: Optional[str] = None,
+        priority: Priority = Priority.INTERACTIVE,
+        served: Optional[Dict[str, str]] = None
     ) -> AsyncGenerator[str, None]:
-        """Stream completion tokens as they arrive."""
-        async with self.client.stream(
-            "POST",
-            f"{self.base_url}/chat/completions",
-            json=payload,
-            headers=headers
-        ) as response:
-            response.raise_for_status()
-            
-            async for line in response.aiter_lines():
-                if line.startswith("data: "):
-                    data = line[6:]  # Remove "data: " prefix
-                    
-                    if data == "[DONE]":
+        """
+        Stream completion tokens as they arrive (holding a scheduler slot).
+        
+        Opening the stream is retried and falls back to other models; once
+        tokens have been delivered a failure is passed on, since a retry
+        would repeat them. The model that accepted the stream is stored in
+        `served["model"]`.
+        """
+        async with self.scheduler.slot(user_id, priority):
+            started = time.monotonic()
+            response, model = await self._connect(payload, headers, models)
+            if served is not None:
+                served["model"] = model
+            tokens = 0
+            try:
+                async for data in iter_sse_data(response.aiter_bytes()):
+                    if data == b"[DONE]":
                         break
                     
                     try:
-                        import json
-                        chunk = json.loads(data)
-                        
-                        if "choices" in chunk and len(chunk["choices"]) > 0:
-                            delta = chunk["choices"][0].get("delta", {})
-                            content = delta.get("content", "")
-                            
-                            if content:
-                                yield content
-                    
-                    except json.JSONDecodeError:
+                        chunk = json_loads(data)
+                    except JSONDecodeError:
                         continue
+                    
+                    choices = chunk.get("choices")
+                    if choices:
+                        content = choices[0].get("delta", {}).get("content")
+                        if content:
+                            tokens += 1
+                            yield content
+            finally:
+                await response.aclose()
+            
+            # Deltas approximate completion tokens closely enough for ranking
+            self.router.record_success(model, time.monotonic() - started, tokens)
+    
+    async def _replay_stream(self, content: str) -> AsyncGenerator[str, None]:
+        """Replay cached completion text as a token stream."""
+        size = settings.COMPLETION_CACHE_REPLAY_CHUNK_CHARS
+        for start in range(0, len(content), size):
+            yield content[start:start + size]
     
-    async def close(self):
-        """Close the HTTP client."""
-        await self.client.aclose()
+    async def _cache_stream(
+        self,
+        tokens: AsyncGenerator[str, None],
+        cache_key: str,
+        cache_ttl: Optional[int],
+        served: Dict[str, str]
+    ) -> AsyncGenerator[str, None]:
+        """Pass a token stream through, caching the text once it completes."""
+        parts = []
+        async for token in tokens:
+            parts.append(token)
+            yield token
+        
+        # Only reached when the stream ran to completion
+        await completion_cache.set(
+            cache_key,
+            completion_from_text("".join(parts), served.get("model", self.model)),
+            cache_ttl
+        )
 
 
 # Global client instance
@@ -0,0 +1,143 @@
+"""
+Memo of sanitized user messages.
+Multi-turn conversations only scan messages that have not been seen before.
+"""
+import hashlib
+import logging
+from typing import Dict, List, Optional
+
+from redis.exceptions import RedisError
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.core.metrics import PROMPT_SANITIZE_BYTES
+from app.core.redaction import Redactor
+from app.core.redis import redis_client
+from app.core.security import prompt_redactor
+
+logger = logging.getLogger(__name__)
+
+# Stored in place of the sanitized text when the redactor changed nothing
+UNCHANGED = ""
+
+
+class SanitizationMemo:
+    """
+    Content-hash keyed memo in front of a Redactor.
+
+    Every turn of a conversation resends the whole history, so each message
+    is keyed by the SHA-256 of its text (plus the redactor fingerprint) and
+    only scanned the first time it is seen. The local tier is an LRU bounded
+    by entry count and bytes; when a conversation ID is given, results are
+    also kept in a Redis hash per conversation so other workers can skip the
+    scan. Messages the redactor leaves alone are stored as an empty marker.
+    """
+
+    def __init__(
+        self,
+        redactor: Redactor,
+        redis,
+        max_entries: int,
+        max_bytes: int,
+        redis_ttl: int,
+        key_prefix: str = "sanitized",
+    ):
+        self.redactor = redactor
+        self.redis = redis
+        self.redis_ttl = redis_ttl
+        self.key_prefix = key_prefix
+        self._local: LRUCache[str] = LRUCache(max_entries, max_bytes=max_bytes)
+
+    def _digest(self, encoded: bytes) -> str:
+        return f"{self.redactor.fingerprint}:{hashlib.sha256(encoded).hexdigest()}"
+
+    def _redis_key(self, conversation_id: str) -> str:
+        return f"{self.key_prefix}:{conversation_id}"
+
+    async def sanitize(
+        self,
+        texts: List[str],
+        conversation_id: Optional[str] = None,
+    ) -> List[str]:
+        """
+        Sanitize a batch of messages, scanning only unseen ones.
+
+        Args:
+            texts: Message contents, in conversation order
+            conversation_id: Scopes the shared Redis tier; local only if None
+
+        Returns:
+            Sanitized texts, in the same order
+        """
+        results: List[Optional[str]] = [None] * len(texts)
+        sizes = [0] * len(texts)
+        digests: List[str] = []
+        missing: List[int] = []
+        skipped = 0
+
+        for i, text in enumerate(texts):
+            encoded = text.encode()
+            sizes[i] = len(encoded)
+            digests.append(self._digest(encoded))
+
+            memo = self._local.get(digests[i])
+            if memo is None:
+                missing.append(i)
+            else:
+                results[i] = text if memo == UNCHANGED else memo
+                skipped += sizes[i]
+
+        use_redis = bool(conversation_id and self.redis_ttl > 0)
+
+        if missing and use_redis:
+            try:
+                shared = await self.redis.hmget(
+                    self._redis_key(conversation_id), [digests[i] for i in missing]
+                )
+            except RedisError as e:
+                logger.warning(f"Sanitization memo unavailable: {e}")
+                shared = [None] * len(missing)
+
+            still_missing = []
+            for i, memo in zip(missing, shared):
+                if memo is None:
+                    still_missing.append(i)
+                    continue
+                self._local.set(digests[i], memo)
+                results[i] = texts[i] if memo == UNCHANGED else memo
+                skipped += sizes[i]
+            missing = still_missing
+
+        scanned = 0
+        to_share: Dict[str, str] = {}
+        for i in missing:
+            result = self.redactor.redact(texts[i])
+            memo = result.text if result.redacted else UNCHANGED
+            self._local.set(digests[i], memo)
+            to_share[digests[i]] = memo
+            results[i] = result.text
+            scanned += sizes[i]
+
+        if to_share and use_redis:
+            key = self._redis_key(conversation_id)
+            try:
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    pipe.hset(key, mapping=to_share)
+                    pipe.expire(key, self.redis_ttl)
+                    await pipe.execute()
+            except RedisError as e:
+                logger.warning(f"Sanitization memo unavailable: {e}")
+
+        PROMPT_SANITIZE_BYTES.labels(result="scanned").inc(scanned)
+        PROMPT_SANITIZE_BYTES.labels(result="skipped").inc(skipped)
+        return results
+
+
+# Global sanitization memo instance
+sanitization_memo = SanitizationMemo(
+    prompt_redactor,
+    redis_client,
+    max_entries=settings.SANITIZE_MEMO_MAX_ENTRIES,
+    max_bytes=settings.SANITIZE_MEMO_MAX_BYTES,
+    redis_ttl=settings.SANITIZE_MEMO_REDIS_TTL_SECONDS,
+)
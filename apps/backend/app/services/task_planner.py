@@ -2,9 +2,30 @@
 Task Planner service that breaks down user requests into actionable tasks.
 Uses Grok-4 to analyze requirements and create structured generation plans.
 """
-from typing import List, Dict, Any
+import asyncio
+import logging
+from typing import Any, AsyncGenerator, AsyncIterator, Dict, List, Optional, Tuple, cast
+from app.core.json_stream import JSONStreamParser
+from app.core.scheduler import Priority
 from app.services.openrouter import openrouter_client
 
+logger = logging.getLogger(__name__)
+
+# Plan objects emitted as soon as they close in the streamed completion
+PLAN_STREAM_PATHS = [("project",), ("tasks", "*")]
+
+# Strong references to completions still being read after their plan closed
+_draining: set = set()
+
+
+async def _drain(tokens: AsyncGenerator[str, None]) -> None:
+    """Read a completion to its end, so the completion cache stores it."""
+    try:
+        async for _ in tokens:
+            pass
+    except Exception as e:
+        logger.warning(f"Draining planning completion failed: {e}")
+
 
 TASK_PLANNER_SYSTEM_PROMPT = """You are an expert software architect and task planner.
 Your job is to analyze user requirements and break them down into specific, actionable tasks.
@@ -46,47 +67,121 @@ Keep tasks focused and atomic - each should produce 1-3 files.
 class TaskPlanner:
     """Service for breaking down project requirements into tasks."""
     
-    async def create_plan(self, user_prompt: str, context: Dict[str, Any] = None) -> Dict[str, Any]:
+    async def stream_plan(
+        self,
+        user_prompt: str,
+        context: Optional[Dict[str, Any]] = None,
+        user_id: Optional[str] = None
+    ) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
         """
-        Create a task plan from user requirements.
+        Stream a task plan, yielding each part as soon as it is complete.
+        
+        The completion is streamed through an incremental JSON parser, so
+        ("project", project) and each ("task", task) are yielded, validated,
+        the moment their closing brace arrives. A task the parser cannot
+        repair, or one without a title, is dropped instead of failing the
+        plan. Ends with ("plan", plan) as soon as the plan object closes;
+        any trailing text is read in the background so the completion is
+        still cached.
         
         Args:
             user_prompt: User's project description
             context: Optional context (existing project, preferences)
+            user_id: Requesting user, for fair scheduling of the upstream call
         
-        Returns:
-            Structured task plan with project metadata and tasks
+        Raises:
+            ValueError: If no usable project or tasks could be parsed
         """
-        # Build context-aware prompt
-        full_prompt = self._build_prompt(user_prompt, context)
-        
-        # Call Grok-4 for planning
         messages = [
             {"role": "system", "content": TASK_PLANNER_SYSTEM_PROMPT},
-            {"role": "user", "content": full_prompt}
+            {"role": "user", "content": self._build_prompt(user_prompt, context)}
         ]
         
-        response = await openrouter_client.chat_completion(
+        completion = await openrouter_client.chat_completion(
             messages=messages,
+            stream=True,
             temperature=0.3,  # Lower temperature for more consistent planning
-            max_tokens=2048
+            max_tokens=2048,
+            cache=True,  # Identical planning prompts replay the cached plan
+            user_id=user_id,
+            priority=Priority.PLANNING
         )
+        tokens = cast(AsyncGenerator[str, None], completion)
         
-        # Parse response
-        content = response["choices"][0]["message"]["content"]
+        parser = JSONStreamParser(PLAN_STREAM_PATHS)
+        project: Optional[Dict[str, Any]] = None
+        tasks: List[Dict[str, Any]] = []
+        
+        def accept(path, value) -> Optional[Tuple[str, Dict[str, Any]]]:
+            nonlocal project
+            if not isinstance(value, dict):
+                return None
+            if path == ("project",):
+                if project is None:
+                    project = self._validate_project(value)
+                    return "project", project
+                return None
+            
+            task = self._normalize_task(value, len(tasks))
+            if "title" not in task:
+                logger.warning(f"Dropping planned task {task['id']} without a title")
+                return None
+            if any(t["id"] == task["id"] for t in tasks):
+                logger.warning(f"Dropping duplicate planned task {task['id']}")
+                return None
+            tasks.append(task)
+            return "task", task
         
         try:
-            import json
-            plan = json.loads(content)
-            return self._validate_plan(plan)
-        except json.JSONDecodeError as e:
-            # Fallback: extract JSON from markdown code blocks
-            import re
-            json_match = re.search(r'```json\n(.*?)\n```', content, re.DOTALL)
-            if json_match:
-                plan = json.loads(json_match.group(1))
-                return self._validate_plan(plan)
-            raise ValueError(f"Failed to parse task plan: {e}")
+            async for chunk in tokens:
+                for path, value in parser.feed(chunk):
+                    part = accept(path, value)
+                    if part:
+                        yield part
+                if parser.done:
+                    break
+            for path, value in parser.close():
+                part = accept(path, value)
+                if part:
+                    yield part
+        finally:
+            if parser.done:
+                # Closing early would stop the completion from being cached
+                drain = asyncio.create_task(_drain(tokens))
+                _draining.add(drain)
+                drain.add_done_callback(_draining.discard)
+            else:
+                await tokens.aclose()
+        
+        document = parser.document if isinstance(parser.document, dict) else {}
+        if project is None:
+            raise ValueError("Failed to parse task plan: no project found")
+        if not tasks and "tasks" not in document:
+            raise ValueError("Plan missing 'tasks' field")
+        
+        yield "plan", {**document, "project": project, "tasks": tasks}
+    
+    async def create_plan(
+        self,
+        user_prompt: str,
+        context: Optional[Dict[str, Any]] = None,
+        user_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Create a task plan from user requirements.
+        
+        Args:
+            user_prompt: User's project description
+            context: Optional context (existing project, preferences)
+            user_id: Requesting user, for fair scheduling of the upstream call
+        
+        Returns:
+            Structured task plan with project metadata and tasks
+        """
+        async for kind, value in self.stream_plan(user_prompt, context, user_id):
+            if kind == "plan":
+                return value
+        raise ValueError("Failed to parse task plan")
     
     def _build_prompt(self, user_prompt: str, context: Optional[Dict] = None) -> str:
         """Build a detailed prompt with context."""
@@ -104,35 +199,25 @@ class TaskPlanner:
         
         return "\n".join(prompt_parts)
     
-    def _validate_plan(self, plan: Dict[str, Any]) -> Dict[str, Any]:
-        """Validate and normalize the task plan."""
-        # Ensure required fields exist
-        if "project" not in plan:
-            raise ValueError("Plan missing 'project' field")
-        if "tasks" not in plan:
-            raise ValueError("Plan missing 'tasks' field")
-        
-        # Validate project metadata
-        project = plan["project"]
+    def _validate_project(self, project: Dict[str, Any]) -> Dict[str, Any]:
+        """Check the project metadata has every required field."""
         required_project_fields = ["name", "description", "framework", "language"]
         for field in required_project_fields:
             if field not in project:
                 raise ValueError(f"Project missing required field: {field}")
-        
-        # Validate tasks
-        for i, task in enumerate(plan["tasks"]):
-            if "id" not in task:
-                task["id"] = f"task-{i+1}"
-            if "title" not in task:
-                raise ValueError(f"Task {task['id']} missing 'title'")
-            if "type" not in task:
-                task["type"] = "component"
-            if "files" not in task:
-                task["files"] = []
-            if "dependencies" not in task:
-                task["dependencies"] = []
-        
-        return plan
+        return project
+    
+    def _normalize_task(self, task: Dict[str, Any], index: int) -> Dict[str, Any]:
+        """Fill in a task's optional fields."""
+        if "id" not in task:
+            task["id"] = f"task-{index+1}"
+        if "type" not in task:
+            task["type"] = "component"
+        if "files" not in task:
+            task["files"] = []
+        if "dependencies" not in task:
+            task["dependencies"] = []
+        return task
 
 
 # Global task planner instance
@@ -0,0 +1,163 @@
+"""
+Read-through cache for authenticated users.
+Process-local TTL-LRU in front of a Redis hash in front of the users table.
+"""
+import asyncio
+import logging
+from typing import Dict, Optional
+
+from redis.exceptions import RedisError
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.metrics import USER_CACHE_REQUESTS
+from app.core.redis import redis_client
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+# Columns safe to replicate into caches (github_token stays in Postgres only)
+CACHED_FIELDS = ("id", "email", "name", "avatar", "github_id", "google_id")
+
+# Strong references to in-flight Redis evictions scheduled from commit hooks
+_pending_invalidations: set = set()
+
+
+class UserCache:
+    """
+    Three-tier user lookup.
+
+    The local tier absorbs repeated requests within a worker; the Redis tier
+    is shared between workers so a cold worker rarely reaches Postgres. A
+    database session is only opened on a miss in both tiers. Other workers
+    may serve a stale local copy for up to `local_ttl` seconds after an
+    invalidation, so keep that TTL short.
+    """
+
+    def __init__(
+        self,
+        redis,
+        session_factory,
+        local_ttl: float,
+        redis_ttl: int,
+        max_entries: int,
+        key_prefix: str = "user",
+    ):
+        self.redis = redis
+        self.session_factory = session_factory
+        self.redis_ttl = redis_ttl
+        self.key_prefix = key_prefix
+        self._local: LRUCache[Dict[str, str]] = LRUCache(max_entries, ttl=local_ttl)
+
+    def _key(self, user_id: str) -> str:
+        return f"{self.key_prefix}:{user_id}"
+
+    async def get(self, user_id: str) -> Optional[User]:
+        """
+        Get a user by ID, loading it from Redis or the database on a miss.
+
+        Returns:
+            A detached User instance, or None if the user does not exist
+        """
+        data = self._local.get(user_id)
+        if data is not None:
+            USER_CACHE_REQUESTS.labels(tier="local").inc()
+            return User(**data)
+
+        try:
+            data = await self.redis.hgetall(self._key(user_id))
+        except RedisError as e:
+            logger.warning(f"User cache unavailable: {e}")
+            data = None
+
+        if data:
+            USER_CACHE_REQUESTS.labels(tier="redis").inc()
+            self._local.set(user_id, data)
+            return User(**data)
+
+        USER_CACHE_REQUESTS.labels(tier="database").inc()
+        async with self.session_factory() as session:
+            user = await session.get(User, user_id)
+
+        if user is None:
+            return None
+
+        # Redis hashes cannot hold None, so absent fields mean NULL
+        data = {
+            field: getattr(user, field)
+            for field in CACHED_FIELDS
+            if getattr(user, field) is not None
+        }
+        self._local.set(user_id, data)
+
+        try:
+            async with self.redis.pipeline(transaction=True) as pipe:
+                pipe.hset(self._key(user_id), mapping=data)
+                pipe.expire(self._key(user_id), self.redis_ttl)
+                await pipe.execute()
+        except RedisError as e:
+            logger.warning(f"User cache unavailable: {e}")
+
+        return User(**data)
+
+    def invalidate_local(self, user_id: str) -> None:
+        """Drop a user from this worker's local tier."""
+        self._local.pop(user_id)
+
+    async def invalidate(self, user_id: str) -> None:
+        """Drop a user from both cache tiers."""
+        self.invalidate_local(user_id)
+        try:
+            await self.redis.delete(self._key(user_id))
+        except RedisError as e:
+            logger.warning(f"User cache invalidation failed for {user_id}: {e}")
+
+
+# Global user cache instance
+user_cache = UserCache(
+    redis_client,
+    AsyncSessionLocal,
+    local_ttl=settings.USER_CACHE_LOCAL_TTL_SECONDS,
+    redis_ttl=settings.USER_CACHE_REDIS_TTL_SECONDS,
+    max_entries=settings.USER_CACHE_MAX_ENTRIES,
+)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _track_changed_user(mapper, connection, target: User) -> None:
+    """Remember changed users on the session until the transaction commits."""
+    session = Session.object_session(target)
+    if session is not None:
+        session.info.setdefault("changed_user_ids", set()).add(target.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_users(session: Session) -> None:
+    """Evict users whose rows changed once the change is visible to readers."""
+    user_ids = session.info.pop("changed_user_ids", None)
+    if not user_ids:
+        return
+
+    # Async sessions commit on the event loop thread, so the Redis eviction
+    # can be scheduled without blocking the commit. Without a running loop
+    # (sync scripts) the Redis copy simply expires by TTL.
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+
+    for user_id in user_ids:
+        user_cache.invalidate_local(user_id)
+        if loop is not None:
+            task = loop.create_task(user_cache.invalidate(user_id))
+            _pending_invalidations.add(task)
+            task.add_done_callback(_pending_invalidations.discard)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_changed_users(session: Session) -> None:
+    session.info.pop("changed_user_ids", None)
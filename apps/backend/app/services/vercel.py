@@ -2,25 +2,24 @@
 Vercel deployment service.
 Handles project creation and deployment via Vercel API.
 """
-import httpx
 from typing import Dict, Any, Optional
 from app.core.config import settings
+from app.core.http import SharedClient
 
 
 class VercelService:
     """Service for Vercel API operations."""
     
+    client = SharedClient(timeout=60.0)
+    
     def __init__(self, token: Optional[str] = None):
         self.token = token or settings.VERCEL_TOKEN
         self.team_id = settings.VERCEL_TEAM_ID
         self.base_url = "https://api.vercel.com"
-        self.client = httpx.AsyncClient(
-            headers={
-                "Authorization": f"Bearer {self.token}",
-                "Content-Type": "application/json",
-            },
-            timeout=60.0
-        )
+        self.headers = {
+            "Authorization": f"Bearer {self.token}",
+            "Content-Type": "application/json",
+        }
     
     async def create_project(
         self,
@@ -51,7 +50,7 @@ class VercelService:
         if self.team_id:
             url += f"?teamId={self.team_id}"
         
-        response = await self.client.post(url, json=payload)
+        response = await self.client.post(url, json=payload, headers=self.headers)
         response.raise_for_status()
         return response.json()
     
@@ -61,7 +60,7 @@ class VercelService:
         if self.team_id:
             url += f"?teamId={self.team_id}"
         
-        response = await self.client.get(url)
+        response = await self.client.get(url, headers=self.headers)
         response.raise_for_status()
         return response.json()
     
@@ -108,7 +107,7 @@ class VercelService:
         if self.team_id:
             url += f"?teamId={self.team_id}"
         
-        response = await self.client.post(url, json=payload)
+        response = await self.client.post(url, json=payload, headers=self.headers)
         response.raise_for_status()
         return response.json()
     
@@ -118,7 +117,7 @@ class VercelService:
         if self.team_id:
             url += f"?teamId={self.team_id}"
         
-        response = await self.client.get(url)
+        response = await self.client.get(url, headers=self.headers)
         response.raise_for_status()
         return response.json()
     
@@ -133,7 +132,7 @@ class VercelService:
         if self.team_id:
             params["teamId"] = self.team_id
         
-        response = await self.client.get(url, params=params)
+        response = await self.client.get(url, params=params, headers=self.headers)
         response.raise_for_status()
         return response.json()
     
@@ -170,10 +169,6 @@ class VercelService:
         if self.team_id:
             url += f"?teamId={self.team_id}"
         
-        response = await self.client.post(url, json={"env": env_list})
+        response = await self.client.post(url, json={"env": env_list}, headers=self.headers)
         response.raise_for_status()
         return response.json()
-    
-    async def close(self):
-        """Close the HTTP client."""
-        await self.client.aclose()
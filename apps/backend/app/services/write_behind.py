@@ -0,0 +1,464 @@
+"""
+Write-behind buffer for chat persistence and usage counters.
+Keeps database writes off the response path without losing them on a crash.
+"""
+import asyncio
+import json
+import logging
+import uuid
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from redis.exceptions import RedisError
+from sqlalchemy import bindparam, delete, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.metrics import WRITE_BEHIND_DEAD_LETTERED, WRITE_BEHIND_SHED
+from app.core.redis import redis_client
+from app.models.chat import ChatMessage, Conversation
+from app.models.usage import UserUsage
+from app.models.write_behind import WriteReceipt
+
+logger = logging.getLogger(__name__)
+
+# Longest wait between flushes while they keep failing (seconds)
+MAX_FLUSH_BACKOFF = 30.0
+
+# How often expired receipts are deleted (seconds)
+RECEIPT_PRUNE_INTERVAL = 3600.0
+
+
+def upsert(dialect_name: str, table):
+    """INSERT ... ON CONFLICT for the session's dialect."""
+    if dialect_name == "sqlite":
+        return sqlite.insert(table)
+    return postgresql.insert(table)
+
+
+def is_transient(error: Exception) -> bool:
+    """Whether a failed write is worth retrying as is (database unreachable)."""
+    if isinstance(error, (OperationalError, InterfaceError, OSError, asyncio.TimeoutError)):
+        return True
+    return isinstance(error, DBAPIError) and error.connection_invalidated
+
+
+class WriteBehindBuffer:
+    """
+    Batches chat turns and usage increments into periodic bulk writes.
+
+    Each record is first appended to this worker's Redis list, then to the
+    in-memory batch; a background task flushes the batch every
+    `flush_interval` seconds, or as soon as `max_batch` records are waiting,
+    in one transaction (executemany inserts and ON CONFLICT upserts), and
+    then removes the flushed records from Redis. Workers refresh a
+    heartbeat key on their own timer; on startup, the lists of workers
+    whose heartbeat expired (they crashed) are claimed with an atomic
+    RENAME and replayed. Every record carries an ID that is stored as a
+    receipt in the same transaction as its write, so a record written
+    twice (a crash between commit and cleanup, or a stalled worker whose
+    list was claimed) is applied once. Receipts are kept for
+    `receipt_ttl` seconds.
+
+    A batch that fails for any reason other than the database being
+    unreachable is retried `max_attempts` times, then written record by
+    record; records that still fail go to the `{key_prefix}:dead` list
+    so they cannot block everything behind them. At most `max_buffered`
+    records are held: writers then wait up to `enqueue_timeout` seconds
+    for the flusher to make room, after which records are shed.
+    """
+
+    def __init__(
+        self,
+        redis,
+        session_factory,
+        flush_interval: float,
+        max_batch: int,
+        max_attempts: int = 5,
+        max_buffered: int = 50000,
+        enqueue_timeout: float = 2.0,
+        receipt_ttl: float = 86400.0,
+        key_prefix: str = "write_behind",
+    ):
+        self.redis = redis
+        self.session_factory = session_factory
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.max_attempts = max_attempts
+        self.max_buffered = max_buffered
+        self.enqueue_timeout = enqueue_timeout
+        self.receipt_ttl = receipt_ttl
+        self.key_prefix = key_prefix
+        self.worker_id = uuid.uuid4().hex
+        self.heartbeat_ttl = max(10, int(flush_interval * 10))
+        self._next_prune = 0.0
+        self._buffer: List[Dict[str, Any]] = []
+        self._wakeup = asyncio.Event()
+        self._space = asyncio.Event()
+        self._attempts = 0  # Failed attempts at the batch at the head of the buffer
+        self._failures = 0  # Consecutive failed flushes, for backoff
+        self._task: Optional[asyncio.Task] = None
+        self._beat_task: Optional[asyncio.Task] = None
+
+    def _pending_key(self, worker_id: str) -> str:
+        return f"{self.key_prefix}:{worker_id}:pending"
+
+    def _alive_key(self, worker_id: str) -> str:
+        return f"{self.key_prefix}:{worker_id}:alive"
+
+    @property
+    def dead_letter_key(self) -> str:
+        return f"{self.key_prefix}:dead"
+
+    async def _reserve(self) -> bool:
+        """Wait for room in the buffer; False if none was made in time."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.enqueue_timeout
+        while len(self._buffer) >= self.max_buffered:
+            self._space.clear()
+            self._wakeup.set()
+            try:
+                await asyncio.wait_for(self._space.wait(), timeout=deadline - loop.time())
+            except asyncio.TimeoutError:
+                return False
+        return True
+
+    async def _enqueue(self, record: Dict[str, Any]) -> None:
+        if not await self._reserve():
+            WRITE_BEHIND_SHED.labels(kind=record["kind"]).inc()
+            logger.error(f"Write-behind buffer full, dropping {record['kind']} record")
+            return
+
+        record["id"] = uuid.uuid4().hex
+        try:
+            await self.redis.rpush(self._pending_key(self.worker_id), json.dumps(record))
+        except RedisError as e:
+            # Still written by the next flush, just not crash-safe
+            logger.warning(f"Write-behind log unavailable: {e}")
+            record["volatile"] = True
+
+        self._buffer.append(record)
+        if len(self._buffer) >= self.max_batch and not self._failures:
+            self._wakeup.set()
+
+    async def save_turns(
+        self,
+        user_id: str,
+        conversation_id: str,
+        project_id: Optional[str],
+        turns: List[Dict[str, str]],
+    ) -> None:
+        """Queue turns for insertion (ownership is checked by conversation_owners.claim)."""
+        await self._enqueue({
+            "kind": "turns",
+            "user_id": user_id,
+            "conversation_id": conversation_id,
+            "project_id": project_id,
+            "turns": turns,
+            "at": datetime.now(timezone.utc).isoformat(),
+        })
+
+    async def record_usage(
+        self,
+        user_id: str,
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0,
+    ) -> None:
+        """Queue one request's usage for the user's daily totals."""
+        await self._enqueue({
+            "kind": "usage",
+            "user_id": user_id,
+            "day": datetime.now(timezone.utc).date().isoformat(),
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+        })
+
+    async def _write(self, records: List[Dict[str, Any]]) -> None:
+        async with self.session_factory() as db:
+            dialect = db.bind.dialect.name
+
+            # Only records without a receipt yet are applied
+            receipts = WriteReceipt.__table__
+            fresh = set((await db.execute(
+                upsert(dialect, receipts)
+                .values([{"id": r["id"]} for r in records])
+                .on_conflict_do_nothing()
+                .returning(receipts.c.id)
+            )).scalars())
+            records = [r for r in records if r["id"] in fresh]
+
+            turns = [r for r in records if r["kind"] == "turns"]
+            usage: Dict[tuple, List[int]] = defaultdict(lambda: [0, 0, 0])
+            for r in records:
+                if r["kind"] == "usage":
+                    totals = usage[(r["user_id"], r["day"])]
+                    totals[0] += 1
+                    totals[1] += r["prompt_tokens"]
+                    totals[2] += r["completion_tokens"]
+
+            if turns:
+                conversations = {}
+                for r in turns:
+                    conversations.setdefault(r["conversation_id"], r)
+                await db.execute(
+                    upsert(dialect, Conversation.__table__).on_conflict_do_nothing(),
+                    [
+                        {"id": cid, "user_id": r["user_id"], "project_id": r["project_id"]}
+                        for cid, r in conversations.items()
+                    ],
+                )
+                owners = dict((await db.execute(
+                    select(Conversation.id, Conversation.user_id)
+                    .where(Conversation.id.in_(conversations))
+                )).all())
+
+                rows, touched = [], {}
+                for r in turns:
+                    if owners.get(r["conversation_id"]) != r["user_id"]:
+                        logger.warning(
+                            f"Dropping turns for conversation {r['conversation_id']} "
+                            f"not owned by {r['user_id']}"
+                        )
+                        continue
+                    at = datetime.fromisoformat(r["at"])
+                    touched[r["conversation_id"]] = at
+                    rows.extend(
+                        {
+                            "conversation_id": r["conversation_id"],
+                            "user_id": r["user_id"],
+                            "project_id": r["project_id"],
+                            "role": turn["role"],
+                            "content": turn["content"],
+                            "created_at": at,
+                        }
+                        for turn in r["turns"]
+                    )
+
+                if rows:
+                    await db.execute(ChatMessage.__table__.insert(), rows)
+                    await db.execute(
+                        update(Conversation.__table__)
+                        .where(Conversation.__table__.c.id == bindparam("cid"))
+                        .values(updated_at=bindparam("at")),
+                        [{"cid": cid, "at": at} for cid, at in touched.items()],
+                    )
+
+            if usage:
+                statement = upsert(dialect, UserUsage.__table__)
+                statement = statement.on_conflict_do_update(
+                    index_elements=["user_id", "day"],
+                    set_={
+                        "requests": UserUsage.__table__.c.requests + statement.excluded.requests,
+                        "prompt_tokens": UserUsage.__table__.c.prompt_tokens + statement.excluded.prompt_tokens,
+                        "completion_tokens": UserUsage.__table__.c.completion_tokens + statement.excluded.completion_tokens,
+                    },
+                )
+                await db.execute(statement, [
+                    {
+                        "user_id": user_id,
+                        "day": date.fromisoformat(day),
+                        "requests": requests,
+                        "prompt_tokens": prompt_tokens,
+                        "completion_tokens": completion_tokens,
+                    }
+                    for (user_id, day), (requests, prompt_tokens, completion_tokens) in usage.items()
+                ])
+
+            await db.commit()
+
+    async def _complete(self, records: List[Dict[str, Any]]) -> None:
+        """Drop written (or dead-lettered) records from the buffer and the Redis log."""
+        ids = {r["id"] for r in records}
+        self._buffer = [r for r in self._buffer if r["id"] not in ids]
+        if len(self._buffer) < self.max_buffered:
+            self._space.set()
+
+        durable = [
+            json.dumps({k: v for k, v in r.items() if k != "volatile"})
+            for r in records
+            if not r.get("volatile")
+        ]
+        if durable:
+            try:
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    for value in durable:
+                        pipe.lrem(self._pending_key(self.worker_id), 1, value)
+                    await pipe.execute()
+            except RedisError as e:
+                logger.warning(f"Write-behind log cleanup failed: {e}")
+
+    async def _isolate(self, batch: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Write a repeatedly failing batch one record at a time, dead-lettering
+        the records that fail.
+
+        Returns:
+            The records dealt with; stops early if the database goes away
+        """
+        handled = []
+        for record in batch:
+            try:
+                await self._write([record])
+            except Exception as e:
+                if is_transient(e):
+                    break
+                logger.error(f"Dead-lettering write-behind record {record['id']}: {e}")
+                try:
+                    await self.redis.rpush(
+                        self.dead_letter_key, json.dumps({**record, "error": str(e)})
+                    )
+                except RedisError as redis_error:
+                    logger.error(f"Dead-letter list unavailable, record lost: {redis_error}")
+                WRITE_BEHIND_DEAD_LETTERED.inc()
+            handled.append(record)
+        return handled
+
+    async def flush(self) -> int:
+        """
+        Write out everything buffered, in batches of `max_batch`.
+
+        Returns:
+            Number of records written or dead-lettered; a failed batch stays
+            buffered until it has used up its attempts
+        """
+        written = 0
+        while self._buffer:
+            batch = self._buffer[:self.max_batch]
+            try:
+                await self._write(batch)
+            except Exception as e:
+                self._failures += 1
+                if is_transient(e):
+                    logger.error(f"Write-behind flush failed, will retry: {e}")
+                    break
+                self._attempts += 1
+                if self._attempts < self.max_attempts:
+                    logger.error(
+                        f"Write-behind batch failed (attempt {self._attempts}/"
+                        f"{self.max_attempts}), will retry: {e}"
+                    )
+                    break
+                batch = await self._isolate(batch)
+                if not batch:
+                    break
+
+            self._attempts = 0
+            self._failures = 0
+            await self._complete(batch)
+            written += len(batch)
+        return written
+
+    async def recover(self) -> int:
+        """
+        Claim and replay the logs of workers that died with pending writes.
+
+        Returns:
+            Number of records recovered
+        """
+        recovered = 0
+        async for key in self.redis.scan_iter(match=f"{self.key_prefix}:*:pending"):
+            worker_id = key.split(":")[-2]
+            if worker_id == self.worker_id or await self.redis.exists(self._alive_key(worker_id)):
+                continue
+
+            claimed = f"{self.key_prefix}:claimed:{self.worker_id}:{worker_id}"
+            try:
+                await self.redis.rename(key, claimed)
+            except RedisError:
+                continue  # Another worker got there first
+
+            values = await self.redis.lrange(claimed, 0, -1)
+            async with self.redis.pipeline(transaction=True) as pipe:
+                if values:
+                    pipe.rpush(self._pending_key(self.worker_id), *values)
+                pipe.delete(claimed)
+                await pipe.execute()
+
+            self._buffer.extend(json.loads(value) for value in values)
+            recovered += len(values)
+
+        if recovered:
+            logger.info(f"Recovered {recovered} pending writes")
+        return recovered
+
+    async def _heartbeat(self) -> None:
+        try:
+            await self.redis.set(self._alive_key(self.worker_id), "1", ex=self.heartbeat_ttl)
+        except RedisError as e:
+            logger.warning(f"Write-behind heartbeat failed: {e}")
+
+    async def _beat(self) -> None:
+        # Independent of flushing, so a slow flush does not look like a crash
+        while True:
+            await asyncio.sleep(self.heartbeat_ttl / 3)
+            await self._heartbeat()
+
+    async def prune_receipts(self) -> None:
+        """Delete receipts older than `receipt_ttl`."""
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.receipt_ttl)
+        async with self.session_factory() as db:
+            await db.execute(delete(WriteReceipt).where(WriteReceipt.applied_at < cutoff))
+            await db.commit()
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            # Back off while flushes are failing
+            delay = min(self.flush_interval * 2 ** self._failures, MAX_FLUSH_BACKOFF)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+            if loop.time() >= self._next_prune:
+                self._next_prune = loop.time() + RECEIPT_PRUNE_INTERVAL
+                try:
+                    await self.prune_receipts()
+                except Exception as e:
+                    logger.warning(f"Write-behind receipt pruning failed: {e}")
+
+    async def start(self) -> None:
+        """Recover orphaned writes and start flushing (application lifespan)."""
+        await self._heartbeat()
+        self._beat_task = asyncio.create_task(self._beat())
+        try:
+            await self.recover()
+        except RedisError as e:
+            logger.warning(f"Write-behind recovery skipped: {e}")
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the flusher and drain the buffer (application lifespan)."""
+        for task in (self._task, self._beat_task):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._task = self._beat_task = None
+
+        await self.flush()
+        if not self._buffer:
+            try:
+                await self.redis.delete(self._alive_key(self.worker_id))
+            except RedisError:
+                pass
+
+
+# Global write-behind buffer instance
+write_behind = WriteBehindBuffer(
+    redis_client,
+    AsyncSessionLocal,
+    flush_interval=settings.WRITE_BEHIND_FLUSH_INTERVAL_MS / 1000,
+    max_batch=settings.WRITE_BEHIND_MAX_BATCH,
+    max_attempts=settings.WRITE_BEHIND_MAX_ATTEMPTS,
+    max_buffered=settings.WRITE_BEHIND_MAX_BUFFERED,
+    enqueue_timeout=settings.WRITE_BEHIND_ENQUEUE_TIMEOUT_MS / 1000,
+    receipt_ttl=settings.WRITE_BEHIND_RECEIPT_TTL_HOURS * 3600,
+)
@@ -0,0 +1,139 @@
+"""
+Benchmark: keyset vs. OFFSET pagination of chat history.
+
+Loads synthetic chat_messages rows (10M by default) -- a tenth of them
+belonging to one heavy user/project, the rest spread over other users --
+then times fetching a 50-message page at increasing depths, both with the
+keyset cursor used by the API and with OFFSET. Keyset pages should cost the
+same at any depth.
+
+    python -m benchmarks.bench_chat_history --rows 10000000
+    python -m benchmarks.bench_chat_history --database-url postgresql://... --rows 10000000
+
+Loading is skipped when the database already holds enough rows.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+
+from benchmarks.common import bootstrap_env
+
+bootstrap_env()
+
+from sqlalchemy import func, insert, select  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine  # noqa: E402
+
+from app.core.database import Base  # noqa: E402
+from app.models.chat import ChatMessage, Conversation  # noqa: E402
+from app.models.user import User  # noqa: E402
+from app.services.chat_history import encode_cursor, fetch_history  # noqa: E402
+
+HEAVY_USER = "bench-heavy"
+PAGE = 50
+BATCH = 20000
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+async def load(factory, rows: int, users: int) -> None:
+    async with factory() as db:
+        existing = await db.scalar(select(func.count()).select_from(ChatMessage))
+        if existing >= rows:
+            print(f"using existing {existing:,} rows")
+            return
+        if existing:
+            raise SystemExit(f"database already holds {existing:,} rows; use an empty one")
+
+        user_ids = [HEAVY_USER] + [f"bench-{i}" for i in range(users)]
+        await db.execute(insert(User), [
+            {"id": uid, "email": f"{uid}@example.com", "name": uid} for uid in user_ids
+        ])
+        await db.execute(insert(Conversation), [
+            {"id": f"conv-{uid}", "user_id": uid, "project_id": "p0"} for uid in user_ids
+        ])
+        await db.commit()
+
+    started = time.perf_counter()
+    for offset in range(0, rows, BATCH):
+        batch = []
+        for i in range(offset, min(rows, offset + BATCH)):
+            uid = HEAVY_USER if i % 10 == 0 else f"bench-{i % users}"
+            batch.append({
+                "conversation_id": f"conv-{uid}",
+                "user_id": uid,
+                "project_id": "p0",
+                "role": "user" if i % 2 else "assistant",
+                "content": f"synthetic message {i}",
+                "created_at": START + timedelta(seconds=i),
+            })
+        async with factory() as db:
+            await db.execute(insert(ChatMessage), batch)
+            await db.commit()
+        done = min(rows, offset + BATCH)
+        print(f"\rloaded {done:,}/{rows:,} rows", end="", flush=True)
+    print(f" in {time.perf_counter() - started:.0f}s")
+
+
+async def timed(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await fn()
+        samples.append((time.perf_counter() - start) * 1e3)
+    return statistics.median(samples)
+
+
+async def main(args) -> None:
+    url = args.database_url.replace("postgresql://", "postgresql+asyncpg://")
+    engine = create_async_engine(url)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    await load(factory, args.rows, args.users)
+
+    async with factory() as db:
+        heavy = await db.scalar(
+            select(func.count()).select_from(ChatMessage).where(ChatMessage.user_id == HEAVY_USER)
+        )
+        print(f"heavy user has {heavy:,} messages; page size {PAGE}")
+        print(f"{'depth':>10} {'keyset':>10} {'offset':>10}")
+
+        for depth in [0, 100, 1000, 10000]:
+            skip = depth * PAGE
+            if skip >= heavy:
+                break
+
+            # The cursor a client would hold after `depth` pages (not timed)
+            cursor = None
+            if skip:
+                row = (await db.execute(
+                    select(ChatMessage.created_at, ChatMessage.id)
+                    .where(ChatMessage.user_id == HEAVY_USER, ChatMessage.project_id == "p0")
+                    .order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc())
+                    .offset(skip - 1).limit(1)
+                )).one()
+                cursor = encode_cursor(row.created_at, row.id)
+
+            keyset = await timed(lambda: fetch_history(
+                db, HEAVY_USER, project_id="p0", limit=PAGE, cursor=cursor
+            ), args.repeat)
+            offset = await timed(lambda: db.execute(
+                select(ChatMessage)
+                .where(ChatMessage.user_id == HEAVY_USER, ChatMessage.project_id == "p0")
+                .order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc())
+                .offset(skip).limit(PAGE)
+            ), args.repeat)
+            print(f"{depth:>10} {keyset:8.2f}ms {offset:8.2f}ms")
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--database-url", default="sqlite+aiosqlite:////tmp/bench_chat_history.db")
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,180 @@
+"""
+Benchmark: BaseHTTPMiddleware vs. pure ASGI middleware for SSE and JSON.
+
+Builds the production middleware stack twice -- once with the previous
+BaseHTTPMiddleware implementations of logging and rate limiting, once with
+the current pure ASGI ones -- and drives each directly over ASGI, reporting
+time-to-first-byte of an SSE stream and requests/sec under concurrency.
+
+    python -m benchmarks.bench_middleware --requests 2000 --concurrency 50
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks.common import bootstrap_env, percentile
+
+bootstrap_env()
+
+import fakeredis  # noqa: E402
+from fastapi import FastAPI, HTTPException, Request, status  # noqa: E402
+from fastapi.middleware.cors import CORSMiddleware  # noqa: E402
+from fastapi.middleware.gzip import GZipMiddleware  # noqa: E402
+from fastapi.responses import StreamingResponse  # noqa: E402
+from starlette.middleware.base import BaseHTTPMiddleware  # noqa: E402
+
+from app.core.rate_limiter import LeasedRateLimiter, TokenBucketLimiter  # noqa: E402
+from app.core.security import create_access_token  # noqa: E402
+from app.middleware import rate_limit  # noqa: E402
+from app.middleware.auth import AuthMiddleware  # noqa: E402
+from app.middleware.logging import LoggingMiddleware  # noqa: E402
+from app.middleware.rate_limit import RateLimitMiddleware  # noqa: E402
+
+
+class LegacyLoggingMiddleware(BaseHTTPMiddleware):
+    """The previous BaseHTTPMiddleware-based logging middleware."""
+
+    async def dispatch(self, request: Request, call_next):
+        start_time = time.time()
+        response = await call_next(request)
+        response.headers["X-Process-Time"] = str(time.time() - start_time)
+        return response
+
+
+class LegacyRateLimitMiddleware(BaseHTTPMiddleware):
+    """The previous BaseHTTPMiddleware-based rate limit middleware."""
+
+    async def dispatch(self, request: Request, call_next):
+        claims = getattr(request.state, "token_claims", None)
+        if claims:
+            limiter = rate_limit.rate_limiter
+            result = await limiter.acquire(claims["sub"], limiter.cost_for(request.url.path))
+            if not result.allowed:
+                raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS)
+        return await call_next(request)
+
+
+def build_app(logging_cls, rate_limit_cls, tokens: int) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/api/chat/stream")
+    async def stream():
+        async def events():
+            for i in range(tokens):
+                yield f"data: {json.dumps({'type': 'token', 'content': f'tok{i} '})}\n\n"
+                await asyncio.sleep(0)
+            yield f"data: {json.dumps({'type': 'complete'})}\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.get("/api/projects")
+    async def projects():
+        return {"projects": []}
+
+    # Same order as app.main
+    app.add_middleware(CORSMiddleware, allow_origins=["*"])
+    app.add_middleware(GZipMiddleware, minimum_size=1000)
+    app.add_middleware(rate_limit_cls)
+    app.add_middleware(AuthMiddleware)
+    app.add_middleware(logging_cls)
+    return app
+
+
+async def call(app, method: str, path: str, token: str) -> tuple[float, float]:
+    """Run one request; return (time to first body byte, total time)."""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [
+            (b"host", b"bench"),
+            (b"authorization", f"Bearer {token}".encode()),
+        ],
+        "client": ("127.0.0.1", 50000),
+        "server": ("bench", 80),
+    }
+    request_sent = False
+    never = asyncio.Event()
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # Client stays connected; disconnect listeners are cancelled at the end
+        await never.wait()
+
+    first_byte = None
+
+    async def send(message):
+        nonlocal first_byte
+        if first_byte is None and message["type"] == "http.response.body" and message.get("body"):
+            first_byte = time.perf_counter()
+
+    start = time.perf_counter()
+    await app(scope, receive, send)
+    end = time.perf_counter()
+    return (first_byte or end) - start, end - start
+
+
+async def throughput(app, method: str, path: str, token: str, total: int, concurrency: int) -> float:
+    remaining = total
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            await call(app, method, path, token)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return total / (time.perf_counter() - start)
+
+
+async def main(args) -> None:
+    redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+    bucket = TokenBucketLimiter(redis, capacity=10 ** 9, window_ms=1000)
+    # Lease generously so the numbers reflect middleware plumbing, not Redis
+    rate_limit.rate_limiter = LeasedRateLimiter(
+        bucket, lease_size=10 ** 6, lease_ttl_ms=600000, max_users=10
+    )
+    token = create_access_token({"sub": "bench-user"})
+
+    stacks = {
+        "BaseHTTPMiddleware": build_app(LegacyLoggingMiddleware, LegacyRateLimitMiddleware, args.tokens),
+        "pure ASGI": build_app(LoggingMiddleware, RateLimitMiddleware, args.tokens),
+    }
+
+    for name, app in stacks.items():
+        for _ in range(50):
+            await call(app, "POST", "/api/chat/stream", token)
+
+        ttfb = []
+        for _ in range(args.samples):
+            first, _total = await call(app, "POST", "/api/chat/stream", token)
+            ttfb.append(first * 1e6)
+
+        sse_rps = await throughput(app, "POST", "/api/chat/stream", token, args.requests, args.concurrency)
+        json_rps = await throughput(app, "GET", "/api/projects", token, args.requests, args.concurrency)
+
+        print(
+            f"{name:<19} SSE ttfb p50={percentile(ttfb, 50):7.1f}us "
+            f"p99={percentile(ttfb, 99):7.1f}us | "
+            f"SSE {sse_rps:7.0f} req/s | JSON {json_rps:7.0f} req/s"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--samples", type=int, default=500)
+    parser.add_argument("--tokens", type=int, default=50, help="SSE events per stream")
+    asyncio.run(main(parser.parse_args()))
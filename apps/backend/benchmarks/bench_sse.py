@@ -0,0 +1,106 @@
+"""
+Benchmark: SSE relay pipeline, legacy vs. current.
+
+Replays a recorded OpenRouter stream (benchmarks/fixtures/openrouter_stream.sse)
+through a mocked httpx transport in network-sized chunks, parses it, and
+re-encodes every token as a client SSE event. The legacy pipeline is the
+previous aiter_lines/json.loads/json.dumps f-string code; the current one is
+OpenRouterClient._stream_completion with app.core.sse encoding. Reports
+tokens/sec and CPU time per stream.
+
+    python -m benchmarks.bench_sse --streams 200 --chunk-size 512
+"""
+import argparse
+import asyncio
+import json
+import time
+from pathlib import Path
+
+import httpx
+
+from benchmarks.common import bootstrap_env
+
+bootstrap_env()
+
+from app.core.sse import COMPLETE_EVENT, encode_token, orjson  # noqa: E402
+from app.services.openrouter import OpenRouterClient  # noqa: E402
+
+FIXTURE = Path(__file__).parent / "fixtures" / "openrouter_stream.sse"
+
+
+def make_client(body: bytes, chunk_size: int) -> httpx.AsyncClient:
+    async def chunks():
+        for start in range(0, len(body), chunk_size):
+            yield body[start:start + chunk_size]
+
+    async def handler(request):
+        return httpx.Response(200, content=chunks())
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+async def legacy_stream(client: httpx.AsyncClient):
+    """The previous _stream_completion and event_generator, back to back."""
+    async with client.stream("POST", "https://upstream/chat/completions", json={}) as response:
+        async for line in response.aiter_lines():
+            if line.startswith("data: "):
+                data = line[6:]
+                if data == "[DONE]":
+                    break
+                try:
+                    import json as json_module
+                    chunk = json_module.loads(data)
+                    if "choices" in chunk and len(chunk["choices"]) > 0:
+                        delta = chunk["choices"][0].get("delta", {})
+                        content = delta.get("content", "")
+                        if content:
+                            yield f"data: {json.dumps({'type': 'token', 'content': content})}\n\n"
+                except json.JSONDecodeError:
+                    continue
+    yield f"data: {json.dumps({'type': 'complete'})}\n\n"
+
+
+async def current_stream(client: httpx.AsyncClient):
+    openrouter = OpenRouterClient()
+    openrouter.base_url = "https://upstream"
+    openrouter.client = client
+    async for token in openrouter._stream_completion({}, {}):
+        yield encode_token(token)
+    yield COMPLETE_EVENT
+
+
+async def measure(name: str, pipeline, body: bytes, args) -> None:
+    client = make_client(body, args.chunk_size)
+    events = 0
+
+    async for _ in pipeline(client):  # warm up
+        pass
+
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    for _ in range(args.streams):
+        async for _ in pipeline(client):
+            events += 1
+    cpu = time.process_time() - cpu
+    wall = time.perf_counter() - wall
+
+    tokens = events - args.streams  # minus the completion events
+    print(
+        f"{name:<8} {tokens / wall:>12,.0f} tokens/s "
+        f"{cpu / args.streams * 1e3:8.2f}ms CPU/stream"
+    )
+    await client.aclose()
+
+
+async def main(args) -> None:
+    body = FIXTURE.read_bytes()
+    print(f"fixture: {len(body):,} bytes, orjson={'yes' if orjson else 'no'}")
+    await measure("legacy", legacy_stream, body, args)
+    await measure("current", current_stream, body, args)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--streams", type=int, default=200)
+    parser.add_argument("--chunk-size", type=int, default=512)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,51 @@
+"""
+Tests for token verification and the authentication middleware.
+"""
+from datetime import timedelta
+from unittest.mock import patch
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.core import security
+from app.core.security import create_access_token, decode_access_token
+from app.middleware.auth import AuthMiddleware
+
+
+def make_app():
+    app = FastAPI()
+    app.add_middleware(AuthMiddleware)
+
+    @app.get("/claims")
+    async def claims(request: Request):
+        return {"claims": request.state.token_claims}
+
+    return app
+
+
+def test_middleware_stores_verified_claims():
+    """Test that a valid bearer token's claims land on request.state."""
+    token = create_access_token({"sub": "user-1"})
+    client = TestClient(make_app())
+
+    response = client.get("/claims", headers={"Authorization": f"Bearer {token}"})
+    assert response.json()["claims"]["sub"] == "user-1"
+
+    for headers in ({}, {"Authorization": "Bearer not-a-jwt"}, {"Authorization": "Basic abc"}):
+        assert client.get("/claims", headers=headers).json() == {"claims": None}
+
+
+def test_decode_caches_until_expiry():
+    """Test that repeated decodes of one token verify the signature once."""
+    security._token_cache.clear()
+    token = create_access_token({"sub": "user-1"})
+
+    with patch.object(security.jwt, "decode", wraps=security.jwt.decode) as mock_decode:
+        for _ in range(3):
+            assert decode_access_token(token)["sub"] == "user-1"
+        assert mock_decode.call_count == 1
+
+    expired = create_access_token({"sub": "user-1"}, expires_delta=timedelta(seconds=-1))
+    with pytest.raises(security.HTTPException):
+        decode_access_token(expired)
@@ -0,0 +1,96 @@
+"""
+Tests for conversation ownership checks and keyset pagination.
+"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.core.database import Base
+from app.models.chat import ChatMessage, Conversation
+from app.models.user import User
+from app.services.chat_history import (
+    ConversationAccessError,
+    ConversationOwners,
+    fetch_history,
+)
+
+
+@pytest.fixture
+async def session_factory():
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with factory() as session:
+        session.add_all([
+            User(id="user-1", email="a@example.com", name="Ada"),
+            User(id="user-2", email="b@example.com", name="Bob"),
+        ])
+        await session.commit()
+
+    factory.engine = engine
+    yield factory
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_ownership_is_checked_once_then_cached(session_factory):
+    """Test that claims create unknown conversations, reject other users and cache owners."""
+    queries = []
+    event.listen(
+        session_factory.engine.sync_engine,
+        "before_cursor_execute",
+        lambda conn, cursor, statement, *args: queries.append(statement),
+    )
+    owners = ConversationOwners(max_entries=100)
+
+    async with session_factory() as db:
+        assert await owners.claim(db, "user-1", "c1", "p1") == "c1"
+        assert await db.get(Conversation, "c1") is not None
+        queries.clear()
+
+        assert await owners.claim(db, "user-1", "c1", "p1") == "c1"
+        with pytest.raises(ConversationAccessError):
+            await owners.claim(db, "user-2", "c1", "p1")
+        assert queries == []
+
+        # Another worker's cache is cold but the row settles it
+        with pytest.raises(ConversationAccessError):
+            await ConversationOwners(max_entries=100).claim(db, "user-2", "c1", "p1")
+
+
+@pytest.mark.asyncio
+async def test_history_pages_with_cursors(session_factory):
+    """Test that keyset pages cover every message exactly once, newest first."""
+    async with session_factory() as db:
+        db.add(Conversation(id="c1", user_id="user-1", project_id="p1"))
+        db.add(Conversation(id="c2", user_id="user-1", project_id=None))
+        start = datetime.now(timezone.utc)
+        for i in range(7):
+            for j, (role, text) in enumerate([("user", f"q{i}"), ("assistant", f"a{i}")]):
+                db.add(ChatMessage(
+                    conversation_id="c1", user_id="user-1", project_id="p1",
+                    role=role, content=text, created_at=start + timedelta(seconds=2 * i + j),
+                ))
+        db.add(ChatMessage(
+            conversation_id="c2", user_id="user-1", project_id=None,
+            role="user", content="elsewhere", created_at=start,
+        ))
+        await db.commit()
+        
+        seen, cursor = [], None
+        while True:
+            page, cursor = await fetch_history(db, "user-1", project_id="p1", limit=4, cursor=cursor)
+            seen.extend(message["content"] for message in page)
+            if cursor is None:
+                break
+        
+        unfiled, _ = await fetch_history(db, "user-1")
+        with pytest.raises(ValueError):
+            await fetch_history(db, "user-1", cursor="not-a-cursor")
+    
+    assert seen == [text for i in reversed(range(7)) for text in (f"a{i}", f"q{i}")]
+    assert [message["content"] for message in unfiled] == ["elsewhere"]
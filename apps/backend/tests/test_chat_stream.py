@@ -0,0 +1,37 @@
+"""
+Tests for the streaming chat endpoint.
+"""
+import json
+
+import pytest
+
+from app.api.v1 import chat as chat_module
+from app.api.v1.chat import ChatMessage, ChatRequest, chat_stream
+from app.core.config import settings
+from app.models.user import User
+
+
+class FakeOwners:
+    async def claim(self, db, user_id, conversation_id, project_id):
+        return conversation_id or "conv-new"
+
+
+@pytest.mark.asyncio
+async def test_direct_stream_tells_the_client_its_conversation_id(monkeypatch):
+    """Test that a new conversation's ID reaches the client without resumable streams."""
+    async def open_token_stream(request, user):
+        async def tokens():
+            yield "Hi"
+        return tokens()
+
+    monkeypatch.setattr(settings, "CHAT_RESUMABLE_STREAMS", False)
+    monkeypatch.setattr(chat_module, "conversation_owners", FakeOwners())
+    monkeypatch.setattr(chat_module, "open_token_stream", open_token_stream)
+
+    request = ChatRequest(messages=[ChatMessage(role="user", content="Hello")])
+    response = await chat_stream(request, User(id="user-1"), last_event_id=None, db=None)
+    body = b"".join([chunk async for chunk in response.body_iterator])
+    events = [json.loads(line[len(b"data: "):]) for line in body.split(b"\n\n") if line]
+
+    assert events[0] == {"type": "start", "conversation_id": "conv-new"}
+    assert [e["type"] for e in events[1:]] == ["token", "complete"]
@@ -0,0 +1,118 @@
+"""
+Tests for response compression.
+"""
+import asyncio
+import gzip
+import zlib
+
+import brotli
+import pytest
+import zstandard
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+
+from app.middleware.compression import CompressionMiddleware, negotiate_encoding
+
+LARGE = {"files": [{"path": f"src/file_{i}.ts", "content": "export {};\n" * 20} for i in range(50)]}
+
+
+def make_app(**options):
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, **options)
+    
+    @app.get("/large")
+    async def large():
+        return LARGE
+    
+    @app.get("/small")
+    async def small():
+        return {"ok": True}
+    
+    @app.get("/stream")
+    async def stream():
+        async def events():
+            for i in range(3):
+                yield f"data: {i}\n\n".encode()
+        return StreamingResponse(events(), media_type="text/event-stream")
+    
+    return app
+
+
+async def request(app, path, accept_encoding):
+    messages = []
+    requested = asyncio.Event()
+    
+    async def receive():
+        if requested.is_set():
+            await asyncio.Event().wait()  # the client never disconnects
+        requested.set()
+        return {"type": "http.request", "body": b"", "more_body": False}
+    
+    async def send(message):
+        messages.append(message)
+    
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "headers": [(b"accept-encoding", accept_encoding.encode())],
+    }
+    await app(scope, receive, send)
+    
+    headers = {k.decode(): v.decode() for k, v in messages[0]["headers"]}
+    chunks = [m.get("body", b"") for m in messages[1:]]
+    return headers, chunks
+
+
+def test_negotiation_prefers_client_weights_then_server_order():
+    """Test Accept-Encoding parsing with q-values and wildcards."""
+    supported = ("zstd", "br", "gzip")
+    
+    assert negotiate_encoding("gzip, deflate, br", supported) == "br"
+    assert negotiate_encoding("gzip;q=1.0, br;q=0.5", supported) == "gzip"
+    assert negotiate_encoding("*", supported) == "zstd"
+    assert negotiate_encoding("br;q=0, identity", supported) is None
+    assert negotiate_encoding("", supported) is None
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("encoding, decompress", [
+    ("zstd", lambda body: zstandard.ZstdDecompressor().decompressobj().decompress(body)),
+    ("br", brotli.decompress),
+    ("gzip", gzip.decompress),
+])
+async def test_large_json_is_compressed(encoding, decompress):
+    """Test that large bodies use the negotiated coding."""
+    headers, chunks = await request(make_app(), "/large", encoding)
+    body = b"".join(chunks)
+    
+    assert headers["content-encoding"] == encoding
+    assert headers["content-length"] == str(len(body))
+    assert b"file_49" in decompress(body)
+
+
+@pytest.mark.asyncio
+async def test_small_bodies_and_event_streams_are_untouched():
+    """Test that small responses and SSE pass through by default."""
+    app = make_app()
+    
+    small_headers, _ = await request(app, "/small", "br, gzip")
+    stream_headers, chunks = await request(app, "/stream", "br, gzip")
+    
+    assert "content-encoding" not in small_headers
+    assert "content-encoding" not in stream_headers
+    assert b"".join(chunks) == b"data: 0\n\ndata: 1\n\ndata: 2\n\n"
+
+
+@pytest.mark.asyncio
+async def test_compressed_streams_flush_every_event():
+    """Test that enabled stream compression delivers each event immediately."""
+    headers, chunks = await request(make_app(compress_streams=True), "/stream", "gzip")
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    
+    assert headers["content-encoding"] == "gzip"
+    assert [decompressor.decompress(chunk) for chunk in chunks[:3]] == [
+        b"data: 0\n\n", b"data: 1\n\n", b"data: 2\n\n"
+    ]
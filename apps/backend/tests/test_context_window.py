@@ -0,0 +1,65 @@
+"""
+Tests for the token-aware context window.
+"""
+from app.services.context_window import ContextWindow, TokenCounter
+
+
+def make_window(budget=200, summary_tokens=60):
+    return ContextWindow(
+        TokenCounter(max_entries=100),
+        budgets={"small": budget},
+        default_budget=10000,
+        summary_tokens=summary_tokens,
+    )
+
+
+def conversation(turns):
+    messages = [{"role": "system", "content": "You are working on project Apollo."}]
+    for i in range(turns):
+        messages.append({"role": "user", "content": f"Question {i}: " + "word " * 30})
+        messages.append({"role": "assistant", "content": f"Answer {i}: " + "word " * 30})
+    messages.append({"role": "user", "content": "Latest question?"})
+    return messages
+
+
+def test_short_conversations_are_sent_unchanged():
+    """Test that a conversation within budget is passed through as-is."""
+    window = make_window()
+    messages = conversation(1)
+
+    assert window.fit(messages, "small") is messages
+
+
+def test_long_conversation_keeps_pinned_context_and_recent_turns():
+    """Test that trimming keeps system context, the latest turns and a summary."""
+    window = make_window()
+    messages = conversation(10)
+
+    fitted = window.fit(messages, "small")
+    total = sum(window.counter.count_message(m) for m in fitted)
+
+    assert total <= 200
+    assert fitted[0] == messages[0]
+    assert fitted[-1] == messages[-1]
+    assert fitted[1]["role"] == "system"
+    assert fitted[1]["content"].startswith("Earlier in this conversation")
+    assert fitted[-2] == messages[-2]
+
+
+def test_unknown_models_use_the_default_budget():
+    """Test that models without a configured budget fall back to the default."""
+    window = make_window()
+    messages = conversation(10)
+
+    assert window.fit(messages, "other-model") is messages
+
+
+def test_token_counts_are_memoized():
+    """Test that counting the same content twice hits the cache."""
+    counter = TokenCounter(max_entries=1)
+
+    assert counter.count("Hello, world") == 3
+    assert counter.count("Hello, world") == 3
+    counter.count("Something else")
+
+    assert len(counter._counts) == 1
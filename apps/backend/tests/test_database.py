@@ -0,0 +1,68 @@
+"""
+Tests for lazy database sessions.
+"""
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.core import database
+from app.core.database import Base, get_db
+from app.models.user import User
+
+
+@pytest.fixture
+async def session_factory():
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    await engine.dispose()
+
+
+async def run_dependency(body):
+    """Drive get_db the way FastAPI does and return the yielded proxy."""
+    dependency = get_db()
+    db = await dependency.__anext__()
+    await body(db)
+    with pytest.raises(StopAsyncIteration):
+        await dependency.__anext__()
+    return db
+
+
+@pytest.mark.asyncio
+async def test_get_db_is_lazy_and_skips_read_only_commits(session_factory):
+    """Test that sessions are only created when used and only committed on writes."""
+    commits = []
+
+    def tracking_factory():
+        session = session_factory()
+        original_commit = session.commit
+
+        async def commit():
+            commits.append(session)
+            await original_commit()
+
+        session.commit = commit
+        return session
+
+    async def unused(db):
+        pass
+
+    async def read(db):
+        await db.execute(select(User))
+
+    async def write(db):
+        db.add(User(id="user-1", email="a@example.com", name="Ada"))
+
+    with patch.object(database, "AsyncSessionLocal", tracking_factory):
+        assert not (await run_dependency(unused)).started
+        assert (await run_dependency(read)).started
+        assert commits == []
+
+        await run_dependency(write)
+        assert len(commits) == 1
+
+    async with session_factory() as session:
+        assert (await session.get(User, "user-1")).name == "Ada"
@@ -0,0 +1,59 @@
+"""
+Tests for read/write routing across replicas.
+"""
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core.db_router import DatabaseRouter
+
+
+@pytest.fixture
+async def engines():
+    primary = create_async_engine("sqlite+aiosqlite://")
+    replicas = [create_async_engine("sqlite+aiosqlite://") for _ in range(2)]
+    yield primary, replicas
+    for engine in [primary, *replicas]:
+        await engine.dispose()
+
+
+def make_router(primary, replicas, max_lag=5.0):
+    return DatabaseRouter(
+        primary,
+        [(f"replica-{i}", engine) for i, engine in enumerate(replicas)],
+        max_lag=max_lag,
+        check_interval=60,
+    )
+
+
+@pytest.mark.asyncio
+async def test_reads_round_robin_over_usable_replicas(engines):
+    """Test that reads rotate over healthy replicas and skip lagging ones."""
+    primary, replicas = engines
+    router = make_router(primary, replicas)
+
+    picks = [router.read_engine() for _ in range(4)]
+    assert picks == [replicas[0], replicas[1], replicas[0], replicas[1]]
+
+    router.replicas[0].lag = 30.0
+    assert {router.read_engine() for _ in range(4)} == {replicas[1]}
+
+    router.mark_unhealthy(router.replicas[1])
+    assert router.read_engine() is primary
+
+
+@pytest.mark.asyncio
+async def test_health_checks_demote_and_restore_replicas(engines, tmp_path):
+    """Test that unreachable replicas are excluded until they recover."""
+    primary, replicas = engines
+    broken = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/missing/db.sqlite")
+    router = make_router(primary, [replicas[0], broken])
+
+    await router.check_replicas()
+    assert [r.healthy for r in router.replicas] == [True, False]
+    assert {router.read_engine() for _ in range(4)} == {replicas[0]}
+
+    router.replicas[1].engine = replicas[1]
+    await router.check_replicas()
+    assert router.replicas[1].healthy
+
+    await broken.dispose()
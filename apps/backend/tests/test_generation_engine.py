@@ -0,0 +1,99 @@
+"""
+Tests for the DAG-parallel generation engine.
+"""
+import asyncio
+import time
+
+import pytest
+
+from app.services.generation_engine import (
+    GenerationEngine,
+    PlanValidationError,
+    topological_order,
+)
+
+
+class FakeClient:
+    """Answers every task with one file after a fixed delay."""
+
+    def __init__(self, delay=0.05, fail=()):
+        self.delay = delay
+        self.fail = set(fail)
+        self.prompts = {}
+
+    async def chat_completion(self, messages, **kwargs):
+        prompt = messages[-1]["content"]
+        task_id = prompt.split("Task ", 1)[1].split(":", 1)[0]
+        self.prompts[task_id] = prompt
+        await asyncio.sleep(self.delay)
+        if task_id in self.fail:
+            raise RuntimeError("upstream error")
+        content = f"```ts:src/{task_id}.ts\nexport const id = '{task_id}';\n```"
+        return {"choices": [{"message": {"content": content}}]}
+
+
+def make_plan(tasks):
+    return {
+        "project": {"name": "demo", "description": "", "framework": "vite", "language": "typescript"},
+        "tasks": [
+            {"id": task_id, "title": task_id, "files": [], "dependencies": deps}
+            for task_id, deps in tasks
+        ],
+    }
+
+
+async def collect(engine, plan):
+    return [event async for event in engine.run(plan)]
+
+
+def test_topological_order_rejects_invalid_graphs():
+    """Test that cycles, unknown and duplicate IDs are reported."""
+    with pytest.raises(PlanValidationError, match="cycle"):
+        topological_order(make_plan([("a", ["b"]), ("b", ["a"])])["tasks"])
+    with pytest.raises(PlanValidationError, match="unknown"):
+        topological_order(make_plan([("a", ["missing"])])["tasks"])
+    with pytest.raises(PlanValidationError, match="Duplicate"):
+        topological_order(make_plan([("a", []), ("a", [])])["tasks"])
+
+    assert topological_order(make_plan([("b", ["a"]), ("a", [])])["tasks"]) == ["a", "b"]
+
+
+@pytest.mark.asyncio
+async def test_plan_runs_in_about_its_critical_path():
+    """Test that a 20-task, 4-level plan takes ~4 task durations, not 20."""
+    layers = [[f"t{level}-{i}" for i in range(5)] for level in range(4)]
+    tasks = [
+        (task_id, layers[level - 1] if level else [])
+        for level, layer in enumerate(layers)
+        for task_id in layer
+    ]
+    client = FakeClient(delay=0.05)
+    engine = GenerationEngine(client, max_concurrency=5, max_tokens=100)
+
+    started = time.monotonic()
+    events = await collect(engine, make_plan(tasks))
+    elapsed = time.monotonic() - started
+
+    assert events[-1]["type"] == "plan_completed"
+    assert events[-1]["completed"] == 20
+    assert elapsed < 0.5  # Sequential execution would take 1s
+    # Dependents see the files their dependencies produced
+    assert "src/t0-0.ts" in client.prompts["t1-0"]
+
+
+@pytest.mark.asyncio
+async def test_failed_task_skips_its_dependents():
+    """Test that a failure skips transitive dependents but not other branches."""
+    plan = make_plan([("a", []), ("b", ["a"]), ("c", ["b"]), ("d", [])])
+    engine = GenerationEngine(FakeClient(delay=0, fail={"a"}), max_concurrency=2, max_tokens=100)
+
+    events = await collect(engine, plan)
+    outcomes = {e["task_id"]: e["type"] for e in events if e["type"] != "task_started" and "task_id" in e}
+
+    assert outcomes == {
+        "a": "task_failed",
+        "b": "task_skipped",
+        "c": "task_skipped",
+        "d": "task_completed",
+    }
+    assert events[-1]["failed"] == 1 and events[-1]["skipped"] == 2
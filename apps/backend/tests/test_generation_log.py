@@ -0,0 +1,184 @@
+"""
+Tests for the resumable generation log.
+"""
+import asyncio
+
+import fakeredis
+import pytest
+
+from app.services.generation_log import GenerationLog
+
+
+def make_log(redis, reader_grace=5.0):
+    return GenerationLog(
+        redis,
+        ttl=60,
+        completed_ttl=10,
+        maxlen=1000,
+        reader_grace=reader_grace,
+        block_ms=50,
+    )
+
+
+@pytest.mark.asyncio
+async def test_reconnecting_client_resumes_without_new_upstream_call():
+    """Test that a second worker can resume a generation after any entry."""
+    redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+    calls = 0
+    
+    async def tokens():
+        nonlocal calls
+        calls += 1
+        
+        async def stream():
+            for token in ["Hel", "lo", " world"]:
+                await asyncio.sleep(0.01)
+                yield token
+        return stream()
+    
+    producer = make_log(redis)
+    await producer.start("gen1", "user-1", tokens)
+    
+    entries = [entry async for entry in producer.tail("gen1")]
+    assert [fields["type"] for _, fields in entries] == [
+        "start", "token", "token", "token", "complete"
+    ]
+    
+    # Another worker, resuming after the first token
+    other = make_log(redis)
+    resumed = [fields.get("content") async for _, fields in other.tail("gen1", entries[1][0])]
+    
+    assert resumed == ["lo", " world", None]
+    assert await other.owner("gen1") == "user-1"
+    assert calls == 1
+    assert await redis.ttl("generation:gen1") <= 10
+
+
+@pytest.mark.asyncio
+async def test_producer_stops_when_no_client_is_reading():
+    """Test that an unread generation cancels its upstream after the grace period."""
+    redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+    closed = asyncio.Event()
+    
+    async def tokens():
+        async def stream():
+            try:
+                while True:
+                    await asyncio.sleep(0.01)
+                    yield "tok"
+            finally:
+                closed.set()
+        return stream()
+    
+    log = make_log(redis, reader_grace=0.1)
+    await log.start("gen2", "user-1", tokens)
+    
+    await asyncio.wait_for(closed.wait(), timeout=2)
+    entries = await redis.xrange("generation:gen2")
+    await asyncio.sleep(0.05)
+    final = (await redis.xrevrange("generation:gen2", count=1))[0][1]
+    
+    assert final == {"type": "error", "message": "Generation abandoned"}
+    assert 1 < len(entries) < 100
+
+
+@pytest.mark.asyncio
+async def test_unknown_generation_ends_with_an_error():
+    """Test that tailing a missing log does not block forever."""
+    log = make_log(fakeredis.FakeAsyncRedis(decode_responses=True))
+    
+    entries = [fields async for _, fields in log.tail("missing")]
+    
+    assert entries == [{"type": "error", "message": "Generation not found"}]
+    assert await log.owner("missing") is None
+
+
+@pytest.mark.asyncio
+async def test_stalled_upstream_is_abandoned_without_tokens():
+    """Test that the reader check runs on a timer, not only when a token arrives."""
+    redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+    closed = asyncio.Event()
+    
+    async def tokens():
+        async def stream():
+            try:
+                await asyncio.Event().wait()  # upstream never answers
+                yield "never"
+            finally:
+                closed.set()
+        return stream()
+    
+    log = make_log(redis, reader_grace=0.1)
+    await log.start("gen3", "user-1", tokens)
+    
+    await asyncio.wait_for(closed.wait(), timeout=2)
+    await asyncio.sleep(0.05)
+    final = (await redis.xrevrange("generation:gen3", count=1))[0][1]
+    
+    assert final == {"type": "error", "message": "Generation abandoned"}
+
+
+@pytest.mark.asyncio
+async def test_disconnected_reader_cancels_upstream_quickly():
+    """Test that the last reader leaving cancels the upstream after the reconnect window."""
+    redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+    closed = asyncio.Event()
+    
+    async def tokens():
+        async def stream():
+            try:
+                while True:
+                    await asyncio.sleep(0.01)
+                    yield "tok"
+            finally:
+                closed.set()
+        return stream()
+    
+    log = make_log(redis, reader_grace=0.2)
+    await log.start("gen4", "user-1", tokens)
+    
+    # An active reader keeps the generation alive well past the grace period
+    reader = log.tail("gen4")
+    received = 0
+    async for _, fields in reader:
+        received += fields["type"] == "token"
+        if received == 50:
+            break
+    assert not closed.is_set()
+    
+    started = asyncio.get_running_loop().time()
+    await reader.aclose()
+    await asyncio.wait_for(closed.wait(), timeout=1)
+    
+    assert asyncio.get_running_loop().time() - started < 0.4
+    await asyncio.wait_for(closed.wait(), timeout=1)
+    await asyncio.sleep(0.05)
+    final = (await redis.xrevrange("generation:gen4", count=1))[0][1]
+    
+    assert final == {"type": "error", "message": "Generation abandoned"}
+
+
+@pytest.mark.asyncio
+async def test_reader_reconnecting_within_the_window_keeps_the_generation():
+    """Test that a client reconnecting within the grace period still gets the whole generation."""
+    redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+    
+    async def tokens():
+        async def stream():
+            for _ in range(20):
+                await asyncio.sleep(0.01)
+                yield "tok"
+        return stream()
+    
+    log = make_log(redis, reader_grace=0.5)
+    await log.start("gen5", "user-1", tokens)
+    
+    reader = log.tail("gen5")
+    async for entry_id, fields in reader:
+        if fields["type"] == "token":
+            break
+    await reader.aclose()
+    
+    resumed = [fields["type"] async for _, fields in log.tail("gen5", entry_id)]
+    
+    assert resumed == ["token"] * 19 + ["complete"]
@@ -0,0 +1,66 @@
+"""
+Tests for the shared outbound HTTP client registry.
+"""
+import httpx
+import pytest
+
+from app.core.http import HTTPClientRegistry, SharedClient, http_clients
+
+
+def make_registry():
+    return HTTPClientRegistry(limits=httpx.Limits(max_connections=10), http2=False)
+
+
+@pytest.mark.asyncio
+async def test_clients_are_shared_per_origin_and_timeout():
+    """Test that an origin has one pool, and each timeout its own client over it."""
+    registry = make_registry()
+
+    client = registry.get("https://api.example.com/v1/things", timeout=30.0)
+    assert registry.get("https://api.example.com/other", timeout=30.0) is client
+    assert registry.get("https://api.example.com:8443", timeout=30.0) is not client
+
+    slow = registry.get("https://api.example.com", timeout=60.0)
+    assert slow is not client
+    assert slow.timeout.read == 60.0 and client.timeout.read == 30.0
+    assert slow._transport is client._transport
+
+    await registry.aclose()
+
+
+@pytest.mark.asyncio
+async def test_clients_reopen_after_shutdown():
+    """Test that aclose() closes every client and a later get() opens a new one."""
+    registry = make_registry()
+    client = registry.get("https://api.example.com")
+
+    await registry.aclose()
+
+    assert client.is_closed
+    reopened = registry.get("https://api.example.com")
+    assert reopened is not client and not reopened.is_closed
+
+    await registry.aclose()
+
+
+@pytest.mark.asyncio
+async def test_services_resolve_the_client_on_each_access():
+    """Test that a long-lived service picks up the client opened after a shutdown."""
+    class Service:
+        client = SharedClient(timeout=5.0)
+
+        def __init__(self):
+            self.base_url = "https://service.example.com/api"
+
+    service = Service()
+    before = service.client
+    await http_clients.aclose()
+
+    assert before.is_closed
+    assert not service.client.is_closed
+    assert service.client is http_clients.get("https://service.example.com", timeout=5.0)
+
+    # Instances can still be given their own client
+    mock = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(200)))
+    service.client = mock
+    assert service.client is mock
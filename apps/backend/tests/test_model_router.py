@@ -0,0 +1,117 @@
+"""
+Tests for model routing and fallback.
+"""
+import json
+
+import httpx
+import pytest
+
+from app.core.config import ModelRoutingPolicy
+from app.core.model_router import ModelRouter
+from app.core.resilience import CircuitBreaker, Resilience, RetryBudget
+from app.core.scheduler import Priority
+from app.services.openrouter import OpenRouterClient
+
+POLICY = ModelRoutingPolicy(
+    routes={
+        "interactive": ["big/model", "small/model"],
+        "planning": ["small/model", "big/model"],
+    },
+    prefer_faster_ratio=1.5,
+    min_samples=2,
+    ewma_alpha=0.5,
+)
+
+
+def make_resilience(model):
+    return Resilience(
+        RetryBudget(ratio=0.1, min_per_second=0.0, capacity=10.0),
+        CircuitBreaker(failure_threshold=1, reset_timeout=30.0, name=model),
+        max_attempts=1,
+        base_delay=0.001,
+        max_delay=0.01,
+        max_retry_after=1.0,
+        hedge_min_samples=1000,
+    )
+
+
+def make_router():
+    return ModelRouter(POLICY, default_model="big/model", resilience_factory=make_resilience)
+
+
+def test_routes_follow_the_policy_per_call_class():
+    """Test that planning prefers the small model and unknown classes use the default."""
+    router = make_router()
+
+    assert router.candidates("planning") == ["small/model", "big/model"]
+    assert router.candidates("interactive") == ["big/model", "small/model"]
+    assert router.candidates("bulk") == ["big/model"]
+
+
+def test_unrouted_classes_use_the_default_and_opt_in_fallbacks():
+    """Test that without routes every class goes to the default model first."""
+    policy = ModelRoutingPolicy(fallbacks=["big/model", "small/model"])
+    router = ModelRouter(policy, default_model="big/model", resilience_factory=make_resilience)
+
+    assert router.candidates("interactive") == ["big/model", "small/model"]
+    bare = ModelRouter(
+        ModelRoutingPolicy(), default_model="big/model", resilience_factory=make_resilience
+    )
+    assert bare.candidates("planning") == ["big/model"]
+
+
+def test_faster_healthy_model_is_promoted():
+    """Test that a clearly faster fallback model moves to the front."""
+    router = make_router()
+    for _ in range(2):
+        router.record_success("big/model", 10.0, 100)
+        router.record_success("small/model", 1.0, 100)
+
+    assert router.candidates("interactive") == ["small/model", "big/model"]
+
+
+def test_open_circuit_moves_model_to_the_back():
+    """Test that an unhealthy model is only tried as a last resort."""
+    router = make_router()
+    router.resilience("big/model").breaker.record_failure()
+
+    assert router.candidates("interactive") == ["small/model", "big/model"]
+
+
+@pytest.mark.asyncio
+async def test_errors_fall_back_to_the_next_model():
+    """Test that a failing model is replaced by the next one in the route."""
+    models = []
+
+    async def handler(request):
+        model = json.loads(request.content)["model"]
+        models.append(model)
+        if model == "big/model":
+            return httpx.Response(503)
+        return httpx.Response(200, json={
+            "choices": [{"message": {"content": "Hi"}}],
+            "usage": {"completion_tokens": 1},
+        })
+
+    client = OpenRouterClient()
+    client.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    client.router = make_router()
+
+    response = await client.chat_completion(
+        [{"role": "user", "content": "Hi"}], priority=Priority.INTERACTIVE
+    )
+
+    assert response["choices"][0]["message"]["content"] == "Hi"
+    assert models == ["big/model", "small/model"]
+    # The failed model's breaker is now open, so the next call skips it
+    assert client.router.candidates("interactive")[0] == "small/model"
+
+
+async def test_no_candidate_models_raises_a_clear_error():
+    """Test that an empty model list fails explicitly instead of raising None."""
+    client = OpenRouterClient()
+    client.router = make_router()
+    client.router.candidates = lambda call_class: []
+
+    with pytest.raises(ValueError, match="No upstream models"):
+        await client.chat_completion([{"role": "user", "content": "Hi"}])
@@ -1,8 +1,15 @@
 """
 Tests for OpenRouter integration.
 """
+import asyncio
+import json
+
+import httpx
 import pytest
-from unittest.mock import AsyncMock, patch
+import fakeredis
+from unittest.mock import AsyncMock, MagicMock, patch
+from app.services import openrouter
+from app.services.completion_cache import CompletionCache
 from app.services.openrouter import OpenRouterClient
 
 
@@ -12,6 +19,7 @@ async def test_chat_completion():
     client = OpenRouterClient()
     
     with patch.object(client.client, 'post', new_callable=AsyncMock) as mock_post:
+        mock_post.return_value = MagicMock()
         mock_post.return_value.json.return_value = {
             "choices": [{"message": {"content": "Hello!"}}],
             "usage": {"total_tokens": 10}
@@ -36,3 +44,144 @@ async def test_prompt_sanitization():
     
     assert "sk-1234567890abcdef" not in sanitized
     assert "[REDACTED]" in sanitized
+
+
+@pytest.mark.asyncio
+async def test_completion_cache_hits_and_replays_streams():
+    """Test that cached completions skip upstream and replay as streams."""
+    client = OpenRouterClient()
+    cache = CompletionCache(
+        fakeredis.FakeAsyncRedis(decode_responses=True),
+        ttl=60,
+        local_max_entries=10,
+        local_max_bytes=10000,
+        max_entry_bytes=10000,
+    )
+    messages = [{"role": "user", "content": "Plan a todo app"}]
+    content = "A plan with enough text to span several replayed chunks."
+    
+    with patch.object(openrouter, "completion_cache", cache), \
+            patch.object(client.client, 'post', new_callable=AsyncMock) as mock_post:
+        mock_post.return_value = MagicMock()
+        mock_post.return_value.json.return_value = {
+            "choices": [{"message": {"content": content}}]
+        }
+        
+        first = await client.chat_completion(messages, temperature=0.3, cache=True)
+        second = await client.chat_completion(messages, temperature=0.3, cache=True)
+        stream = await client.chat_completion(messages, temperature=0.3, stream=True, cache=True)
+        tokens = [token async for token in stream]
+        
+        # Different sampling parameters are a different cache entry
+        await client.chat_completion(messages, temperature=0.9, cache=True)
+    
+    assert first == second
+    assert len(tokens) > 1 and "".join(tokens) == content
+    assert mock_post.call_count == 2
+
+
+def sse_body(tokens):
+    lines = [
+        f"data: {json.dumps({'choices': [{'delta': {'content': token}}]})}\n\n"
+        for token in tokens
+    ]
+    return "".join(lines) + "data: [DONE]\n\n"
+
+
+@pytest.mark.asyncio
+async def test_identical_inflight_requests_share_one_upstream_call():
+    """Test that concurrent identical deterministic completions are coalesced across users."""
+    calls = []
+    release = asyncio.Event()
+    
+    async def handler(request):
+        calls.append(json.loads(request.content))
+        await release.wait()
+        return httpx.Response(200, json={"choices": [{"message": {"content": "Plan"}}]})
+    
+    client = OpenRouterClient()
+    client.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    messages = [{"role": "user", "content": "Plan a todo app"}]
+    
+    pending = [
+        asyncio.create_task(client.chat_completion(messages, temperature=0, user_id=user_id))
+        for user_id in ["u1", "u1", "u2", "u3", None]
+    ]
+    # Sampled requests get their own calls
+    sampled = [
+        asyncio.create_task(client.chat_completion(messages, temperature=0.9, user_id="u1"))
+        for _ in range(2)
+    ]
+    await asyncio.sleep(0.01)
+    release.set()
+    results = await asyncio.gather(*pending, *sampled)
+    
+    assert len(calls) == 3
+    assert all(r["choices"][0]["message"]["content"] == "Plan" for r in results)
+    # Followers get their own copy of the shared response
+    assert results[0] is not results[1]
+    assert len(client.inflight) == 0
+
+
+@pytest.mark.asyncio
+async def test_late_stream_subscribers_replay_emitted_tokens():
+    """Test that a subscriber joining mid-stream sees the whole stream."""
+    calls = 0
+    first_sent = asyncio.Event()
+    release = asyncio.Event()
+    
+    async def body():
+        yield sse_body(["Hello"]).removesuffix("data: [DONE]\n\n").encode()
+        first_sent.set()
+        await release.wait()
+        yield sse_body([", ", "world"]).encode()
+    
+    async def handler(request):
+        nonlocal calls
+        calls += 1
+        return httpx.Response(200, content=body())
+    
+    client = OpenRouterClient()
+    client.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    messages = [{"role": "user", "content": "Say hello"}]
+    
+    first = await client.chat_completion(messages, stream=True, temperature=0)
+    assert await first.__anext__() == "Hello"
+    await first_sent.wait()
+    
+    second = await client.chat_completion(messages, stream=True, temperature=0)
+    release.set()
+    
+    first_tokens = ["Hello"] + [token async for token in first]
+    second_tokens = [token async for token in second]
+    
+    assert calls == 1
+    assert first_tokens == second_tokens == ["Hello", ", ", "world"]
+
+
+@pytest.mark.asyncio
+async def test_stream_is_cancelled_when_all_subscribers_leave():
+    """Test that abandoning every subscriber stops the upstream stream."""
+    closed = asyncio.Event()
+    
+    async def body():
+        try:
+            yield sse_body(["one"]).removesuffix("data: [DONE]\n\n").encode()
+            await asyncio.Event().wait()
+        finally:
+            closed.set()
+    
+    async def handler(request):
+        return httpx.Response(200, content=body())
+    
+    client = OpenRouterClient()
+    client.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    
+    stream = await client.chat_completion(
+        [{"role": "user", "content": "Count"}], stream=True, temperature=0
+    )
+    assert await stream.__anext__() == "one"
+    await stream.aclose()
+    
+    await asyncio.wait_for(closed.wait(), timeout=1)
+    assert len(client.inflight) == 0
@@ -0,0 +1,157 @@
+"""
+Tests for streamed task plans and the incremental JSON parser.
+"""
+import asyncio
+import json
+
+import pytest
+
+from app.core.json_stream import JSONStreamParser, repair_json
+from app.services import task_planner as task_planner_module
+from app.services.generation_engine import GenerationEngine
+from app.services.task_planner import PLAN_STREAM_PATHS, TaskPlanner
+
+PROJECT = {"name": "demo", "description": "", "framework": "vite", "language": "typescript"}
+
+
+def chunks(text, size=7):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def test_parser_emits_each_task_as_it_closes():
+    """Test that tasks come out of feed() one by one, across chunk boundaries."""
+    text = "Here is the plan:\n```json\n" + json.dumps({
+        "project": PROJECT,
+        "tasks": [
+            {"id": "a", "title": "A {with braces}", "dependencies": []},
+            {"id": "b", "title": "B", "dependencies": ["a"]},
+        ],
+    }) + "\n```\nLet me know!"
+    parser = JSONStreamParser(PLAN_STREAM_PATHS)
+
+    emitted = []
+    for chunk in chunks(text):
+        emitted.extend(path for path, _ in parser.feed(chunk))
+        if ("tasks", 0) in emitted:
+            # The first task is out before the second has been read
+            assert ("tasks", 1) not in emitted or parser.done
+
+    assert emitted == [("project",), ("tasks", 0), ("tasks", 1)]
+    assert parser.done and parser.document["tasks"][1]["dependencies"] == ["a"]
+
+
+def test_repair_fixes_common_model_mistakes():
+    """Test comments, trailing commas, single quotes, bare keys and raw newlines."""
+    broken = """{
+        // the first task
+        id: 'task-1',
+        "title": "Say \\"hi\\"",
+        'description': 'it\\'s "fine"',
+        "code": "line one
+line two",
+        "optional": None,
+        "files": ["a.ts",],
+    }"""
+
+    repaired = json.loads(repair_json(broken))
+
+    assert repaired["id"] == "task-1"
+    assert repaired["description"] == 'it\'s "fine"'
+    assert repaired["code"] == "line one\nline two"
+    assert repaired["optional"] is None
+    assert repaired["files"] == ["a.ts"]
+
+
+class FakeStreamClient:
+    """Streams a fixed completion, pausing between chunks."""
+
+    def __init__(self, text, delay=0.0):
+        self.text = text
+        self.delay = delay
+        self.finished = asyncio.Event()
+
+    async def chat_completion(self, messages, stream=False, **kwargs):
+        assert stream
+
+        async def tokens():
+            for chunk in chunks(self.text):
+                await asyncio.sleep(self.delay)
+                yield chunk
+            self.finished.set()
+
+        return tokens()
+
+
+@pytest.mark.asyncio
+async def test_truncated_plan_keeps_complete_tasks(monkeypatch):
+    """Test that a malformed task and a cut-off tail do not fail the plan."""
+    text = (
+        '{"project": ' + json.dumps(PROJECT) + ', "tasks": ['
+        '{"id": "a", "title": "A", "files": ["a.ts",],},'
+        '{"id": "b", "description": "no title"},'
+        '{"id": "c", "title": "C", "dependencies": ["a"]},'
+        '{"id": "d", "title": "Cut off mid-str'
+    )
+    monkeypatch.setattr(task_planner_module, "openrouter_client", FakeStreamClient(text))
+
+    plan = await TaskPlanner().create_plan("Build a demo")
+
+    assert plan["project"] == PROJECT
+    assert [task["id"] for task in plan["tasks"]] == ["a", "c"]
+    assert plan["tasks"][0]["files"] == ["a.ts"]
+    assert plan["tasks"][0]["type"] == "component"
+
+
+@pytest.mark.asyncio
+async def test_trailing_text_is_still_read_for_the_cache(monkeypatch):
+    """Test that the plan returns early but the completion is read to its end."""
+    text = json.dumps({"project": PROJECT, "tasks": []}) + "\nHope this helps! " * 20
+    client = FakeStreamClient(text, delay=0.001)
+    monkeypatch.setattr(task_planner_module, "openrouter_client", client)
+
+    plan = await TaskPlanner().create_plan("Build a demo")
+
+    assert plan["project"] == PROJECT
+    assert not client.finished.is_set()
+    await asyncio.wait_for(client.finished.wait(), timeout=1)
+
+
+class FakeGenerationClient:
+    async def chat_completion(self, messages, **kwargs):
+        task_id = messages[-1]["content"].split("Task ", 1)[1].split(":", 1)[0]
+        content = f"```ts:src/{task_id}.ts\nexport const id = '{task_id}';\n```"
+        return {"choices": [{"message": {"content": content}}]}
+
+
+@pytest.mark.asyncio
+async def test_generation_starts_before_the_plan_finishes():
+    """Test that run_stream starts ready tasks while later ones are still arriving."""
+    planning_done = asyncio.Event()
+
+    async def parts():
+        yield "project", PROJECT
+        yield "task", {"id": "a", "title": "A", "files": [], "dependencies": []}
+        await asyncio.sleep(0.05)
+        # Depends on a task that arrives later, and on one that never does
+        yield "task", {"id": "b", "title": "B", "files": [], "dependencies": ["c"]}
+        yield "task", {"id": "c", "title": "C", "files": [], "dependencies": ["a"]}
+        yield "task", {"id": "d", "title": "D", "files": [], "dependencies": ["missing"]}
+        planning_done.set()
+
+    engine = GenerationEngine(FakeGenerationClient(), max_concurrency=2, max_tokens=100)
+    events = []
+    async for event in engine.run_stream(parts()):
+        if event["type"] == "task_completed" and event["task_id"] == "a":
+            assert not planning_done.is_set()
+        events.append(event)
+
+    outcomes = {e["task_id"]: e["type"] for e in events if e["type"] in {
+        "task_completed", "task_failed", "task_skipped",
+    }}
+    assert outcomes == {
+        "a": "task_completed",
+        "b": "task_completed",
+        "c": "task_completed",
+        "d": "task_skipped",
+    }
+    assert events[-1]["type"] == "plan_completed" and events[-1]["completed"] == 3
@@ -0,0 +1,113 @@
+"""
+Tests for the Redis token bucket rate limiter.
+"""
+from unittest.mock import patch
+
+import pytest
+import fakeredis
+
+from app.core.rate_limiter import LeasedRateLimiter, TokenBucketLimiter
+
+
+def make_limiter(capacity=5, window_ms=60000, route_costs=None):
+    redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+    return TokenBucketLimiter(redis, capacity, window_ms, route_costs=route_costs)
+
+
+@pytest.mark.asyncio
+async def test_bucket_allows_capacity_then_denies():
+    """Test that a full bucket admits exactly `capacity` requests."""
+    limiter = make_limiter(capacity=5)
+
+    results = [await limiter.acquire("user-1") for _ in range(6)]
+
+    assert [r.allowed for r in results] == [True] * 5 + [False]
+    assert results[4].remaining == 0
+    assert results[5].retry_after_ms > 0
+
+
+@pytest.mark.asyncio
+async def test_route_costs_use_longest_prefix():
+    """Test that weighted routes drain the bucket faster."""
+    limiter = make_limiter(
+        capacity=10,
+        route_costs={"/api/chat": 2, "/api/chat/stream": 5},
+    )
+
+    assert limiter.cost_for("/api/projects") == 1
+    assert limiter.cost_for("/api/chat/") == 2
+    assert limiter.cost_for("/api/chat/stream") == 5
+
+    first = await limiter.acquire("user-1", limiter.cost_for("/api/chat/stream"))
+    second = await limiter.acquire("user-1", limiter.cost_for("/api/chat/stream"))
+    third = await limiter.acquire("user-1", 1)
+
+    assert first.allowed and second.allowed
+    assert not third.allowed
+
+
+@pytest.mark.asyncio
+async def test_bucket_state_is_a_single_hash():
+    """Test that a user's bucket stays O(1) in Redis regardless of traffic."""
+    limiter = make_limiter(capacity=100)
+
+    for _ in range(50):
+        await limiter.acquire("user-1")
+
+    assert await limiter.redis.keys("*") == ["rate_limit:user-1"]
+    assert await limiter.redis.hlen("rate_limit:user-1") == 2
+
+
+@pytest.mark.asyncio
+async def test_lease_tier_serves_from_memory():
+    """Test that leased tokens are spent locally and refunded on expiry."""
+    bucket = make_limiter(capacity=20)
+    limiter = LeasedRateLimiter(bucket, lease_size=4, lease_ttl_ms=60000, max_users=10)
+
+    async def bucket_tokens():
+        return float(await bucket.redis.hget("rate_limit:user-1", "tokens"))
+
+    first = await limiter.acquire("user-1")
+    assert first.allowed and first.granted == 5
+    after_lease = await bucket_tokens()
+    assert 15 <= after_lease < 16
+
+    # The next four requests never touch Redis
+    for _ in range(4):
+        assert (await limiter.acquire("user-1")).allowed
+    assert await bucket_tokens() == after_lease
+
+    # Take a second lease (10 left), expire it unspent and refill:
+    # 10 + 4 refunded - 5 taken leaves 9 in the bucket
+    await limiter.acquire("user-1")
+    limiter._leases.get("user-1").expires_at = 0
+    await limiter.acquire("user-1")
+    assert 9 <= await bucket_tokens() < 10
+
+
+def test_middleware_returns_429_with_retry_after():
+    """Test that exhausted users get a 429 response rather than an error."""
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    from app.core.security import create_access_token
+    from app.middleware import rate_limit
+    from app.middleware.auth import AuthMiddleware
+    from app.middleware.rate_limit import RateLimitMiddleware
+
+    app = FastAPI()
+
+    @app.get("/api/projects")
+    async def projects():
+        return []
+
+    app.add_middleware(RateLimitMiddleware)
+    app.add_middleware(AuthMiddleware)
+
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'user-1'})}"}
+    with patch.object(rate_limit, "rate_limiter", make_limiter(capacity=2)), TestClient(app) as client:
+        statuses = [client.get("/api/projects", headers=headers).status_code for _ in range(3)]
+        denied = client.get("/api/projects", headers=headers)
+
+    assert statuses == [200, 200, 429]
+    assert int(denied.headers["Retry-After"]) > 0
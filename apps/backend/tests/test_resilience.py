@@ -0,0 +1,180 @@
+"""
+Tests for upstream retries, circuit breaking and hedging.
+"""
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from app.core.config import ModelRoutingPolicy
+from app.core.model_router import ModelRouter
+from app.core.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    Resilience,
+    RetryBudget,
+    parse_retry_after,
+)
+from app.services.openrouter import OpenRouterClient
+
+OK = {"choices": [{"message": {"content": "Hi"}}]}
+
+
+def make_resilience(capacity=10.0, failure_threshold=5, reset_timeout=30.0, hedge_min_samples=1000):
+    return Resilience(
+        RetryBudget(ratio=0.1, min_per_second=0.0, capacity=capacity),
+        CircuitBreaker(failure_threshold=failure_threshold, reset_timeout=reset_timeout),
+        max_attempts=4,
+        base_delay=0.001,
+        max_delay=0.01,
+        max_retry_after=1.0,
+        hedge_min_samples=hedge_min_samples,
+    )
+
+
+def make_client(handler, resilience):
+    """OpenRouterClient talking to a local fake upstream through one model."""
+    client = OpenRouterClient()
+    client.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    client.router = ModelRouter(
+        ModelRoutingPolicy(routes={}),
+        default_model="test/model",
+        resilience_factory=lambda model: resilience,
+    )
+    return client
+
+
+def test_parse_retry_after():
+    """Test delta-seconds, HTTP dates and garbage."""
+    assert parse_retry_after("2") == 2.0
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
+
+
+@pytest.mark.asyncio
+async def test_retries_honour_retry_after():
+    """Test that a 429 with Retry-After is retried after the given delay."""
+    calls = []
+
+    async def handler(request):
+        calls.append(asyncio.get_running_loop().time())
+        if len(calls) == 1:
+            return httpx.Response(429, headers={"Retry-After": "0.05"})
+        return httpx.Response(200, json=OK)
+
+    client = make_client(handler, make_resilience())
+    response = await client.chat_completion([{"role": "user", "content": "Hi"}])
+
+    assert response == OK
+    assert len(calls) == 2 and calls[1] - calls[0] >= 0.05
+
+
+@pytest.mark.asyncio
+async def test_retry_after_beyond_cap_fails_immediately():
+    """Test that the client does not sit out a long Retry-After."""
+    calls = 0
+
+    async def handler(request):
+        nonlocal calls
+        calls += 1
+        return httpx.Response(503, headers={"Retry-After": "120"})
+
+    client = make_client(handler, make_resilience())
+    with pytest.raises(httpx.HTTPStatusError):
+        await client.chat_completion([{"role": "user", "content": "Hi"}])
+
+    assert calls == 1
+
+
+@pytest.mark.asyncio
+async def test_empty_retry_budget_stops_retries():
+    """Test that retries stop once the budget is spent."""
+    calls = 0
+
+    async def handler(request):
+        nonlocal calls
+        calls += 1
+        return httpx.Response(502)
+
+    client = make_client(handler, make_resilience(capacity=1.0))
+    with pytest.raises(httpx.HTTPStatusError):
+        await client.chat_completion([{"role": "user", "content": "Hi"}])
+
+    # One attempt plus the single retry the budget allowed
+    assert calls == 2
+
+
+@pytest.mark.asyncio
+async def test_circuit_opens_and_fails_fast():
+    """Test that repeated upstream failures open the circuit."""
+    calls = 0
+    healthy = False
+
+    async def handler(request):
+        nonlocal calls
+        calls += 1
+        return httpx.Response(200, json=OK) if healthy else httpx.Response(500)
+
+    resilience = make_resilience(failure_threshold=2, reset_timeout=0.05)
+    client = make_client(handler, resilience)
+    messages = [{"role": "user", "content": "Hi"}]
+
+    with pytest.raises(CircuitOpenError):
+        await client.chat_completion(messages)
+    assert calls == 2 and resilience.breaker.state == "open"
+
+    with pytest.raises(CircuitOpenError):
+        await client.chat_completion(messages, temperature=0.1)
+    assert calls == 2
+
+    # After the reset timeout a probe goes through and closes the circuit
+    await asyncio.sleep(0.06)
+    healthy = True
+    assert await client.chat_completion(messages, temperature=0.2) == OK
+    assert resilience.breaker.state == "closed"
+
+
+@pytest.mark.asyncio
+async def test_slow_call_is_hedged():
+    """Test that a call slower than p95 is raced against a second copy."""
+    calls = 0
+
+    async def handler(request):
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            await asyncio.sleep(10)
+        return httpx.Response(200, json=OK)
+
+    resilience = make_resilience(hedge_min_samples=5)
+    for _ in range(5):
+        resilience.latency.record(0.01)
+    client = make_client(handler, resilience)
+
+    response = await asyncio.wait_for(
+        client.chat_completion([{"role": "user", "content": "Hi"}]), timeout=1
+    )
+
+    assert response == OK and calls == 2
+
+
+@pytest.mark.asyncio
+async def test_stream_connection_is_retried():
+    """Test that a stream failing before its first token is reopened."""
+    calls = 0
+
+    async def handler(request):
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            return httpx.Response(503)
+        body = f"data: {json.dumps({'choices': [{'delta': {'content': 'Hi'}}]})}\n\ndata: [DONE]\n\n"
+        return httpx.Response(200, content=body.encode())
+
+    client = make_client(handler, make_resilience())
+    stream = await client.chat_completion([{"role": "user", "content": "Hi"}], stream=True)
+
+    assert [token async for token in stream] == ["Hi"]
+    assert calls == 2
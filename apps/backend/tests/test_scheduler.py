@@ -0,0 +1,67 @@
+"""
+Tests for the fair LLM call scheduler.
+"""
+import asyncio
+
+import pytest
+
+from app.core.scheduler import FairScheduler, Priority
+
+WEIGHTS = {"interactive": 8.0, "planning": 4.0, "bulk": 1.0}
+
+
+@pytest.mark.asyncio
+async def test_concurrency_is_capped():
+    """Test that no more than max_concurrency calls hold a slot at once."""
+    scheduler = FairScheduler(max_concurrency=2, weights=WEIGHTS)
+    peak = 0
+
+    async def call():
+        nonlocal peak
+        async with scheduler.slot("user-1"):
+            peak = max(peak, scheduler.active)
+            await asyncio.sleep(0.01)
+
+    await asyncio.gather(*(call() for _ in range(6)))
+
+    assert peak == 2
+    assert scheduler.active == 0 and scheduler.queued == 0
+
+
+@pytest.mark.asyncio
+async def test_interactive_call_overtakes_bulk_backlog():
+    """Test that one user's bulk backlog does not starve another's chat."""
+    scheduler = FairScheduler(max_concurrency=1, weights=WEIGHTS)
+    order = []
+
+    async def call(user_id, priority, label):
+        async with scheduler.slot(user_id, priority):
+            order.append(label)
+            await asyncio.sleep(0.01)
+
+    bulk = [
+        asyncio.create_task(call("user-1", Priority.BULK, f"bulk-{i}"))
+        for i in range(10)
+    ]
+    await asyncio.sleep(0.005)
+    chat = asyncio.create_task(call("user-2", Priority.INTERACTIVE, "chat"))
+    await asyncio.gather(*bulk, chat)
+
+    # Only the call already holding the slot runs before the chat call
+    assert order.index("chat") == 1
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_gives_up_its_place():
+    """Test that a call cancelled while queued never takes a slot."""
+    scheduler = FairScheduler(max_concurrency=1, weights=WEIGHTS)
+    await scheduler.acquire("user-1")
+
+    waiter = asyncio.create_task(scheduler.acquire("user-2"))
+    await asyncio.sleep(0)
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+
+    scheduler.release()
+    assert scheduler.active == 0 and scheduler.queued == 0
@@ -0,0 +1,50 @@
+"""
+Tests for stream coalescing.
+"""
+import asyncio
+
+import pytest
+
+from app.core.singleflight import SingleFlight, StreamCancelledError
+
+
+@pytest.mark.asyncio
+async def test_slow_subscriber_bounds_the_buffer():
+    """Test that the upstream is only read max_buffer tokens ahead of the slowest reader."""
+    produced = 0
+
+    async def source():
+        nonlocal produced
+        for i in range(100):
+            produced += 1
+            yield str(i)
+
+    flight = SingleFlight()
+    stream = flight.stream("key", source)
+    broadcast = next(iter(flight._streams.values()))
+    broadcast.max_buffer = 8
+
+    await asyncio.sleep(0.01)
+    # Registered before its first read, so the pump waits for it
+    assert produced <= 9 and len(broadcast.tokens) <= 8
+
+    tokens = [token async for token in stream]
+    assert tokens == [str(i) for i in range(100)]
+    # Trimming stopped new subscribers from joining a stream they could not replay
+    assert len(flight) == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_upstream_raises_a_regular_error():
+    """Test that subscribers see StreamCancelledError, not CancelledError."""
+    async def source():
+        yield "one"
+        await asyncio.Event().wait()
+
+    flight = SingleFlight()
+    stream = flight.stream("key", source)
+    assert await stream.__anext__() == "one"
+
+    next(iter(flight._streams.values()))._task.cancel()
+    with pytest.raises(StreamCancelledError):
+        await stream.__anext__()
@@ -0,0 +1,142 @@
+"""
+Tests for SSE encoding and parsing.
+"""
+import asyncio
+import json
+
+import pytest
+
+from app.core.sse import (
+    COMPLETE_EVENT,
+    coalesce_tokens,
+    encode_event,
+    encode_token,
+    iter_sse_data,
+    relay_tokens,
+)
+
+
+async def chunked(body: bytes, size: int):
+    for start in range(0, len(body), size):
+        yield body[start:start + size]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("size", [1, 7, 4096])
+async def test_parser_handles_split_chunks_comments_and_crlf(size):
+    """Test that events are reassembled regardless of chunk boundaries."""
+    body = (
+        b": OPENROUTER PROCESSING\n\n"
+        b'data: {"a": 1}\n\n'
+        b"event: ping\r\ndata: line one\r\ndata: line two\r\n\r\n"
+        b"data:[DONE]"
+    )
+    
+    events = [data async for data in iter_sse_data(chunked(body, size))]
+    
+    assert events == [b'{"a": 1}', b"line one\nline two", b"[DONE]"]
+
+
+def test_encoded_events_are_valid_sse_json():
+    """Test that pre-encoded events decode to the documented payloads."""
+    def decode(event: bytes):
+        lines = event.decode().split("\n")
+        assert event.endswith(b"\n\n")
+        return json.loads(lines[-3][len("data: "):])
+    
+    token = 'say "hi" ünïcode 🚀\n'
+    
+    assert decode(encode_token(token)) == {"type": "token", "content": token}
+    assert decode(COMPLETE_EVENT) == {"type": "complete"}
+    assert encode_event({"x": 1}, event_id="7").startswith(b"id: 7\n")
+
+
+async def timed_tokens(schedule):
+    """Yield tokens after the given delays (seconds)."""
+    for delay, token in schedule:
+        await asyncio.sleep(delay)
+        yield token
+
+
+@pytest.mark.asyncio
+async def test_coalescing_batches_bursts_but_not_the_first_token():
+    """Test that bursts share events while isolated tokens go out at once."""
+    schedule = [(0, "A")] + [(0.001, c) for c in "bcdef"] + [(0.2, "G"), (0.001, "h")]
+    
+    events = [
+        event
+        async for event in coalesce_tokens(timed_tokens(schedule), window=0.05, max_bytes=100)
+    ]
+    
+    assert events == ["A", "bcdef", "G", "h"]
+
+
+@pytest.mark.asyncio
+async def test_coalescing_flushes_at_byte_threshold():
+    """Test that a large burst is split once it reaches max_bytes."""
+    schedule = [(0, "first")] + [(0, "x" * 10)] * 5
+    
+    events = [
+        event
+        async for event in coalesce_tokens(timed_tokens(schedule), window=10, max_bytes=25)
+    ]
+    
+    assert events == ["first", "x" * 30, "x" * 20]
+
+
+@pytest.mark.asyncio
+async def test_relay_bounds_buffering_for_slow_clients():
+    """Test that the reader stalls once the queue is full."""
+    produced = []
+    
+    async def upstream():
+        for i in range(100):
+            produced.append(i)
+            yield str(i)
+    
+    relay = relay_tokens(upstream(), max_buffered=4)
+    assert await relay.__anext__() == "0"
+    await asyncio.sleep(0.01)
+    
+    # One token delivered, four queued, one waiting on a full queue
+    assert len(produced) <= 6
+    assert [token async for token in relay] == [str(i) for i in range(1, 100)]
+
+
+@pytest.mark.asyncio
+async def test_relay_cancels_upstream_when_client_goes_away():
+    """Test that abandoning the relay closes the upstream promptly."""
+    closed = asyncio.Event()
+    abandoned = []
+    
+    async def upstream():
+        try:
+            yield "first"
+            await asyncio.Event().wait()  # a long generation
+        finally:
+            closed.set()
+    
+    async def client(stream):
+        async for _ in stream:
+            pass
+    
+    stream = relay_tokens(upstream(), max_buffered=4, on_abandon=abandoned.append)
+    task = asyncio.create_task(client(coalesce_tokens(stream, window=0.02, max_bytes=100)))
+    await asyncio.sleep(0.01)
+    task.cancel()  # what Starlette does on http.disconnect
+    
+    await asyncio.wait_for(closed.wait(), timeout=1)
+    assert abandoned == [1]
+
+
+@pytest.mark.asyncio
+async def test_relay_reports_a_cancelled_source():
+    """Test that a source raising CancelledError fails the relay instead of hanging it."""
+    async def upstream():
+        yield "first"
+        raise asyncio.CancelledError()
+    
+    relay = relay_tokens(upstream(), max_buffered=4)
+    assert await relay.__anext__() == "first"
+    with pytest.raises(RuntimeError, match="cancelled"):
+        await asyncio.wait_for(relay.__anext__(), timeout=1)
@@ -0,0 +1,74 @@
+"""
+Tests for the read-through user cache.
+"""
+import asyncio
+from unittest.mock import patch
+
+import fakeredis
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.core.database import Base
+from app.models.user import User
+from app.services import user_cache as user_cache_module
+from app.services.user_cache import UserCache
+
+
+@pytest.fixture
+async def session_factory():
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with factory() as session:
+        session.add(User(id="user-1", email="a@example.com", name="Ada"))
+        await session.commit()
+
+    yield factory
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_user_cache_reads_through_tiers(session_factory):
+    """Test that only the first lookup opens a database session."""
+    redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+    opened = []
+
+    def counting_factory():
+        opened.append(1)
+        return session_factory()
+
+    cache = UserCache(redis, counting_factory, local_ttl=30, redis_ttl=60, max_entries=10)
+
+    for _ in range(3):
+        user = await cache.get("user-1")
+        assert (user.id, user.email, user.avatar) == ("user-1", "a@example.com", None)
+    assert len(opened) == 1
+
+    # A second worker with a cold local tier is served from Redis
+    other = UserCache(redis, counting_factory, local_ttl=30, redis_ttl=60, max_entries=10)
+    assert (await other.get("user-1")).name == "Ada"
+    assert len(opened) == 1
+
+    assert await cache.get("missing") is None
+
+
+@pytest.mark.asyncio
+async def test_user_update_invalidates_cache(session_factory):
+    """Test that committing a change to a user row evicts cached copies."""
+    redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+    cache = UserCache(redis, session_factory, local_ttl=30, redis_ttl=60, max_entries=10)
+
+    with patch.object(user_cache_module, "user_cache", cache):
+        assert (await cache.get("user-1")).name == "Ada"
+
+        async with session_factory() as session:
+            user = await session.get(User, "user-1")
+            user.name = "Ada Lovelace"
+            await session.commit()
+
+        # Let the scheduled Redis eviction run
+        await asyncio.sleep(0)
+        assert not await redis.exists("user:user-1")
+        assert (await cache.get("user-1")).name == "Ada Lovelace"
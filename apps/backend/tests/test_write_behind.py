@@ -0,0 +1,156 @@
+"""
+Tests for the write-behind buffer.
+"""
+import json
+
+import fakeredis
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.core.database import Base
+from app.models.chat import ChatMessage
+from app.models.usage import UserUsage
+from app.models.user import User
+from app.services.write_behind import WriteBehindBuffer
+
+
+@pytest.fixture
+async def session_factory():
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with factory() as session:
+        session.add_all([
+            User(id="user-1", email="a@example.com", name="Ada"),
+            User(id="user-2", email="b@example.com", name="Bob"),
+        ])
+        await session.commit()
+
+    yield factory
+    await engine.dispose()
+
+
+def make_buffer(redis, session_factory, **kwargs):
+    return WriteBehindBuffer(redis, session_factory, flush_interval=60, max_batch=100, **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_flush_writes_turns_and_aggregates_usage(session_factory):
+    """Test that buffered writes land in one flush and clear the Redis log."""
+    redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+    buffer = make_buffer(redis, session_factory)
+
+    for reply in ["One", "Two"]:
+        await buffer.save_turns("user-1", "c1", "p1", [
+            {"role": "user", "content": "Hi"},
+            {"role": "assistant", "content": reply},
+        ])
+        await buffer.record_usage("user-1", prompt_tokens=10, completion_tokens=5)
+
+    # Nothing touches the database until the flush
+    async with session_factory() as db:
+        assert (await db.execute(select(ChatMessage))).all() == []
+    assert await redis.llen(buffer._pending_key(buffer.worker_id)) == 4
+
+    assert await buffer.flush() == 4
+
+    async with session_factory() as db:
+        contents = (await db.scalars(select(ChatMessage.content).order_by(ChatMessage.id))).all()
+        usage = await db.scalar(select(UserUsage))
+
+    assert contents == ["Hi", "One", "Hi", "Two"]
+    assert (usage.requests, usage.prompt_tokens, usage.completion_tokens) == (2, 20, 10)
+    assert await redis.llen(buffer._pending_key(buffer.worker_id)) == 0
+
+
+@pytest.mark.asyncio
+async def test_crashed_worker_writes_are_recovered(session_factory):
+    """Test that a live worker replays the log of one without a heartbeat."""
+    redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+    crashed = make_buffer(redis, session_factory)
+    await crashed.save_turns("user-1", "c1", None, [{"role": "user", "content": "Lost?"}])
+    await crashed.record_usage("user-1")
+
+    survivor = make_buffer(redis, session_factory)
+    await survivor.start()
+    await survivor.stop()
+
+    async with session_factory() as db:
+        contents = (await db.scalars(select(ChatMessage.content))).all()
+        usage = await db.scalar(select(UserUsage.requests))
+
+    assert contents == ["Lost?"] and usage == 1
+    assert await redis.keys("write_behind:*:pending") == []
+
+
+@pytest.mark.asyncio
+async def test_turns_for_another_users_conversation_are_dropped(session_factory):
+    """Test that ownership is enforced when the batch is written."""
+    redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+    buffer = make_buffer(redis, session_factory)
+    await buffer.save_turns("user-1", "c1", None, [{"role": "user", "content": "Mine"}])
+    await buffer.save_turns("user-2", "c1", None, [{"role": "user", "content": "Intruder"}])
+    await buffer.flush()
+
+    async with session_factory() as db:
+        rows = (await db.execute(select(ChatMessage.user_id, ChatMessage.content))).all()
+
+    assert rows == [("user-1", "Mine")]
+
+
+@pytest.mark.asyncio
+async def test_poison_record_is_dead_lettered_after_bounded_retries(session_factory):
+    """Test that one bad record cannot block the records behind it."""
+    redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+    buffer = make_buffer(redis, session_factory, max_attempts=2)
+    await buffer.save_turns("user-1", "c1", None, [{"role": "user", "content": "Before"}])
+    await buffer.save_turns("user-1", "c1", None, [{"role": None, "content": "Bad"}])
+    await buffer.save_turns("user-1", "c1", None, [{"role": "user", "content": "After"}])
+
+    assert await buffer.flush() == 0  # First attempt fails, batch kept
+    assert await buffer.flush() == 3
+
+    async with session_factory() as db:
+        contents = (await db.scalars(select(ChatMessage.content).order_by(ChatMessage.id))).all()
+
+    assert contents == ["Before", "After"]
+    dead = [json.loads(value) for value in await redis.lrange(buffer.dead_letter_key, 0, -1)]
+    assert [record["turns"][0]["content"] for record in dead] == ["Bad"]
+    assert await redis.llen(buffer._pending_key(buffer.worker_id)) == 0
+
+
+@pytest.mark.asyncio
+async def test_full_buffer_sheds_after_waiting(session_factory):
+    """Test that writers wait for room, then shed instead of growing the buffer."""
+    redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+    buffer = make_buffer(redis, session_factory, max_buffered=2, enqueue_timeout=0.05)
+    for _ in range(3):
+        await buffer.record_usage("user-1")
+
+    assert len(buffer._buffer) == 2
+    assert await redis.llen(buffer._pending_key(buffer.worker_id)) == 2
+
+
+@pytest.mark.asyncio
+async def test_claimed_records_of_a_stalled_worker_are_written_once(session_factory):
+    """Test that a worker whose list was claimed while it stalled does not duplicate writes."""
+    redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+    stalled = make_buffer(redis, session_factory)
+    await stalled.save_turns("user-1", "c1", None, [{"role": "user", "content": "Once"}])
+    await stalled.record_usage("user-1")
+
+    # Its heartbeat lapsed, so another worker claims and writes its list...
+    claimer = make_buffer(redis, session_factory)
+    assert await claimer.recover() == 2
+    await claimer.flush()
+    # ...and then the stalled worker wakes up and flushes the same records
+    await stalled.flush()
+
+    async with session_factory() as db:
+        contents = (await db.scalars(select(ChatMessage.content))).all()
+        usage = await db.scalar(select(UserUsage.requests))
+
+    assert contents == ["Once"] and usage == 1